@@ -0,0 +1,102 @@
+"""Compare the YAML engines on the same fixtures.
+
+Each fixture is repeated as separate documents, to give the engines
+something to chew on, then timed through each engine:
+
+* ``parse``: events only, as for counting aliases;
+* ``chunks``: composing & building specs, as for chunked loads;
+* ``load``: constructing entities, as by ``yaml.load``, into memory.
+
+Usage::
+
+    python benchmarks/engines.py [--repeat N] [--copies N] [YAML_FILE...]
+
+By default the fixtures are the test samples.
+"""
+from __future__ import absolute_import, print_function
+
+import argparse
+import glob
+import os
+import timeit
+
+import yaml
+
+import gryaml
+from gryaml import backends, loader, ruamel_yaml
+
+try:
+    from typing import Any, Callable, Dict, List, Optional  # noqa: F401
+except ImportError:
+    """Module :mod:`typing` not required for Py27-compatible type comments."""
+
+SAMPLES = os.path.join(os.path.dirname(__file__), os.pardir, 'tests',
+                       'samples')
+
+
+def pyyaml_load_all():
+    # type: () -> Callable[[str], Any]
+    """Load all documents with PyYAML & gryaml's constructors."""
+    gryaml.register()
+    loader_class = getattr(yaml, 'CLoader', yaml.Loader)
+    for tag, constructor in yaml.Loader.yaml_constructors.items():
+        if tag and tag.startswith(u'!gryaml.'):
+            loader_class.add_constructor(tag, constructor)
+    return lambda text: list(yaml.load_all(text, Loader=loader_class))
+
+
+def ruamel_load_all(typ):
+    # type: (str) -> Callable[[str], Any]
+    """Load all documents with ruamel.yaml & gryaml's constructors."""
+    engine = ruamel_yaml.engine(typ)
+    return lambda text: list(engine.load_all(text))
+
+
+def benchmarks():
+    # type: () -> Dict[str, Dict[str, Callable[[str], Any]]]
+    """Benchmark functions by name, by engine."""
+    parsers = {'pyyaml': loader.EventParser,
+               'ruamel': ruamel_yaml.EventParser}
+    parse = {name: (lambda parser_class: lambda text:
+                    loader.count_aliases(text, parser_class))(parser_class)
+             for name, parser_class in parsers.items()}
+    chunks = {name: (lambda parser_class: lambda text:
+                     list(loader.iter_chunks(text,
+                                             parser_class=parser_class)))
+              (parser_class)
+              for name, parser_class in parsers.items()}
+    load = {'pyyaml': pyyaml_load_all(),
+            'ruamel': ruamel_load_all('safe'),
+            'ruamel-rt': ruamel_load_all('rt')}
+    return {'parse': parse, 'chunks': chunks, 'load': load}
+
+
+def main(args=None):
+    # type: (Optional[List[str]]) -> None
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--repeat', type=int, default=5,
+                        help='Best of this many runs. (Default: %(default)s)')
+    parser.add_argument('--copies', type=int, default=200,
+                        help='Documents per fixture. (Default: %(default)s)')
+    parser.add_argument('yaml_files', nargs='*',
+                        default=sorted(glob.glob(os.path.join(SAMPLES,
+                                                              '*.yaml'))))
+    config = parser.parse_args(args)
+
+    gryaml.connect(graph=backends.MemoryBackend())
+
+    print('{:<40} {:<8} {:<10} {:>10}'.format('fixture', 'stage', 'engine',
+                                              'seconds'))
+    for path in config.yaml_files:
+        with open(path) as stream:
+            text = u'\n---\n'.join([stream.read()] * config.copies)
+        for stage, engines in sorted(benchmarks().items()):
+            for engine, func in sorted(engines.items()):
+                seconds = min(timeit.repeat(lambda: func(text), number=1,
+                                            repeat=config.repeat))
+                print('{:<40} {:<8} {:<10} {:>10.4f}'.format(
+                    os.path.basename(path), stage, engine, seconds))
+
+
+if __name__ == '__main__':
+    main()
@@ -14,17 +14,20 @@ with open('HISTORY.rst') as fp:
 PY2NEO_MAX_VERSION = os.environ.get('PY2NEO_MAX_VERSION', '2')
 
 install_requires = [
-    'boltons',
     'py2neo>=1.6,<={}.999'.format(PY2NEO_MAX_VERSION),
     'py2neo_compat~=1.0.0pre0',
     'pyyaml',
 ]
 
 tests_require = [
+    'boltons',
     'pytest',
     'pytest-cov',
     'pytest-forked',
+    'pytest-xdist',
     'pathlib2; python_version<"3"',
+    'ruamel.yaml',
+    'msgpack',
 ]
 
 setup(
@@ -43,6 +46,10 @@ setup(
     tests_require=tests_require,
     extras_require={
         'test': tests_require,
+        'bolt': ['neo4j-driver'],
+        'ruamel': ['ruamel.yaml'],
+        'msgpack': ['msgpack'],
+        'numpy': ['numpy'],
     },
     license='MIT',
     zip_safe=False,
@@ -63,6 +70,13 @@ setup(
     entry_points={
         'console_scripts': [
             'gryaml-load = gryaml.__main__:__main__',
+            'gryaml-convert = gryaml.interchange:main',
+            'gryaml-dump = gryaml.shard:main',
+            'gryaml-stats = gryaml.stats:main',
+            'gryaml-serve = gryaml.serve:main',
+        ],
+        'pytest11': [
+            'gryaml = gryaml.pytest_plugin',
         ],
     },
 )
@@ -1,8 +1,55 @@
 """Facilities for loading graph database elements from YAML."""
 
-from ._py2neo import connect, node, rel
-# `pyyaml` is not used directly, but imported so constructors & representers
-# can be registered
-from .pyyaml import register, register_simple
+# Importing py2neo & PyYAML is slow, so is put off until needed: `_py2neo`
+# imports py2neo lazily and `pyyaml` is imported on registration.
+from ._py2neo import connect, edges, node, path, prefetch, rel
 
-__all__ = ('connect', 'node', 'rel', 'register')
+try:
+    from typing import Any, IO, Iterable, List, Optional  # noqa: F401
+except ImportError:
+    """Module :mod:`typing` not required for Py27-compatible type comments."""
+
+__all__ = ('connect', 'dump_stream', 'dump_subgraph', 'edges', 'node', 'path',
+           'prefetch', 'rel', 'register')
+
+
+def register(safe=False):
+    # type: (bool) -> None
+    """Register representers & constructors for nodes & rels.
+
+    See :func:`gryaml.pyyaml.register`.
+    """
+    from .pyyaml import register
+    register(safe)
+
+
+def register_simple(safe=True):
+    # type: (bool) -> None
+    """Register representers & constructors using only native YAML types.
+
+    See :func:`gryaml.pyyaml.register_simple`.
+    """
+    from .pyyaml import register_simple
+    register_simple(safe)
+
+
+def dump_subgraph(graph, start_nodes, depth, rel_types=None, stream=None,
+                  **kwargs):
+    # type: (Any, Iterable[int], int, Optional[List[str]], Optional[IO], **Any) -> Optional[str]  # noqa: E501
+    """Dump the neighbourhood of `start_nodes` as gryaml YAML.
+
+    See :func:`gryaml.subgraph.dump_subgraph`.
+    """
+    from .subgraph import dump_subgraph
+    return dump_subgraph(graph, start_nodes, depth, rel_types, stream,
+                         **kwargs)
+
+
+def dump_stream(entities, stream=None, edges=False, paths=False):
+    # type: (Iterable[Any], Optional[IO], bool, bool) -> Optional[str]
+    """Dump nodes & relationships as gryaml YAML, as they are iterated.
+
+    See :func:`gryaml.interchange.dump_stream`.
+    """
+    from .interchange import dump_stream
+    return dump_stream(entities, stream, edges, paths)
@@ -1,18 +1,28 @@
 """Load Neo4j nodes & relationships from YAML files."""
+from __future__ import print_function
 
 import argparse
+import io
 import os
+import sys
 
 import yaml
 
 try:
-    from typing import Any, Iterator, List, Optional, Tuple  # noqa: F401
-    from py2neo_compat import Graph  # noqa: F401
+    from typing import (  # noqa: F401
+        Any, Callable, Iterator, List, Optional, Tuple, TYPE_CHECKING
+    )
 except ImportError:
     """Module :mod:`typing` not required for Py27-compatible type comments."""
+    TYPE_CHECKING = False
+
+if TYPE_CHECKING:
+    from py2neo_compat import Graph  # noqa: F401
 
 import gryaml
-gryaml.register()
+from gryaml import (
+    backends, compiler, delta, interchange, loader, shard, validate
+)
 
 
 def parse_args(args=None):
@@ -22,40 +32,361 @@ def parse_args(args=None):
 
     neo4j_uri_env = os.environ.get('NEO4J_URI', None)
     parser.add_argument('--neo4j-uri', action='store',
-                        default=neo4j_uri_env,  # toggle req based on env var
-                        required=not bool(neo4j_uri_env),
+                        default=neo4j_uri_env,
                         help='URI for Neo4j; environment variable'
                              ' "NEO4J_URI" may also be used.')
+    parser.add_argument('--backend', action='store',
+                        choices=sorted(backends.BACKENDS),
+                        default=backends.Py2neoBackend.name,
+                        help='Write with this backend; "bolt" requires'
+                             ' neo4j-driver and a bolt:// URI.'
+                             ' (Default: %(default)s)')
+    parser.add_argument('--yaml-engine', action='store',
+                        choices=loader.ENGINES, default='pyyaml',
+                        help='Parse YAML with this library.'
+                             ' (Default: %(default)s)')
+    parser.add_argument('--compile', action='store', metavar='SCRIPT',
+                        help='Compile YAML files to a Cypher script of'
+                             ' batched statements instead of loading them;'
+                             ' no database is needed. Files ending in'
+                             ' ".cypher" are loaded by replaying them.')
+    parser.add_argument('--neo4j-version', action='store',
+                        type=backends.version_tuple, metavar='VERSION',
+                        help='Compile for this version of Neo4j, e.g. 5.12;'
+                             ' 4.1 and later index in another syntax.'
+                             ' (Default: before 4.1)')
     parser.add_argument('--drop', action='store_true',
                         help='Drop database before loading.')
+    parser.add_argument('--chunk-size', action='store', type=int,
+                        help='Write entities in transactions of this many,'
+                             ' saving a checkpoint alongside each YAML file'
+                             ' after each transaction.')
+    parser.add_argument('--resume', action='store_true',
+                        help='Continue chunked loads from their last'
+                             ' checkpoints.')
+    parser.add_argument('--retries', action='store', type=int,
+                        default=loader.DEFAULT_RETRIES,
+                        help='Retry chunks failing with transient errors'
+                             ' this many times, backing off exponentially.')
+    parser.add_argument('--count-aliases', action='store_true',
+                        help='Count aliases in a first pass over each file,'
+                             ' so chunked loads can forget anchored nodes'
+                             ' after their last alias.')
+    parser.add_argument('--anchor-window', action='store', type=int,
+                        metavar='ITEMS',
+                        help='Forget anchors this many top-level items'
+                             ' after the one defining them; later aliases'
+                             ' are errors.')
+    parser.add_argument('--validate-only', action='store_true',
+                        help='Check the YAML files, without a database,'
+                             ' and stop.')
+    parser.add_argument('--no-validate', action='store_true',
+                        help='Do not check the YAML files before loading'
+                             ' any of them.')
+    parser.add_argument('--dedupe', action='store_true',
+                        help='Drop relationships with the same endpoints,'
+                             ' type & properties as any before them in the'
+                             ' same file, reporting how many.')
+    parser.add_argument('--keep-anchors', action='store_true',
+                        help='Keep the anchors of nodes as a property, so'
+                             ' later --delta runs can identify them.')
+    parser.add_argument('--load-id', action='store', metavar='ID',
+                        help='Tag the entities loaded with ID, so --reset'
+                             ' can delete just them.')
+    parser.add_argument('--reset', action='store', metavar='ID',
+                        help='Delete the entities of the load tagged ID'
+                             ' before loading, leaving the rest.')
+    parser.add_argument('--delta', action='store_true',
+                        help='Sync the database to the files, writing only'
+                             ' what differs, instead of loading them.')
+    parser.add_argument('--key', action='append', default=[],
+                        metavar='LABEL=PROPERTY[,PROPERTY...]',
+                        help='Identify nodes with LABEL by these properties'
+                             ' for --delta, rather than by anchor; may be'
+                             ' repeated.')
+    parser.add_argument('--dry-run', action='store_true',
+                        help='With --delta, report what differs, without'
+                             ' writing.')
+    parser.add_argument('--workers', action='store', type=int,
+                        help='Load the shards of ".json" manifests, from'
+                             ' gryaml-dump, in this many processes.'
+                             ' (Default: one per CPU)')
+    parser.add_argument('--registry', action='store', nargs='?', const='',
+                        metavar='FILE',
+                        help='Register anchored nodes across all files &'
+                             ' documents, for "!gryaml.ref ANCHOR"'
+                             ' endpoints to reference; kept in FILE, if'
+                             ' given, between runs.')
+    parser.add_argument('--label', action='append', dest='labels',
+                        metavar='LABEL',
+                        help='Load only nodes with this label, and'
+                             ' relationships between them; may be'
+                             ' repeated.')
+    parser.add_argument('--exclude-label', action='append', default=[],
+                        metavar='LABEL',
+                        help='Skip nodes with this label, and their'
+                             ' relationships; may be repeated.')
+    parser.add_argument('--rel-type', action='append', dest='rel_types',
+                        metavar='TYPE',
+                        help='Load only relationships of this type; may be'
+                             ' repeated.')
+    parser.add_argument('--exclude-rel-type', action='append', default=[],
+                        metavar='TYPE',
+                        help='Skip relationships of this type; may be'
+                             ' repeated.')
     parser.add_argument('yaml_files', nargs='*')
 
-    return parser.parse_args(args)
+    config = parser.parse_args(args)
+
+    if not (config.neo4j_uri or config.compile or config.validate_only or
+            config.backend == backends.MemoryBackend.name):
+        parser.error('--neo4j-uri or environment variable "NEO4J_URI"'
+                     ' is required')
+    if config.resume and config.drop:
+        parser.error('--resume cannot be combined with --drop')
+    if config.validate_only and config.no_validate:
+        parser.error('--validate-only cannot be combined with --no-validate')
+    if config.delta and (config.resume or config.drop):
+        parser.error('--delta cannot be combined with --resume or --drop')
+    config.select = None
+    if (config.labels or config.exclude_label or config.rel_types or
+            config.exclude_rel_type):
+        config.select = loader.Selection(config.labels, config.exclude_label,
+                                         config.rel_types,
+                                         config.exclude_rel_type)
+    if ((config.resume or config.count_aliases or config.anchor_window or
+         config.dedupe or config.keep_anchors or config.load_id or
+         config.registry is not None or config.select) and
+            not config.chunk_size):
+        config.chunk_size = loader.DEFAULT_CHUNK_SIZE
+
+    config.keys = {}
+    for key in config.key:
+        label, _, names = key.partition('=')
+        if not (label and names):
+            parser.error('--key expects LABEL=PROPERTY[,PROPERTY...],'
+                         ' not {!r}'.format(key))
+        config.keys[label] = names.split(',')
+
+    return config
+
+
+def checkpoint_path(yaml_file):
+    # type: (str) -> str
+    """Path of the checkpoint file for a chunked load of `yaml_file`."""
+    return yaml_file + '.checkpoint'
 
 
 def __main__():  # noqa: N802
     # type: () -> None
     config = parse_args()
 
-    print('Using Neo4j database at {}'.format(config.neo4j_uri))
+    if not config.no_validate:
+        if not validate_files(config):
+            raise SystemExit(1)
+        if config.validate_only:
+            return
+
+    if config.compile:
+        compile_files(config)
+        return
+
+    if config.backend == backends.MemoryBackend.name:
+        print('Loading into memory only')
+    else:
+        print('Using Neo4j database at {}'.format(config.neo4j_uri))
+
+    graph = gryaml.connect(config.neo4j_uri, backend=config.backend)
+    try:
+        load_files(graph, config)
+    finally:
+        backends.backend_for(graph).close()
 
-    graph = gryaml.connect(config.neo4j_uri)
 
+def load_files(graph, config):
+    # type: (Graph, Any) -> None
+    """Load the files into `graph`, after any drop or reset."""
     # Ensure at least a minimally functioning connection
-    graph.neo4j_version
+    backends.backend_for(graph).check()
 
     # import sys, IPython; IPython.embed(); sys.exit()
     if config.drop:
         print('Dropping database...')
         cleanup_graph(graph)
 
+    if config.reset:
+        print('Deleting load {}...'.format(config.reset))
+        print('  {} entities deleted'.format(
+            loader.reset(graph, config.reset, config.chunk_size or
+                         loader.DEFAULT_CHUNK_SIZE)))
+
+    if config.delta:
+        sync_files(graph, config)
+        return
+
     if config.yaml_files:
         print('Loading YAML files...')
+        yaml_load = yaml_loader(config.yaml_engine)
+
+    if config.registry is not None:  # Shared by all files; maybe a path
+        config.registry = (loader.Registry.read(config.registry)
+                           if config.registry else loader.Registry())
 
     for yaml_file in config.yaml_files:
         print(yaml_file)
-        with open(yaml_file) as stream:
-            yaml.load(stream)
+        with open_file(yaml_file) as stream:
+            if yaml_file.endswith('.cypher'):
+                compiler.replay(stream, graph)
+            elif yaml_file.endswith('.json'):
+                load_manifest(graph, yaml_file, config)
+            elif (config.chunk_size or
+                  interchange.format_of(yaml_file) != 'yaml'):
+                load_chunked(graph, stream, yaml_file, config)
+            else:
+                yaml_load(stream)
+
+
+def yaml_loader(engine):
+    # type: (str) -> Callable[[Any], Any]
+    """Load function of YAML `engine`, constructing nodes & rels."""
+    if engine == 'ruamel':
+        from gryaml import ruamel_yaml
+        return ruamel_yaml.engine().load
+
+    gryaml.register()
+    return yaml.load
+
+
+def open_file(path):
+    # type: (str) -> Any
+    """Open `path`, in binary mode if its format needs it."""
+    return open(path, 'rb' if interchange.is_binary(interchange.format_of(path))
+                else 'r')
+
+
+def open_each(paths):
+    # type: (List[str]) -> Iterator[Any]
+    """Open each file in turn, closing it before opening the next."""
+    for path in paths:
+        with open_file(path) as stream:
+            yield stream
+
+
+def validate_files(config):
+    # type: (Any) -> bool
+    """Check the YAML files, printing any problems; whether there are none.
+
+    Files of other formats are not checked.
+    """
+    parser_class = loader.event_parser(config.yaml_engine)
+    valid = True
+    for path in config.yaml_files:
+        if (path.endswith(('.cypher', '.json')) or
+                interchange.format_of(path) != 'yaml'):
+            continue
+        with open(path) as stream:
+            problems = validate.validate(stream, parser_class)
+        for problem in problems:
+            print('{}: {}'.format(path, problem), file=sys.stderr)
+        valid = valid and not problems
+    return valid
+
+
+def compile_files(config):
+    # type: (Any) -> None
+    """Compile the YAML files to a Cypher script & print its plan."""
+    formats = {interchange.format_of(path) for path in config.yaml_files}
+    if len(formats) > 1:
+        raise SystemExit('Cannot compile files of different formats together')
+
+    print('Compiling YAML files to {}...'.format(config.compile))
+    with io.open(config.compile, 'w', encoding='utf-8') as out:
+        try:
+            plan = compiler.compile_load(
+                open_each(config.yaml_files), out,
+                chunk_size=config.chunk_size or loader.DEFAULT_CHUNK_SIZE,
+                anchor_window=config.anchor_window,
+                parser_class=loader.event_parser(config.yaml_engine),
+                format=formats.pop() if formats else 'yaml',
+                neo4j_version=config.neo4j_version)
+        except ValueError as error:
+            raise SystemExit(str(error))
+    print(plan)
+
+
+def load_chunked(graph, stream, yaml_file, config):
+    # type: (Graph, Any, str, Any) -> None
+    """Load `stream` in checkpointed chunks, resuming if configured."""
+    path = checkpoint_path(yaml_file)
+    if config.resume:
+        checkpoint = loader.Checkpoint.read(path)
+        if checkpoint.done:
+            print('  already loaded; skipping')
+            return
+        if checkpoint.written:
+            print('  resuming at document {0.document} item {0.item}'
+                  .format(checkpoint))
+    else:
+        checkpoint = loader.Checkpoint(path)
+
+    format = interchange.format_of(yaml_file)
+    parser_class = loader.event_parser(config.yaml_engine)
+    alias_counts = None
+    if config.count_aliases and format == 'yaml':
+        with open(yaml_file) as count_stream:
+            alias_counts = loader.count_aliases(count_stream, parser_class)
+
+    checkpoint = loader.load(stream, graph,
+                             chunk_size=(config.chunk_size or
+                                         loader.DEFAULT_CHUNK_SIZE),
+                             checkpoint=checkpoint,
+                             retries=config.retries,
+                             alias_counts=alias_counts,
+                             anchor_window=config.anchor_window,
+                             parser_class=parser_class,
+                             format=format,
+                             dedupe=config.dedupe,
+                             keep_anchors=config.keep_anchors,
+                             load_id=config.load_id,
+                             registry=config.registry,
+                             select=config.select,
+                             source=yaml_file)
+    print('  {} entities written'.format(checkpoint.written))
+    if config.dedupe:
+        print('  {} duplicate relationships dropped'
+              .format(checkpoint.dropped))
+
+
+def sync_files(graph, config):
+    # type: (Graph, Any) -> None
+    """Sync the database to the files, writing only what differs."""
+    print('Comparing YAML files...')
+    document = delta.Document(config.keys)
+    parser_class = loader.event_parser(config.yaml_engine)
+    for path in config.yaml_files:
+        with open_file(path) as stream:
+            document.read(stream, parser_class, interchange.format_of(path),
+                          path)
+    changes = delta.Delta.compare(document, graph)
+    print('  {}'.format(changes))
+    if not config.dry_run:
+        changes.write(graph, config.chunk_size or loader.DEFAULT_CHUNK_SIZE,
+                      retries=config.retries)
+        print('  {} writes'.format(len(changes)))
+
+
+def load_manifest(graph, path, config):
+    # type: (Graph, str, Any) -> None
+    """Load the shards of the manifest at `path` in parallel.
+
+    Workers connect for themselves, except to an in-memory graph.
+    """
+    in_memory = config.backend == backends.MemoryBackend.name
+    written = shard.load_manifest(
+        path, graph=graph if in_memory else None, uri=config.neo4j_uri,
+        backend=config.backend, workers=config.workers,
+        chunk_size=config.chunk_size or loader.DEFAULT_CHUNK_SIZE)
+    print('  {} entities written'.format(written))
 
 
 def schema_constraints(graph):
@@ -91,7 +422,14 @@ def schema_indexes(graph):
 
 def cleanup_graph(graph):
     # type: (Graph) -> None
-    """Delete all entities & drop indexes & constraints."""
+    """Delete all entities & drop indexes & constraints.
+
+    Only py2neo can drop the schema; other backends just delete entities.
+    """
+    if isinstance(graph, backends.Backend):
+        graph.delete_all()
+        return
+
     constraint_dispatch = {
         'UNIQUENESS': graph.schema.drop_uniqueness_constraint,
     }
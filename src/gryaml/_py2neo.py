@@ -1,48 +1,88 @@
 """Compatability layer for :mod:`py2neo` versions."""
 from __future__ import absolute_import
 
-from boltons.iterutils import first
+from collections import OrderedDict
 
 try:
-    from typing import Any, List, Mapping, Optional  # noqa: F401
+    from typing import (  # noqa: F401
+        Any, Dict, Iterable, List, Mapping, Optional, Sequence, Tuple,
+        TYPE_CHECKING
+    )
 except ImportError:
     """Module :mod:`typing` not required for Py27-compatible type comments."""
+    TYPE_CHECKING = False
 
-import py2neo_compat
-py2neo_compat.monkey_patch_py2neo()
+if TYPE_CHECKING:
+    from types import ModuleType  # noqa: F401
+    from py2neo_compat import Graph, Node, Relationship  # noqa: F401
+    from .backends import Backend  # noqa: F401
 
-from py2neo_compat import (  # noqa
-    Graph, Node, Relationship, create_node, foremost,
-    rel as py2neo_rel
-)
+from .backends import Py2neoBackend, backend_for, get_backend
 
+_patched = False
+
+#: Entities pulled to a request by :func:`prefetch`.
+PREFETCH_SIZE = 1000
+
+
+def compat():
+    # type: () -> ModuleType
+    """Import :mod:`py2neo_compat`, patching :mod:`py2neo` the first time.
+
+    Importing py2neo is slow, so is put off until something needs the
+    database or py2neo entities.
+    """
+    global _patched
+    import py2neo_compat
+    if not _patched:
+        _patched = True
+        py2neo_compat.monkey_patch_py2neo()
+        from .pyyaml import register_deferred
+        register_deferred()
+    return py2neo_compat
+
+
+def transient_errors():
+    # type: () -> Tuple[type, ...]
+    """Errors after which a write may succeed if simply tried again."""
+    compat()
+    try:
+        from py2neo.cypher.error.core import TransientError
+    except ImportError:
+        return IOError, OSError
+    return IOError, OSError, TransientError
 
-try:
-    from typing import TypeVar
-    Py2NeoEntity = TypeVar('Py2NeoEntity', Node, Relationship)
-except ImportError:
-    pass
 
 # Avoid overwriting on reload
 try:
     graphdb
 except NameError:
-    graphdb = None  # type: Graph
+    graphdb = None  # type: Any
 
 
-def connect(uri=None, graph=None):
-    # type: (Optional[str], Optional[Graph]) -> Graph
-    """Instantiate a module-level graph database connection."""
+def connect(uri=None, graph=None, backend=None):
+    # type: (Optional[str], Any, Optional[str]) -> Any
+    """Instantiate a module-level graph database connection.
+
+    The graph is a py2neo ``Graph`` or, with `backend` named, whatever that
+    backend connects to; see :mod:`gryaml.backends`.
+    """
     global graphdb
 
     if graph is not None:
         graphdb = graph
     else:
-        graphdb = Graph(uri)
+        graphdb = get_backend(backend or Py2neoBackend.name).connect(uri)
 
     return graphdb
 
 
+def current_backend():
+    # type: () -> Backend
+    """The backend writing to the module-level graph."""
+    return backend_for(graphdb)
+
+
 def is_arg_map(argname, mapping):
     # type: (str, Mapping[str, Mapping]) -> bool
     """Determine if p is an "arg map".
@@ -93,11 +133,23 @@ def node(*args):
     ''')
     >>> isinstance(result, Node)
     """
-    labels = first(arg['labels']
-                   for arg in args if is_label_map(arg)) or []
-    properties = first(arg['properties']
-                       for arg in args if is_properties_map(arg)) or {}
-    return create_node(graph=graphdb, labels=labels, properties=properties)
+    labels, properties = resolve_node_args(*args)
+    return current_backend().create_node(labels, properties)
+
+
+def resolve_node_args(*args):
+    # type: (*Mapping[str,Any]) -> Tuple[List[str], Mapping[str, Any]]
+    """Extract labels & properties from node "arg maps".
+
+    The first non-empty 'labels' map and first non-empty 'properties' map
+    win; either may be absent.
+    """
+    labels = next((arg['labels'] for arg in args
+                   if is_label_map(arg) and arg['labels']), None) or []
+    properties = next((arg['properties'] for arg in args
+                       if is_properties_map(arg) and arg['properties']),
+                      None) or {}
+    return labels, properties
 
 
 def resolve_rel_properties(properties=None):
@@ -133,8 +185,106 @@ def rel(head, reltype, tail, properties=None):
     # type: (Node, str, Node, Optional[Mapping[str, str]]) -> Relationship
     """Create relationships."""
     properties = resolve_rel_properties(properties)
-    path = py2neo_rel(head, reltype, tail, **properties)
+    return current_backend().create_rel(head, reltype, tail, properties)
+
+
+def edges(reltype, rows):
+    # type: (str, List[Tuple[Node, Node, Mapping[str, Any]]]) -> List[Relationship]  # noqa: E501
+    """Create relationships of `reltype` together.
+
+    `rows` are ``(head, tail, properties)``; see
+    :meth:`gryaml.backends.Backend.create_rels`.
+    """
+    return current_backend().create_rels(reltype, rows)
+
+
+def resolve_path(items):
+    # type: (Sequence[Any]) -> List[Tuple[Any, str, Any, Mapping[str, Any]]]
+    """Split a path of alternating nodes & types into its hops.
 
-    # Offline/abstract creation
-    return path if graphdb is None \
-        else foremost(graphdb.create(path))
+    Each type is a string, or a ``[type, properties]`` pair. Hops are
+    ``(head, type, tail, properties)``.
+    """
+    if len(items) < 3 or not len(items) % 2:
+        raise ValueError('expected alternating nodes & relationship types,'
+                         ' from a node to a node')
+    hops = []
+    for index in range(1, len(items), 2):
+        reltype, properties = items[index], None
+        if isinstance(reltype, (list, tuple)) and len(reltype) == 2:
+            reltype, properties = reltype
+        if not isinstance(reltype, (str, type(u''))) or not reltype:
+            raise ValueError('expected a relationship type or a [type,'
+                             ' properties] pair, found %r' % (reltype,))
+        hops.append((items[index - 1], reltype, items[index + 1],
+                     resolve_rel_properties(properties)))
+    return hops
+
+
+def path(*items):
+    # type: (*Any) -> List[Relationship]
+    """Create the relationships along a path, in order.
+
+    `items` alternate nodes & relationship types, from a node to a node;
+    see :func:`resolve_path`. The relationships of each type are created
+    together, by :meth:`~gryaml.backends.Backend.create_rels`.
+    """
+    hops = resolve_path(items)
+    rels = [None] * len(hops)  # type: List[Any]
+    by_type = {}  # type: Dict[str, List[int]]
+    for index, hop in enumerate(hops):
+        by_type.setdefault(hop[1], []).append(index)
+    backend = current_backend()
+    for reltype, indexes in sorted(by_type.items()):
+        created = backend.create_rels(reltype, [(hops[i][0], hops[i][2],
+                                                 hops[i][3])
+                                                for i in indexes])
+        for index, rel_ in zip(indexes, created):
+            rels[index] = rel_
+    return rels
+
+
+def bound_id(entity):
+    # type: (Any) -> Optional[int]
+    """Database id of a bound py2neo entity, or ``None`` if it is abstract.
+
+    py2neo 2.0 entities say whether they are ``bound``, and 1.6 entities
+    whether they are ``is_abstract``.
+    """
+    if not getattr(entity, 'bound', not getattr(entity, 'is_abstract', True)):
+        return None
+    id_ = getattr(entity, '_id', None)
+    return getattr(entity, 'id', None) if id_ is None else id_
+
+
+def prefetch(entities, batch_size=PREFETCH_SIZE):
+    # type: (Iterable[Any], int) -> int
+    """Pull the labels & properties of bound py2neo entities in batches.
+
+    Bound entities read lazily, a request per entity, when rendered; this
+    pulls `entities` and the endpoints of the relationships among them
+    `batch_size` to a request instead, with ``Graph.pull`` (py2neo 2.0).
+    Abstract entities, and those of graphs without ``pull``, are left as
+    they are. Returns the number of entities pulled.
+    """
+    bound = OrderedDict()  # type: Dict[int, Any]
+    for entity in entities:
+        for item in ((entity, entity.start_node, entity.end_node)
+                     if hasattr(entity, 'start_node') else (entity,)):
+            if getattr(item, 'bound', False):
+                bound.setdefault(id(item), item)
+
+    by_graph = OrderedDict()  # type: Dict[int, Tuple[Any, List[Any]]]
+    for item in bound.values():
+        graph = item.graph
+        by_graph.setdefault(id(graph), (graph, []))[1].append(item)
+
+    pulled = 0
+    for graph, items in by_graph.values():
+        pull = getattr(graph, 'pull', None)
+        if pull is None:
+            continue
+        for start in range(0, len(items), batch_size):
+            pull(*items[start:start + batch_size])
+        pulled += len(items)
+    return pulled
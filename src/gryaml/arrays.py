@@ -0,0 +1,160 @@
+"""Typed numeric arrays as compact property values.
+
+Large numeric properties, such as embeddings & time series, are slow to
+parse and bulky as YAML sequences of numbers. Tagged ``!gryaml.array``
+they are instead a base64-encoded little-endian buffer, with its dtype &
+shape::
+
+    embedding: !gryaml.array {dtype: f4, shape: [3], data: AACAPwAAAEAAAEBA}
+
+A dtype is a NumPy kind & size without byte order: ``b1``, ``i1`` to
+``i8``, ``u1`` to ``u8``, ``f2``, ``f4`` or ``f8``. Arrays decode to NumPy
+arrays viewing the decoded buffer, if NumPy is installed, and otherwise to
+:class:`array.array`, which has no shape, so holds the items flattened;
+``f2`` items, which it has no typecode for, are widened to ``f4``.
+
+Neo4j properties can only be flat lists, so arrays are written as such.
+"""
+from __future__ import absolute_import
+
+import array
+import base64
+import struct
+import sys
+from functools import reduce
+from operator import mul
+
+try:
+    from typing import Any, Dict, List, Mapping, Optional  # noqa: F401
+except ImportError:
+    """Module :mod:`typing` not required for Py27-compatible type comments."""
+
+#: Kinds of dtypes by :mod:`array` typecode.
+KINDS = {'b': 'i', 'h': 'i', 'i': 'i', 'l': 'i', 'q': 'i',
+         'B': 'u', 'H': 'u', 'I': 'u', 'L': 'u', 'Q': 'u',
+         'f': 'f', 'd': 'f'}
+
+#: Kinds of dtype which can be encoded.
+ENCODABLE = ('b', 'i', 'u', 'f')
+
+
+def numpy_module():
+    # type: () -> Any
+    """:mod:`numpy`, if installed, else ``None``."""
+    try:
+        import numpy
+    except ImportError:
+        return None
+    return numpy
+
+
+def is_array(value):
+    # type: (Any) -> bool
+    """Whether `value` is an :class:`array.array` or a NumPy array."""
+    if isinstance(value, array.array):
+        return True
+    numpy = sys.modules.get('numpy')
+    return numpy is not None and isinstance(value, numpy.ndarray)
+
+
+def typecode(dtype):
+    # type: (str) -> str
+    """The :mod:`array` typecode of `dtype` on this platform."""
+    kind, size = dtype[:1], int(dtype[1:] or 0)
+    if kind == 'b' and size == 1:
+        return 'B'
+    for code in sorted(KINDS):
+        if KINDS[code] == kind and array.array(code).itemsize == size:
+            return code
+    raise ValueError('Unsupported array dtype %r' % dtype)
+
+
+def encode(value):
+    # type: (Any) -> Dict[str, Any]
+    """The dtype, shape & base64 ``data`` of an array.
+
+    Arrays of other kinds than booleans & numbers raise
+    :class:`ValueError`.
+    """
+    if isinstance(value, array.array):
+        if value.typecode not in KINDS:
+            raise ValueError('Unsupported array typecode %r'
+                             % value.typecode)
+        dtype = '%s%d' % (KINDS[value.typecode], value.itemsize)
+        shape = [len(value)]
+        if sys.byteorder != 'little':
+            value = array.array(value.typecode, value)
+            value.byteswap()
+        raw = value.tobytes() if hasattr(value, 'tobytes') \
+            else value.tostring()
+    else:
+        if value.dtype.kind not in ENCODABLE:
+            raise ValueError('Unsupported array dtype %r' % value.dtype.str)
+        dtype = '%s%d' % (value.dtype.kind, value.dtype.itemsize)
+        shape = list(value.shape)
+        raw = value.astype(value.dtype.newbyteorder('<'),
+                           copy=False).tobytes()
+    return {'dtype': dtype, 'shape': shape,
+            'data': base64.b64encode(raw).decode('ascii')}
+
+
+def decode(dtype, data, shape=None):
+    # type: (str, str, Optional[List[int]]) -> Any
+    """Decode an array's base64 `data`; see :func:`encode`.
+
+    NumPy arrays are read-only views of the decoded buffer.
+    """
+    raw = base64.b64decode(data)
+    numpy = numpy_module()
+    if numpy is not None:
+        try:
+            numpy_dtype = numpy.dtype('<' + dtype)
+        except TypeError:
+            numpy_dtype = None
+        if numpy_dtype is None or numpy_dtype.kind not in ENCODABLE:
+            raise ValueError('Unsupported array dtype %r' % dtype)
+        size = numpy_dtype.itemsize
+    elif dtype == 'f2':
+        size = 2
+    else:
+        code = typecode(dtype)
+        size = array.array(code).itemsize
+    count = reduce(mul, shape, 1) if shape is not None else len(raw) // size
+    if count * size != len(raw):
+        raise ValueError('Array data of %d bytes does not fit %s %r'
+                         % (len(raw), dtype, shape))
+
+    if numpy is not None:
+        value = numpy.frombuffer(raw, numpy_dtype)
+        return value.reshape(shape) if shape is not None else value
+
+    if dtype == 'f2':
+        try:
+            return array.array('f', struct.unpack('<%de' % count, raw))
+        except struct.error:
+            raise ValueError('Unsupported array dtype %r' % dtype)
+    value = array.array(code)
+    if hasattr(value, 'frombytes'):
+        value.frombytes(raw)
+    else:
+        value.fromstring(raw)
+    if sys.byteorder != 'little':
+        value.byteswap()
+    return value
+
+
+def to_list(value):
+    # type: (Any) -> List
+    """The items of an array as a flat list."""
+    if isinstance(value, array.array):
+        return value.tolist()
+    return value.ravel().tolist()
+
+
+def plain(properties):
+    # type: (Mapping[str, Any]) -> Mapping[str, Any]
+    """`properties` with arrays as lists, as Neo4j stores them."""
+    if not any(is_array(value) for value in properties.values()):
+        return properties
+    return {name: to_list(value) if is_array(value) else value
+            for name, value in properties.items()}
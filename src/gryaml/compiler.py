@@ -0,0 +1,215 @@
+"""Compile gryaml YAML to a Cypher script, without a database connection.
+
+The script creates entities with parameterised ``UNWIND`` statements, one
+per label set or relationship type in each chunk, and one transaction per
+chunk. Since node ids cannot be known in advance, nodes are temporarily
+labelled & keyed by a "ref" for matching relationship endpoints.
+
+Scripts are in the format of ``cypher-shell`` (Neo4j 3.0+) and may also be
+run by :func:`replay`. Neo4j 5 requires the syntax for indexes of Neo4j 4.1
+and later, which scripts use when compiled for such a version.
+"""
+from __future__ import absolute_import
+
+import itertools
+
+import yaml
+
+try:
+    from typing import (  # noqa: F401
+        Dict, Hashable, IO, Iterable, Optional, Tuple, TYPE_CHECKING
+    )
+except ImportError:
+    """Module :mod:`typing` not required for Py27-compatible type comments."""
+    TYPE_CHECKING = False
+
+if TYPE_CHECKING:
+    from py2neo_compat import Graph  # noqa: F401
+
+from . import arrays, cypher
+from .backends import backend_for
+from .loader import DEFAULT_CHUNK_SIZE, EventParser, iter_chunks
+
+
+class Plan(object):
+    """Summary of the cost of a compiled load."""
+
+    def __init__(self):
+        # type: () -> None
+        self.nodes = 0
+        self.rels = 0
+        self.batches = 0
+        self.transactions = 0
+        self.statements = 0
+
+    @property
+    def round_trips(self):
+        # type: () -> int
+        """Requests made by :func:`replay`, one per transaction or statement.
+
+        The statements of a transaction are sent together when it commits.
+        """
+        return self.transactions + self.statements - self.batches
+
+    def __str__(self):
+        # type: () -> str
+        return ('nodes: {0.nodes}, relationships: {0.rels}, '
+                'batches: {0.batches}, transactions: {0.transactions}, '
+                'round trips: {0.round_trips}'.format(self))
+
+
+class ScriptWriter(object):
+    """Write statements & their parameters in ``cypher-shell`` format."""
+
+    def __init__(self, out, plan=None):
+        # type: (IO, Optional[Plan]) -> None
+        self.out = out
+        self.plan = plan or Plan()
+
+    def comment(self, text):
+        # type: (str) -> None
+        """Write a comment line."""
+        self.out.write(u'// {}\n'.format(text))
+
+    def statement(self, statement, rows=None):
+        # type: (str, Optional[list]) -> None
+        """Write a statement, setting the ``rows`` parameter if given."""
+        if rows is not None:
+            self.out.write(u':param rows => {}\n'.format(cypher.literal(rows)))
+            self.plan.batches += 1
+        self.out.write(statement + u';\n')
+        self.plan.statements += 1
+
+    def begin(self):
+        # type: () -> None
+        """Start a transaction."""
+        self.out.write(u':begin\n')
+
+    def commit(self):
+        # type: () -> None
+        """Commit the transaction."""
+        self.out.write(u':commit\n')
+        self.plan.transactions += 1
+
+
+def compile_load(streams, out, chunk_size=DEFAULT_CHUNK_SIZE,
+                 anchor_window=None, parser_class=EventParser, format='yaml',
+                 neo4j_version=None):
+    # type: (Iterable[IO], IO, int, Optional[int], type, str, Optional[Tuple[int, ...]]) -> Plan  # noqa: E501
+    """Compile gryaml YAML `streams` to a Cypher script written to `out`.
+
+    Returns a :class:`Plan` summarising the script, which is also appended
+    to it as a comment. See :class:`~gryaml.loader.ItemComposer` for
+    `anchor_window` & `parser_class`. With another `format` than
+    ``'yaml'``, `streams` hold records of the :mod:`~gryaml.interchange`
+    format instead.
+
+    The index on refs is created in the syntax of Neo4j `neo4j_version`,
+    e.g. ``(5, 12)``; by default, that of Neo4j before 4.1 (see
+    :func:`~gryaml.cypher.create_index_statement`).
+
+    Scripts cannot reference nodes of other loads, so ``!gryaml.ref``
+    endpoints raise :exc:`ValueError`. They start by clearing the refs of
+    any script that failed before removing them, so must not be run
+    concurrently.
+    """
+    script = ScriptWriter(out)
+    plan = script.plan
+    next_ref = itertools.count()
+
+    def ref(key):
+        try:
+            return refs[key]
+        except KeyError:
+            raise ValueError('Cannot compile a relationship to %s: compiled'
+                             ' scripts do not support !gryaml.ref endpoints,'
+                             ' to nodes of other files' % (key,))
+
+    script.comment('Compiled by gryaml')
+    # Refs restart at 0, so clear any left by a script that failed midway
+    script.statement(cypher.remove_refs_statement())
+    script.statement(cypher.create_ref_index_statement(neo4j_version))
+    script.statement(u'CALL db.awaitIndexes()')
+
+    for stream in streams:
+        refs = {}  # type: Dict[Hashable, int]
+        document = 0
+        if format == 'yaml':
+            chunks = iter_chunks(stream, chunk_size,
+                                 anchor_window=anchor_window,
+                                 parser_class=parser_class)
+        else:
+            from .interchange import iter_chunks as iter_record_chunks
+            chunks = iter_record_chunks(stream, format, chunk_size)
+
+        for chunk in chunks:
+            if chunk.document != document:
+                refs.clear()  # Anchors are scoped to their document
+                document = chunk.document
+
+            script.begin()
+            for labels, specs in cypher.group_nodes(chunk.nodes).items():
+                rows = []
+                for spec in specs:
+                    refs[spec.key] = next(next_ref)
+                    rows.append({'ref': refs[spec.key],
+                                 'properties': arrays.plain(
+                                     spec.properties)})
+                script.statement(cypher.create_ref_nodes_statement(labels),
+                                 rows)
+            for reltype, specs in cypher.group_rels(chunk.rels).items():
+                script.statement(cypher.create_ref_rels_statement(reltype),
+                                 [{'head': ref(spec.head),
+                                   'tail': ref(spec.tail),
+                                   'properties': arrays.plain(
+                                       spec.properties)}
+                                  for spec in specs])
+            script.commit()
+
+            plan.nodes += len(chunk.nodes)
+            plan.rels += len(chunk.rels)
+            # Only anchored nodes can be referenced by later chunks
+            for key in [k for k in refs if isinstance(k, yaml.Node)]:
+                del refs[key]
+            for anchor in chunk.released:
+                refs.pop(anchor, None)
+
+    script.statement(cypher.remove_refs_statement())
+    script.statement(cypher.drop_ref_index_statement(neo4j_version))
+    script.comment(str(plan))
+    return plan
+
+
+def replay(stream, graph):
+    # type: (Iterable[str], Graph) -> int
+    """Run a script written by :func:`compile_load` against `graph`.
+
+    `graph` is a py2neo ``Graph`` or a :class:`~gryaml.backends.Backend`.
+    Returns the number of statements run.
+    """
+    backend = backend_for(graph)
+    parameters = {}
+    tx = None
+    count = 0
+
+    for line in stream:
+        line = line.strip()
+        if not line or line.startswith(u'//'):
+            continue
+        elif line == u':begin':
+            tx = backend.transaction()
+        elif line == u':commit':
+            tx.commit()
+            tx = None
+        elif line.startswith(u':param '):
+            name, _, value = line[len(u':param '):].partition(u'=>')
+            parameters[name.strip()] = cypher.parse_literal(value)
+        else:
+            statement = line.rstrip(u';')
+            if tx is None:
+                backend.run(statement, dict(parameters))
+            else:
+                tx.append(statement, dict(parameters))
+            count += 1
+
+    return count
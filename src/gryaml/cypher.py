@@ -0,0 +1,422 @@
+"""Cypher statements for writing batches of entity specs."""
+from __future__ import absolute_import
+
+import json
+import math
+import re
+from collections import OrderedDict
+
+try:
+    from typing import (  # noqa: F401
+        Any, Dict, Iterable, List, Optional, Tuple
+    )
+    from .model import NodeSpec, RelSpec  # noqa: F401
+except ImportError:
+    """Module :mod:`typing` not required for Py27-compatible type comments."""
+
+#: Parameter placeholder understood by Neo4j 2.x & 3.x over HTTP.
+LEGACY_PARAM = u'{rows}'
+#: Parameter placeholder for Neo4j 3.0+, as used by ``cypher-shell``.
+PARAM = u'$rows'
+
+#: Temporary label & property identifying nodes of a load by "ref" when
+#: their ids are not known in advance.
+REF_LABEL = u'_GryamlRef'
+REF_KEY = u'_gryaml_ref'
+
+#: Property keeping the anchor of a node written by a delta apply, which
+#: identifies it to later applies when it has no declared key.
+KEY = u'_gryaml_key'
+
+#: Property keeping the file & document scoping the anchor in :data:`KEY`,
+#: as anchors are only unique within a document.
+SCOPE = u'_gryaml_scope'
+
+#: Label & property tagging the entities of a load with its id, so that
+#: just they can be deleted again.
+LOAD_LABEL = u'_GryamlLoad'
+LOAD = u'_gryaml_load'
+
+#: First Neo4j version creating & dropping indexes by name, ``IF NOT
+#: EXISTS``; Neo4j 5 no longer accepts ``CREATE INDEX ON :Label(key)``.
+NAMED_INDEX_VERSION = (4, 1)
+
+
+def quote_name(name):
+    # type: (str) -> str
+    """Quote a label, relationship type or property key for Cypher."""
+    return u'`{}`'.format(name.replace(u'`', u'``'))
+
+
+def group_nodes(specs):
+    # type: (Iterable[NodeSpec]) -> Dict[Tuple[str, ...], List[NodeSpec]]
+    """Group node specs by label set, since labels cannot be parameters."""
+    groups = OrderedDict()  # type: Dict[Tuple[str, ...], List[NodeSpec]]
+    for spec in specs:
+        groups.setdefault(tuple(sorted(spec.labels)), []).append(spec)
+    return groups
+
+
+def group_rels(specs):
+    # type: (Iterable[RelSpec]) -> Dict[str, List[RelSpec]]
+    """Group relationship specs by type, since types cannot be parameters."""
+    groups = OrderedDict()  # type: Dict[str, List[RelSpec]]
+    for spec in specs:
+        groups.setdefault(spec.type, []).append(spec)
+    return groups
+
+
+def create_nodes_statement(labels, param=LEGACY_PARAM):
+    # type: (Iterable[str], str) -> str
+    """Statement creating one node per row of ``{ref, properties}``.
+
+    Returns the ``ref`` of each row with the id of the created node.
+    """
+    return (u'UNWIND {param} AS row'
+            u' CREATE (n{labels})'
+            u' SET n = row.properties'
+            u' RETURN row.ref, id(n)'
+            .format(param=param,
+                    labels=u''.join(u':' + quote_name(label)
+                                    for label in labels)))
+
+
+def create_rels_statement(reltype, param=LEGACY_PARAM):
+    # type: (str, str) -> str
+    """Statement creating one relationship per row.
+
+    Rows are ``{ref, head, tail, properties}``, where ``head`` and ``tail``
+    are the ids of existing nodes. Returns the ``ref`` of each row with the
+    id of the created relationship.
+    """
+    return (u'UNWIND {param} AS row'
+            u' MATCH (head) WHERE id(head) = row.head'
+            u' MATCH (tail) WHERE id(tail) = row.tail'
+            u' CREATE (head)-[r:{reltype}]->(tail)'
+            u' SET r = row.properties'
+            u' RETURN row.ref, id(r)'
+            .format(param=param, reltype=quote_name(reltype)))
+
+
+def create_index_statement(name, label, key, version=None):
+    # type: (str, str, str, Optional[Tuple[int, ...]]) -> str
+    """Statement indexing nodes of `label` by `key`, unless already indexed.
+
+    The syntax is that of Neo4j `version`, if given, and otherwise that of
+    versions before :data:`NAMED_INDEX_VERSION`, where the index is not
+    named.
+    """
+    if version is not None and tuple(version) >= NAMED_INDEX_VERSION:
+        return u'CREATE INDEX {} IF NOT EXISTS FOR (n:{}) ON (n.{})'.format(
+            quote_name(name), quote_name(label), quote_name(key))
+    return u'CREATE INDEX ON :{}({})'.format(quote_name(label),
+                                             quote_name(key))
+
+
+def drop_index_statement(name, label, key, version=None):
+    # type: (str, str, str, Optional[Tuple[int, ...]]) -> str
+    """Statement dropping an index of :func:`create_index_statement`."""
+    if version is not None and tuple(version) >= NAMED_INDEX_VERSION:
+        return u'DROP INDEX {} IF EXISTS'.format(quote_name(name))
+    return u'DROP INDEX ON :{}({})'.format(quote_name(label),
+                                           quote_name(key))
+
+
+def create_ref_index_statement(version=None):
+    # type: (Optional[Tuple[int, ...]]) -> str
+    """Statement indexing nodes by ref, for matching relationship endpoints.
+
+    See :func:`create_index_statement` for `version`.
+    """
+    return create_index_statement(u'gryaml_ref', REF_LABEL, REF_KEY, version)
+
+
+def create_ref_nodes_statement(labels, param=PARAM):
+    # type: (Iterable[str], str) -> str
+    """Statement creating one node per row of ``{ref, properties}``.
+
+    Nodes are temporarily labelled and keyed by ``ref``, rather than
+    returning ids, so relationships can be created without knowing them.
+    """
+    return (u'UNWIND {param} AS row'
+            u' CREATE (n{labels})'
+            u' SET n = row.properties, n.{key} = row.ref'
+            .format(param=param,
+                    key=quote_name(REF_KEY),
+                    labels=u''.join(u':' + quote_name(label)
+                                    for label in list(labels) + [REF_LABEL])))
+
+
+def create_ref_rels_statement(reltype, param=PARAM):
+    # type: (str, str) -> str
+    """Statement creating one relationship per row.
+
+    Rows are ``{head, tail, properties}``, where ``head`` and ``tail`` are
+    the refs of nodes created by :func:`create_ref_nodes_statement`.
+    """
+    return (u'UNWIND {param} AS row'
+            u' MATCH (head:{label} {{{key}: row.head}})'
+            u' MATCH (tail:{label} {{{key}: row.tail}})'
+            u' CREATE (head)-[r:{reltype}]->(tail)'
+            u' SET r = row.properties'
+            .format(param=param,
+                    label=quote_name(REF_LABEL),
+                    key=quote_name(REF_KEY),
+                    reltype=quote_name(reltype)))
+
+
+def remove_refs_statement():
+    # type: () -> str
+    """Statement removing the temporary ref label & property."""
+    return u'MATCH (n:{label}) REMOVE n:{label}, n.{key}'.format(
+        label=quote_name(REF_LABEL), key=quote_name(REF_KEY))
+
+
+def drop_ref_index_statement(version=None):
+    # type: (Optional[Tuple[int, ...]]) -> str
+    """Statement dropping the index created for refs."""
+    return drop_index_statement(u'gryaml_ref', REF_LABEL, REF_KEY, version)
+
+
+def managed_condition(var, labels_param, scopes_param):
+    # type: (str, str, str) -> str
+    """Condition on node `var` being keyed, by anchor or declared key label.
+
+    `labels_param` is the placeholder for the list of labels with keys, and
+    `scopes_param` for that of the scopes of the anchors to match.
+    """
+    return (u'(({var}.{key} IS NOT NULL AND {var}.{scope} IN {scopes}) OR'
+            u' any(l IN labels({var}) WHERE l IN {labels}))'
+            .format(var=var, key=quote_name(KEY), scope=quote_name(SCOPE),
+                    scopes=scopes_param, labels=labels_param))
+
+
+def match_managed_nodes_statement(labels_param, scopes_param):
+    # type: (str, str) -> str
+    """Statement returning the id, labels & properties of keyed nodes."""
+    return (u'MATCH (n) WHERE {}'
+            u' RETURN id(n), labels(n), properties(n)'
+            .format(managed_condition(u'n', labels_param, scopes_param)))
+
+
+def match_managed_rels_statement(labels_param, scopes_param):
+    # type: (str, str) -> str
+    """Statement returning the relationships between keyed nodes.
+
+    Rows are of the id, head id, type, tail id & properties of each.
+    """
+    return (u'MATCH (n)-[r]->(m) WHERE {} AND {}'
+            u' RETURN id(r), id(n), type(r), id(m), properties(r)'
+            .format(managed_condition(u'n', labels_param, scopes_param),
+                    managed_condition(u'm', labels_param, scopes_param)))
+
+
+def set_node_properties_statement(param=LEGACY_PARAM):
+    # type: (str) -> str
+    """Statement replacing node properties, per row of ``{id, properties}``."""
+    return (u'UNWIND {param} AS row'
+            u' MATCH (n) WHERE id(n) = row.id'
+            u' SET n = row.properties'.format(param=param))
+
+
+def set_label_statement(label, remove=False, param=LEGACY_PARAM):
+    # type: (str, bool, str) -> str
+    """Statement adding, or removing, `label` to nodes, per row of ids."""
+    return (u'UNWIND {param} AS id'
+            u' MATCH (n) WHERE id(n) = id'
+            u' {action} n:{label}'
+            .format(param=param, action=u'REMOVE' if remove else u'SET',
+                    label=quote_name(label)))
+
+
+def set_rel_properties_statement(param=LEGACY_PARAM):
+    # type: (str) -> str
+    """Statement replacing rel properties, per row of ``{id, properties}``."""
+    return (u'UNWIND {param} AS row'
+            u' MATCH ()-[r]->() WHERE id(r) = row.id'
+            u' SET r = row.properties'.format(param=param))
+
+
+def delete_rels_statement(param=LEGACY_PARAM):
+    # type: (str) -> str
+    """Statement deleting relationships, per row of ids."""
+    return (u'UNWIND {param} AS id'
+            u' MATCH ()-[r]->() WHERE id(r) = id'
+            u' DELETE r'.format(param=param))
+
+
+def delete_nodes_statement(param=LEGACY_PARAM):
+    # type: (str) -> str
+    """Statement deleting nodes & their relationships, per row of ids."""
+    return (u'UNWIND {param} AS id'
+            u' MATCH (n) WHERE id(n) = id'
+            u' DETACH DELETE n'.format(param=param))
+
+
+def create_load_index_statement(version=None):
+    # type: (Optional[Tuple[int, ...]]) -> str
+    """Statement indexing nodes by load id.
+
+    See :func:`create_index_statement` for `version`.
+    """
+    return create_index_statement(u'gryaml_load', LOAD_LABEL, LOAD, version)
+
+
+def delete_load_nodes_statement(load_param, limit_param):
+    # type: (str, str) -> str
+    """Statement deleting a batch of the nodes of a load, returning how many.
+
+    Their relationships are deleted with them.
+    """
+    return (u'MATCH (n:{label}) WHERE n.{key} = {load}'
+            u' WITH n LIMIT {limit}'
+            u' DETACH DELETE n'
+            u' RETURN count(*)'
+            .format(label=quote_name(LOAD_LABEL), key=quote_name(LOAD),
+                    load=load_param, limit=limit_param))
+
+
+def delete_load_rels_statement(load_param, limit_param):
+    # type: (str, str) -> str
+    """Statement deleting a batch of the relationships of a load.
+
+    This reads every relationship, lacking an index, and returns how many
+    it deleted.
+    """
+    return (u'MATCH ()-[r]->() WHERE r.{key} = {load}'
+            u' WITH r LIMIT {limit}'
+            u' DELETE r'
+            u' RETURN count(*)'
+            .format(key=quote_name(LOAD), load=load_param,
+                    limit=limit_param))
+
+
+def match_nodes_statement(param=LEGACY_PARAM):
+    # type: (str) -> str
+    """Statement returning the id, labels & properties of nodes, by id."""
+    return (u'UNWIND {param} AS id'
+            u' MATCH (n) WHERE id(n) = id'
+            u' RETURN id(n), labels(n), properties(n)'.format(param=param))
+
+
+def expand_statement(rel_types=None, param=LEGACY_PARAM):
+    # type: (Optional[List[str]], str) -> str
+    """Statement returning the relationships of nodes, by id, either way.
+
+    Only relationships of `rel_types` are returned, if given. Rows are of
+    the id, head id, type, tail id & properties of each; those between the
+    nodes given are returned twice.
+    """
+    types = u':' + u'|'.join(quote_name(t) for t in rel_types) \
+        if rel_types else u''
+    return (u'UNWIND {param} AS id'
+            u' MATCH (n)-[r{types}]-() WHERE id(n) = id'
+            u' RETURN id(r), id(startNode(r)), type(r), id(endNode(r)),'
+            u' properties(r)'.format(param=param, types=types))
+
+
+def scan_nodes_statement(load_param=None):
+    # type: (Optional[str]) -> str
+    """Statement returning every node, in no particular order.
+
+    Rows are of the id, labels & properties of each. Given `load_param`,
+    only the nodes of that load are returned.
+    """
+    match = (u'MATCH (n:{label}) WHERE n.{key} = {load}'
+             .format(label=quote_name(LOAD_LABEL), key=quote_name(LOAD),
+                     load=load_param)
+             if load_param else u'MATCH (n)')
+    return u'{} RETURN id(n), labels(n), properties(n)'.format(match)
+
+
+def scan_rels_statement(load_param=None):
+    # type: (Optional[str]) -> str
+    """Statement returning every relationship, in no particular order.
+
+    Rows are of the id, head id, type, tail id & properties of each. Given
+    `load_param`, only those between nodes of that load are returned.
+    """
+    match = (u'MATCH (a:{label})-[r]->(b:{label})'
+             u' WHERE a.{key} = {load} AND b.{key} = {load}'
+             .format(label=quote_name(LOAD_LABEL), key=quote_name(LOAD),
+                     load=load_param)
+             if load_param else u'MATCH (a)-[r]->(b)')
+    return (u'{} RETURN id(r), id(a), type(r), id(b), properties(r)'
+            .format(match))
+
+
+def literal(value):
+    # type: (Any) -> str
+    """Render a parameter value as a Cypher literal.
+
+    Strings are double-quoted, using JSON escapes which Cypher shares.
+    """
+    if value is None or isinstance(value, bool):
+        return json.dumps(value)
+    if isinstance(value, float):
+        if math.isnan(value) or math.isinf(value):
+            raise ValueError('Cannot represent %r in Cypher' % value)
+        return repr(value)
+    if isinstance(value, (int, float)) or type(value).__name__ == 'long':
+        return str(int(value))
+    if isinstance(value, dict):
+        return u'{' + u', '.join(u'{}: {}'.format(quote_name(k), literal(v))
+                                 for k, v in value.items()) + u'}'
+    if isinstance(value, (list, tuple)):
+        return u'[' + u', '.join(literal(v) for v in value) + u']'
+    return json.dumps(value)
+
+
+_LITERAL_TOKENS = re.compile(r'''
+    \s*(?:
+        (?P<punct>[][{},:])
+      | (?P<name>`(?:[^`]|``)*`)
+      | (?P<string>"(?:[^"\\]|\\.)*")
+      | (?P<scalar>[-+.\w]+)
+    )''', re.VERBOSE)
+
+
+def parse_literal(text):
+    # type: (str) -> Any
+    """Parse a Cypher literal as rendered by :func:`literal`."""
+    tokens = []
+    pos = 0
+    text = text.strip()
+    while pos < len(text):
+        match = _LITERAL_TOKENS.match(text, pos)
+        if not match:
+            raise ValueError('Unexpected Cypher literal at %r'
+                             % text[pos:pos + 20])
+        tokens.append((match.lastgroup, match.group(match.lastgroup)))
+        pos = match.end()
+
+    tokens.reverse()
+
+    def parse():
+        kind, token = tokens.pop()
+        if token == u'[':
+            items = []
+            while tokens[-1][1] != u']':
+                items.append(parse())
+                if tokens[-1][1] == u',':
+                    tokens.pop()
+            tokens.pop()
+            return items
+        if token == u'{':
+            mapping = {}
+            while tokens[-1][1] != u'}':
+                _, key = tokens.pop()
+                tokens.pop()  # ':'
+                mapping[key[1:-1].replace(u'``', u'`')] = parse()
+                if tokens[-1][1] == u',':
+                    tokens.pop()
+            tokens.pop()
+            return mapping
+        if kind in ('string', 'scalar'):
+            return json.loads(token)
+        raise ValueError('Unexpected %r in Cypher literal' % token)
+
+    value = parse()
+    if tokens:
+        raise ValueError('Trailing data in Cypher literal')
+    return value
@@ -0,0 +1,349 @@
+"""Sync a graph to gryaml YAML with the fewest writes, rather than reload it.
+
+The entities of a document are matched with those already in the graph, and
+only the differences written: nodes & relationships to create, properties
+& labels to change, and entities to delete.
+
+Nodes are identified by a declared key, a label & the properties which
+identify nodes with it (e.g., ``{'Person': ['name']}``), or failing that by
+their anchor, scoped by the file & document it is in. Nodes created by a
+delta, or by a load keeping anchors, keep their anchor in the property
+:data:`~gryaml.cypher.KEY` & its scope in :data:`~gryaml.cypher.SCOPE`, so
+later deltas of the same files can find them; nodes with neither are
+errors. Only nodes so identified, those with declared keys or anchors of
+the files compared, and relationships between them, are compared, so the
+rest of the graph is left alone.
+
+Relationships are identified by their endpoints & type, then paired by
+their properties, so changing the properties of a relationship updates it
+in place.
+
+The document's entities are held in memory, keyed by identity, whereas the
+graph's are compared as they are read.
+"""
+from __future__ import absolute_import
+
+from collections import OrderedDict
+
+try:
+    from typing import (  # noqa: F401
+        Any, Dict, Hashable, IO, Iterator, List, Mapping, Optional, Set,
+        Tuple, Union, TYPE_CHECKING
+    )
+except ImportError:
+    """Module :mod:`typing` not required for Py27-compatible type comments."""
+    TYPE_CHECKING = False
+
+if TYPE_CHECKING:
+    from py2neo_compat import Graph  # noqa: F401
+
+    #: Identity of a node: ``(label, values)`` of a declared key, or
+    #: ``(None, (scope, anchor))``.
+    Identity = Tuple[Optional[str], Hashable]
+
+import yaml
+
+from . import arrays, loader
+from .backends import backend_for
+from .cypher import KEY, SCOPE
+from .model import Changes, NodeSpec, RelSpec
+
+
+def identify(labels, properties, anchor, keys):
+    # type: (List[str], Mapping[str, Any], Optional[Tuple[Optional[str], str]], Mapping[str, List[str]]) -> Optional[Identity]  # noqa: E501
+    """Identity of a node, or ``None`` if it has none.
+
+    The first of its `labels` with `keys` declared, and all their
+    properties, gives the identity; otherwise the `anchor`, with its scope
+    as ``(scope, anchor)``.
+    """
+    for label in sorted(labels):
+        names = keys.get(label)
+        if names and all(name in properties for name in names):
+            return label, tuple(loader.freeze(properties[name])
+                                for name in names)
+    return (None, anchor) if anchor is not None else None
+
+
+class Document(object):
+    """The entities of one or more documents, by identity.
+
+    Several files may be read into one, so ``!gryaml.ref`` endpoints can
+    reference nodes of each other, by an anchor which must then be unique
+    among them.
+    """
+
+    def __init__(self, keys=None):
+        # type: (Optional[Mapping[str, List[str]]]) -> None
+        self.keys = keys or {}
+        self.nodes = OrderedDict()  # type: Dict[Identity, Tuple[List[str], Dict[str, Any]]]  # noqa: E501
+        self.rels = OrderedDict()  # type: Dict[Tuple[Identity, str, Identity], List[Dict[str, Any]]]  # noqa: E501
+        #: Scopes of the documents read, by :func:`~gryaml.loader.anchor_scope`
+        self.scopes = set()  # type: Set[str]
+
+    def read(self, stream, parser_class=loader.EventParser, format='yaml',
+             source=None):
+        # type: (Union[str, IO], type, str, Optional[str]) -> Document
+        """Add the entities of `stream`; see :func:`~gryaml.loader.load`.
+
+        Anchors are scoped by the name of the `source` file & document.
+        """
+        if format == 'yaml':
+            chunks = loader.iter_chunks(stream, parser_class=parser_class)
+        else:
+            from .interchange import iter_chunks as iter_record_chunks
+            chunks = iter_record_chunks(stream, format)
+
+        identities = {}  # type: Dict[Hashable, Identity]
+        document = 0
+        for chunk in chunks:
+            if chunk.document != document:
+                identities.clear()  # Anchors are scoped to their document
+                document = chunk.document
+            scope = loader.anchor_scope(source, chunk.document)
+            self.scopes.add(scope)
+            for spec in chunk.nodes:
+                identities[spec.key] = self.add_node(spec, scope)
+            for spec in chunk.rels:
+                # Others are references, resolved once all files are read
+                head, tail = [identities.get(key) or
+                              (None, (None, loader.anchor_of(key)))
+                              for key in (spec.head, spec.tail)]
+                self.rels.setdefault((head, spec.type, tail), []).append(
+                    dict(arrays.plain(spec.properties)))
+            # Only anchored nodes can be referenced by later chunks
+            for key in [k for k in identities if k is None or
+                        isinstance(k, yaml.Node)]:
+                del identities[key]
+        return self
+
+    def add_node(self, spec, scope=loader.anchor_scope(None, 0)):
+        # type: (NodeSpec, str) -> Identity
+        """Add a node, its anchor in `scope`, returning its identity.
+
+        Nodes with the same identity must be the same.
+        """
+        anchor = loader.anchor_of(spec.key)
+        identity = identify(spec.labels, spec.properties,
+                            None if anchor is None else (scope, anchor),
+                            self.keys)
+        if identity is None:
+            raise ValueError('Node %r has neither an anchor nor a declared'
+                             ' key' % (spec.properties,))
+        properties = dict(arrays.plain(spec.properties))
+        if identity[0] is None:
+            properties[KEY] = anchor
+            properties[SCOPE] = scope
+        node = sorted(spec.labels), properties
+        if self.nodes.setdefault(identity, node) != node:
+            raise ValueError('Nodes identified by %r differ' % (identity,))
+        return identity
+
+    def resolved_rels(self):
+        # type: () -> Dict[Tuple[Identity, str, Identity], List[Dict[str, Any]]]  # noqa: E501
+        """:attr:`rels` with their ``!gryaml.ref`` endpoints resolved.
+
+        Each references the node of that anchor in any document read,
+        which must be the only one.
+        """
+        anchored = {}  # type: Dict[str, List[Identity]]
+        for identity in self.nodes:
+            if identity[0] is None:
+                anchored.setdefault(identity[1][1], []).append(identity)
+
+        def resolve(endpoint):
+            if endpoint[0] is not None or endpoint[1][0] is not None:
+                return endpoint
+            matches = anchored.get(endpoint[1][1], [])
+            if len(matches) > 1:
+                raise ValueError('Reference to %r is ambiguous among %s'
+                                 % (endpoint[1][1], ', '.join(
+                                     sorted(scope for _, (scope, _)
+                                            in matches))))
+            return matches[0] if matches else endpoint
+
+        rels = OrderedDict()  # type: Dict[Tuple[Identity, str, Identity], List[Dict[str, Any]]]  # noqa: E501
+        for (head, reltype, tail), properties in self.rels.items():
+            rels.setdefault((resolve(head), reltype, resolve(tail)),
+                            []).extend(properties)
+        return rels
+
+
+class Delta(object):
+    """The writes syncing a graph with a :class:`Document`."""
+
+    def __init__(self):
+        # type: () -> None
+        self.create_nodes = []  # type: List[NodeSpec]
+        self.create_rels = []  # type: List[RelSpec]
+        self.node_properties = []  # type: List[Tuple[int, Dict[str, Any]]]
+        self.add_labels = []  # type: List[Tuple[str, int]]
+        self.remove_labels = []  # type: List[Tuple[str, int]]
+        self.rel_properties = []  # type: List[Tuple[int, Dict[str, Any]]]
+        self.delete_rels = []  # type: List[int]
+        self.delete_nodes = []  # type: List[int]
+        #: Ids of the document's nodes in the graph, by identity.
+        self.ids = {}  # type: Dict[Identity, int]
+
+    def __len__(self):
+        # type: () -> int
+        """The number of writes."""
+        return sum(len(getattr(self, name)) for name in (
+            'create_nodes', 'create_rels', 'node_properties', 'add_labels',
+            'remove_labels', 'rel_properties', 'delete_rels',
+            'delete_nodes'))
+
+    def __str__(self):
+        # type: () -> str
+        return ('nodes: {} created, {} updated, {} deleted;'
+                ' relationships: {} created, {} updated, {} deleted'
+                .format(len(self.create_nodes),
+                        len({id_ for id_, _ in self.node_properties} |
+                            {id_ for _, id_ in self.add_labels} |
+                            {id_ for _, id_ in self.remove_labels}),
+                        len(self.delete_nodes), len(self.create_rels),
+                        len(self.rel_properties), len(self.delete_rels)))
+
+    @classmethod
+    def compare(cls, document, graph):
+        # type: (Document, Graph) -> Delta
+        """The delta from what is in `graph` to `document`."""
+        delta = cls()
+        backend = backend_for(graph)
+        key_labels = sorted(document.keys)
+        scopes = sorted(document.scopes)
+        wanted = document.resolved_rels()
+
+        identities = {}  # type: Dict[int, Identity]
+        for id_, labels, properties in backend.managed_nodes(key_labels,
+                                                             scopes):
+            anchor = properties.get(KEY)
+            identity = identify(labels, properties,
+                                None if anchor is None
+                                else (properties.get(SCOPE), anchor),
+                                document.keys)
+            if identity is None:
+                continue  # Missing some of its key; not ours to touch
+            if identity not in document.nodes or identity in delta.ids:
+                delta.delete_nodes.append(id_)
+                continue
+            delta.ids[identity] = id_
+            identities[id_] = identity
+            want_labels, want_properties = document.nodes[identity]
+            if properties != want_properties:
+                delta.node_properties.append((id_, want_properties))
+            delta.add_labels.extend((label, id_) for label in want_labels
+                                    if label not in labels)
+            delta.remove_labels.extend((label, id_) for label in labels
+                                       if label not in want_labels)
+
+        delta.create_nodes = [NodeSpec(identity, labels, properties)
+                              for identity, (labels, properties)
+                              in document.nodes.items()
+                              if identity not in delta.ids]
+        for head, reltype, tail in wanted:
+            for endpoint in head, tail:
+                if endpoint not in document.nodes:
+                    raise ValueError('Endpoint %r of %s relationship is not'
+                                     ' among the nodes' % (endpoint, reltype))
+
+        rels = {}  # type: Dict[Tuple[Identity, str, Identity], List[Tuple[int, Dict[str, Any]]]]  # noqa: E501
+        for id_, head, reltype, tail, properties in \
+                backend.managed_rels(key_labels, scopes):
+            if head in identities and tail in identities:
+                rels.setdefault((identities[head], reltype,
+                                 identities[tail]), []).append(
+                                     (id_, properties))
+
+        for rel in list(wanted) + [rel for rel in rels if rel not in wanted]:
+            delta.pair_rels(rel, list(wanted.get(rel, [])),
+                            rels.get(rel, []))
+        return delta
+
+    def pair_rels(self, rel, wanted, found):
+        # type: (Tuple[Identity, str, Identity], List[Dict[str, Any]], List[Tuple[int, Dict[str, Any]]]) -> None  # noqa: E501
+        """Pair the `wanted` & `found` relationships of the same ends & type.
+
+        Those the same are left alone, the rest updated, created or deleted.
+        """
+        unmatched = []  # type: List[Tuple[int, Dict[str, Any]]]
+        for id_, properties in found:
+            if properties in wanted:
+                wanted.remove(properties)
+            else:
+                unmatched.append((id_, properties))
+        for (id_, _), properties in zip(unmatched, wanted):
+            self.rel_properties.append((id_, properties))
+        head, reltype, tail = rel
+        self.create_rels.extend(RelSpec(None, head, reltype, tail, properties)
+                                for properties in wanted[len(unmatched):])
+        self.delete_rels.extend(id_ for id_, _ in unmatched[len(wanted):])
+
+    def changes(self, size):
+        # type: (int) -> Iterator[Changes]
+        """The updates & deletions, in batches of `size` writes."""
+        def batches(name):
+            items = getattr(self, name)
+            return [items[start:start + size]
+                    for start in range(0, len(items), size)]
+
+        def by_label(pairs):
+            labels = OrderedDict()  # type: Dict[str, List[int]]
+            for label, id_ in pairs:
+                labels.setdefault(label, []).append(id_)
+            return labels
+
+        empty = Changes([], {}, {}, [], [], [])
+        for batch in batches('delete_rels'):
+            yield empty._replace(delete_rels=batch)
+        for batch in batches('delete_nodes'):
+            yield empty._replace(delete_nodes=batch)
+        for batch in batches('node_properties'):
+            yield empty._replace(node_properties=batch)
+        for batch in batches('add_labels'):
+            yield empty._replace(add_labels=by_label(batch))
+        for batch in batches('remove_labels'):
+            yield empty._replace(remove_labels=by_label(batch))
+        for batch in batches('rel_properties'):
+            yield empty._replace(rel_properties=batch)
+
+    def write(self, graph, chunk_size=loader.DEFAULT_CHUNK_SIZE,
+              retries=loader.DEFAULT_RETRIES, backoff=loader.DEFAULT_BACKOFF):
+        # type: (Graph, int, int, float) -> None
+        """Write the delta to `graph` in transactions of `chunk_size` writes.
+
+        Deletions come first, then updates, then creations. Each transaction
+        is retried on transient errors, as by :func:`~gryaml.loader.load`.
+        """
+        backend = backend_for(graph)
+
+        def retry(func):
+            return loader.retry(func, retries=retries, backoff=backoff,
+                                errors=backend.transient_errors())
+
+        for changes in self.changes(chunk_size):
+            retry(lambda: backend.write_changes(changes))
+        for start in range(0, len(self.create_nodes), chunk_size):
+            nodes = self.create_nodes[start:start + chunk_size]
+            self.ids.update(retry(lambda: backend.write_chunk(nodes, [],
+                                                              self.ids)))
+        for start in range(0, len(self.create_rels), chunk_size):
+            rels = self.create_rels[start:start + chunk_size]
+            retry(lambda: backend.write_chunk([], rels, self.ids))
+
+
+def apply(stream, graph, keys=None, chunk_size=loader.DEFAULT_CHUNK_SIZE,
+          dry_run=False, parser_class=loader.EventParser, format='yaml',
+          source=None):
+    # type: (Union[str, IO], Graph, Optional[Mapping[str, List[str]]], int, bool, type, str, Optional[str]) -> Delta  # noqa: E501
+    """Sync `graph` to the gryaml of `stream`, returning the delta written.
+
+    `keys` are the property names identifying nodes, by label. Anchors are
+    scoped by the name of the `source` file; see :meth:`Document.read`.
+    With `dry_run`, the delta is only computed.
+    """
+    document = Document(keys).read(stream, parser_class, format, source)
+    delta = Delta.compare(document, graph)
+    if not dry_run:
+        delta.write(graph, chunk_size)
+    return delta
@@ -0,0 +1,152 @@
+"""Order-independent fingerprints of graphs, for cheap equality checks.
+
+A node's digest hashes its sorted labels & canonical properties; a
+relationship's hashes its type, properties and the digests of its
+endpoints. The fingerprint of a graph combines the digests of all its
+nodes & relationships by adding them modulo 2\\ :sup:`256`, a multiset
+hash, so neither the order they are read in nor the ids they are given
+matter, and it is computed as they stream past.
+
+The same fingerprint is computed from gryaml YAML by :func:`of_yaml`,
+without a database, and from a database by :func:`of_graph`, streaming
+compact rows from a query each for nodes & relationships and keeping only
+a digest per node, so a test can compare a loaded fixture to its file
+without transferring and diffing the whole graph.
+
+Labels & properties gryaml uses for bookkeeping, such as load ids, are
+ignored. Nodes with equal labels & properties are indistinguishable, so
+swapping the relationships of such nodes keeps the fingerprint.
+"""
+from __future__ import absolute_import
+
+import hashlib
+import json
+
+import yaml
+
+try:
+    from typing import (  # noqa: F401
+        Any, Dict, Hashable, IO, Iterable, List, Mapping, Optional, Union
+    )
+except ImportError:
+    """Module :mod:`typing` not required for Py27-compatible type comments."""
+
+from . import arrays
+from .backends import backend_for
+from .cypher import KEY, LOAD, LOAD_LABEL, REF_KEY, REF_LABEL, SCOPE
+from .loader import DEFAULT_CHUNK_SIZE, EventParser, iter_chunks
+
+#: Labels & property keys of gryaml's own, left out of digests.
+INTERNAL_LABELS = frozenset([LOAD_LABEL, REF_LABEL])
+INTERNAL_KEYS = frozenset([KEY, LOAD, REF_KEY, SCOPE])
+
+MODULUS = 1 << 256
+
+
+def canonical(value):
+    # type: (Any) -> bytes
+    """Canonical JSON encoding of `value`, with sorted keys."""
+    return json.dumps(value, sort_keys=True, separators=(',', ':'),
+                      default=str).encode('ascii')
+
+
+def digest(kind, value):
+    # type: (bytes, Any) -> int
+    """Digest of `value` as an entity of `kind`, as an integer."""
+    return int(hashlib.sha256(kind + canonical(value)).hexdigest(), 16)
+
+
+def public_properties(properties):
+    # type: (Mapping[str, Any]) -> Dict[str, Any]
+    """`properties` without gryaml's own, with arrays as lists.
+
+    Null properties are dropped too, as Neo4j does not store them.
+    """
+    return arrays.plain({key: value for key, value in properties.items()
+                         if key not in INTERNAL_KEYS and value is not None})
+
+
+class Fingerprint(object):
+    """Running fingerprint of the nodes & relationships added to it."""
+
+    def __init__(self):
+        # type: () -> None
+        self.nodes = 0
+        self.rels = 0
+        self.total = 0
+
+    def add_node(self, labels, properties):
+        # type: (Iterable[str], Mapping[str, Any]) -> int
+        """Add a node, returning its digest for its relationships."""
+        node_digest = digest(b'n', [
+            sorted(label for label in labels
+                   if label not in INTERNAL_LABELS),
+            public_properties(properties)])
+        self.nodes += 1
+        self.total = (self.total + node_digest) % MODULUS
+        return node_digest
+
+    def add_rel(self, head, reltype, tail, properties):
+        # type: (int, str, int, Mapping[str, Any]) -> None
+        """Add a relationship between nodes of digests `head` & `tail`."""
+        self.rels += 1
+        self.total = (self.total + digest(b'r', [
+            head, reltype, tail, public_properties(properties)])) % MODULUS
+
+    def hexdigest(self):
+        # type: () -> str
+        """The fingerprint, as hex."""
+        return hashlib.sha256(canonical(
+            [self.nodes, self.rels, '%064x' % self.total])).hexdigest()
+
+
+def of_yaml(stream, parser_class=EventParser,
+            chunk_size=DEFAULT_CHUNK_SIZE):
+    # type: (Union[str, IO], type, int) -> str
+    """The fingerprint of the graph gryaml YAML `stream` would load.
+
+    Relationships with ``!gryaml.ref`` endpoints, to nodes of other files,
+    are left out, as are those of a database outside the subgraph.
+    """
+    fingerprint = Fingerprint()
+    digests = {}  # type: Dict[Hashable, int]
+    document = 0
+    for chunk in iter_chunks(stream, chunk_size, parser_class=parser_class):
+        if chunk.document != document:
+            digests.clear()  # Anchors are scoped to their document
+            document = chunk.document
+        for node in chunk.nodes:
+            digests[node.key] = fingerprint.add_node(node.labels,
+                                                     node.properties)
+        for rel in chunk.rels:
+            if rel.head in digests and rel.tail in digests:
+                fingerprint.add_rel(digests[rel.head], rel.type,
+                                    digests[rel.tail], rel.properties)
+        # Only anchored nodes can be referenced by later chunks
+        for key in [k for k in digests if isinstance(k, yaml.Node)]:
+            del digests[key]
+        for anchor in chunk.released:
+            digests.pop(anchor, None)
+    return fingerprint.hexdigest()
+
+
+def of_graph(graph, load_id=None):
+    # type: (Any, Optional[str]) -> str
+    """The fingerprint of `graph`, or of the subgraph of load `load_id`.
+
+    Nodes & then relationships are streamed by a query each, in whatever
+    order the database reads them, as the fingerprint does not depend on
+    it. The subgraph of a load is its nodes & the relationships between
+    them, as tagged by ``loader.load(..., load_id=...)``.
+    """
+    backend = backend_for(graph)
+    fingerprint = Fingerprint()
+    digests = {}  # type: Dict[int, int]
+
+    for id_, labels, properties in backend.scan_nodes(load_id):
+        digests[id_] = fingerprint.add_node(labels, properties)
+    for _, head, reltype, tail, properties in backend.scan_rels(load_id):
+        fingerprint.add_rel(digests[head], reltype, digests[tail],
+                            properties)
+
+    return fingerprint.hexdigest()
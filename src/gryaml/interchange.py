@@ -0,0 +1,807 @@
+"""Interchange formats for the gryaml graph model: JSON Lines & MessagePack.
+
+These hold the same nodes & relationships as gryaml YAML, but as a flat
+stream of records, one per entity, which parse far faster. Records are
+mappings of one of these forms, as JSON objects, one per line, or as
+consecutive MessagePack maps::
+
+    {"node": 1, "labels": ["Person"], "properties": {"name": "Keanu"}}
+    {"rel": null, "head": 1, "type": "ACTED_IN", "tail": "matrix",
+     "properties": {"roles": ["Neo"]}}
+    {"document": 1}
+
+Nodes are keyed by an integer or string, which relationships use for their
+endpoints; a node must precede the relationships referencing it. Converted
+from YAML, anchors are the keys of anchored entities, while other nodes get
+integers. ``labels``, ``properties`` and a relationship's own key are
+optional. A ``document`` record starts the next document, as ``---`` does
+in YAML; keys are scoped to their document, like anchors.
+
+Converted to YAML, integer keys become anchors ``n<key>``, and string keys
+which are not valid anchors, or which look like those of integers or of
+escaped keys, are escaped as ``_`` & the hex of their UTF-8; see
+:func:`key_anchor`. Converting back undoes this, so keys survive the
+round trip.
+
+Neither format has dates, so date & datetime property values, which YAML
+timestamps load as, are written as maps tagged by their type, which
+properties cannot otherwise hold, and read back as dates & datetimes::
+
+    {"node": 1, "properties": {"born": {"$date": "1964-09-02"}}}
+"""
+from __future__ import absolute_import, print_function
+
+import io
+import itertools
+import binascii
+import datetime
+import json
+import os
+import re
+import weakref
+from collections import OrderedDict
+
+import yaml
+from yaml.constructor import SafeConstructor
+from yaml.events import DocumentEndEvent, DocumentStartEvent
+from yaml.events import SequenceEndEvent, SequenceStartEvent
+from yaml.nodes import MappingNode, ScalarNode, SequenceNode
+
+try:
+    from typing import (  # noqa: F401
+        Any, Callable, Dict, Hashable, IO, Iterable, Iterator, List, Optional,
+        Set, Tuple, Union
+    )
+except ImportError:
+    """Module :mod:`typing` not required for Py27-compatible type comments."""
+
+from . import arrays
+from ._py2neo import PREFETCH_SIZE
+from .loader import DEFAULT_CHUNK_SIZE, Chunk, EventParser
+from .loader import iter_chunks as iter_yaml_chunks
+from .model import NodeSpec, RelSpec
+from .pyyaml import edges_tag, node_tag, path_tag, ref_tag, rel_tag
+
+#: Formats by file extension.
+EXTENSIONS = {
+    '.jsonl': 'jsonl',
+    '.ndjson': 'jsonl',
+    '.msgpack': 'msgpack',
+    '.mpk': 'msgpack',
+}
+
+#: Format names, including YAML itself.
+FORMATS = ('yaml', 'jsonl', 'msgpack')
+
+#: Most rows in a ``!gryaml.edges`` table emitted by :class:`RecordEmitter`.
+EDGES_ROWS = 1000
+
+
+def format_of(path):
+    # type: (str) -> str
+    """The format of the file at `path`, by its extension."""
+    return EXTENSIONS.get(os.path.splitext(path)[1].lower(), 'yaml')
+
+
+def is_binary(format):
+    # type: (str) -> bool
+    """Whether files of `format` must be opened in binary mode."""
+    return format == 'msgpack'
+
+
+def read_jsonl(stream):
+    # type: (Iterable[str]) -> Iterator[Dict[str, Any]]
+    """Read records from lines of JSON, skipping blank lines."""
+    for line in stream:
+        if line.strip():
+            yield json.loads(line)
+
+
+def read_msgpack(stream):
+    # type: (IO) -> Iterator[Dict[str, Any]]
+    """Read records from a binary stream of MessagePack maps."""
+    import msgpack
+    for record in msgpack.Unpacker(stream, raw=False):
+        yield record
+
+
+#: Characters of YAML anchors.
+ANCHOR = re.compile(r'[0-9A-Za-z_-]+$')
+#: Anchors of integer keys.
+INT_ANCHOR = re.compile(r'n(-?(?:0|[1-9][0-9]*))$')
+#: Anchors of escaped string keys.
+ESCAPED_ANCHOR = re.compile(r'_((?:[0-9a-f]{2})+)$')
+
+
+def anchor_key(anchor):
+    # type: (str) -> Union[int, str]
+    """The record key of YAML `anchor`; see :func:`key_anchor`."""
+    match = INT_ANCHOR.match(anchor)
+    if match:
+        return int(match.group(1))
+    match = ESCAPED_ANCHOR.match(anchor)
+    if match:
+        try:
+            return binascii.unhexlify(match.group(1)).decode('utf-8')
+        except UnicodeDecodeError:
+            pass
+    return anchor
+
+
+def key_anchor(key):
+    # type: (Union[int, str]) -> str
+    """The YAML anchor of record `key`, from which :func:`anchor_key` gets
+    it back.
+
+    Integer keys are ``n<key>``. String keys are themselves if they are
+    valid anchors not of those forms, else escaped.
+    """
+    if isinstance(key, int):
+        return u'n{}'.format(key)
+    if ANCHOR.match(key) and anchor_key(key) == key:
+        return key
+    return u'_' + binascii.hexlify(key.encode('utf-8')).decode('ascii')
+
+
+#: Keys of the maps of encoded property values, by type.
+VALUE_TAGS = OrderedDict([(datetime.datetime, u'$datetime'),
+                          (datetime.date, u'$date')])
+
+
+def encode_value(value):
+    # type: (Any) -> Any
+    """Property `value` as records hold it; see :func:`decode_value`."""
+    if isinstance(value, list):
+        return [encode_value(item) for item in value]
+    for type_, tag in VALUE_TAGS.items():
+        if isinstance(value, type_):
+            return {tag: value.isoformat()}
+    return value
+
+
+def decode_value(value):
+    # type: (Any) -> Any
+    """Property `value` from a record; see :func:`encode_value`.
+
+    Encoded values are parsed as YAML timestamps are.
+    """
+    if isinstance(value, list):
+        return [decode_value(item) for item in value]
+    if isinstance(value, dict) and len(value) == 1:
+        (tag, text), = value.items()
+        if tag in VALUE_TAGS.values():
+            return SafeConstructor().construct_yaml_timestamp(
+                ScalarNode(u'tag:yaml.org,2002:timestamp', text))
+    return value
+
+
+def plain_record(record):
+    # type: (Dict[str, Any]) -> Dict[str, Any]
+    """`record` with arrays among its properties as lists, and dates &
+    datetimes encoded; see :func:`encode_value`.
+    """
+    if 'properties' not in record:
+        return record
+    return dict(record, properties={
+        name: encode_value(value)
+        for name, value in arrays.plain(record['properties']).items()})
+
+
+def record_properties(record):
+    # type: (Dict[str, Any]) -> Dict[str, Any]
+    """The properties of `record`, with encoded values decoded."""
+    return {name: decode_value(value)
+            for name, value in (record.get('properties') or {}).items()}
+
+
+class JsonLinesWriter(object):
+    """Write records as lines of JSON to a text stream."""
+
+    def __init__(self, stream):
+        # type: (IO) -> None
+        self.stream = stream
+
+    def write(self, record):
+        # type: (Dict[str, Any]) -> None
+        """Write one record."""
+        self.stream.write(u'{}\n'.format(json.dumps(plain_record(record),
+                                                    separators=(',', ':'))))
+
+
+class MsgpackWriter(object):
+    """Write records as MessagePack maps to a binary stream."""
+
+    def __init__(self, stream):
+        # type: (IO) -> None
+        import msgpack
+        self.stream = stream
+        self.packer = msgpack.Packer(use_bin_type=True)
+
+    def write(self, record):
+        # type: (Dict[str, Any]) -> None
+        """Write one record."""
+        self.stream.write(self.packer.pack(plain_record(record)))
+
+
+def read_records(stream, format='jsonl'):
+    # type: (IO, str) -> Iterator[Dict[str, Any]]
+    """Read the records of `stream` in `format`."""
+    if format == 'jsonl':
+        return read_jsonl(stream)
+    elif format == 'msgpack':
+        return read_msgpack(stream)
+    raise ValueError('Unknown interchange format %r' % format)
+
+
+def record_writer(stream, format='jsonl'):
+    # type: (IO, str) -> Union[JsonLinesWriter, MsgpackWriter]
+    """Make a writer of records to `stream` in `format`."""
+    if format == 'jsonl':
+        return JsonLinesWriter(stream)
+    elif format == 'msgpack':
+        return MsgpackWriter(stream)
+    raise ValueError('Unknown interchange format %r' % format)
+
+
+def node_record(spec):
+    # type: (NodeSpec) -> Dict[str, Any]
+    """Record of a node spec."""
+    record = {'node': spec.key}  # type: Dict[str, Any]
+    if spec.labels:
+        record['labels'] = list(spec.labels)
+    if spec.properties:
+        record['properties'] = spec.properties
+    return record
+
+
+def rel_record(spec):
+    # type: (RelSpec) -> Dict[str, Any]
+    """Record of a relationship spec."""
+    record = {'rel': spec.key, 'head': spec.head, 'type': spec.type,
+              'tail': spec.tail}  # type: Dict[str, Any]
+    if spec.properties:
+        record['properties'] = spec.properties
+    return record
+
+
+def iter_specs(records):
+    # type: (Iterable[Dict[str, Any]]) -> Iterator[Any]
+    """Yield the specs of `records`, with ``(document, item)`` positions.
+
+    Yields ``(document, item, spec)``, where `item` counts the entity
+    records of the document.
+    """
+    document = 0
+    item = 0
+    for number, record in enumerate(records):
+        if 'document' in record:
+            document, item = record['document'], 0
+            continue
+        elif 'node' in record:
+            spec = NodeSpec(record['node'], record.get('labels') or [],
+                            record_properties(record))
+        elif 'type' in record:
+            try:
+                spec = RelSpec(record.get('rel'), record['head'],
+                               record['type'], record['tail'],
+                               record_properties(record))
+            except KeyError as exc:
+                raise ValueError('Record %d: relationship without %s'
+                                 % (number, exc))
+        else:
+            raise ValueError('Record %d: neither a node nor a relationship'
+                             % number)
+        yield document, item, spec
+        item += 1
+
+
+def iter_chunks(stream, format='jsonl', chunk_size=DEFAULT_CHUNK_SIZE,
+                document=0, item=0):
+    # type: (IO, str, int, int, int) -> Iterator[Chunk]
+    """Yield the specs of `stream` in chunks, as does the YAML loader.
+
+    Records before `document` & `item` are skipped. Chunks never span
+    documents.
+    """
+    nodes = []  # type: List[NodeSpec]
+    rels = []  # type: List[RelSpec]
+    position = document, item
+
+    for spec_document, spec_item, spec in iter_specs(read_records(stream,
+                                                                  format)):
+        if (spec_document, spec_item) < (document, item):
+            continue
+        if spec_document != position[0] and (nodes or rels):
+            yield Chunk(position[0], position[1], nodes, rels, [])
+            nodes, rels = [], []
+        (nodes if isinstance(spec, NodeSpec) else rels).append(spec)
+        position = spec_document, spec_item + 1
+        if len(nodes) + len(rels) >= chunk_size:
+            yield Chunk(position[0], position[1], nodes, rels, [])
+            nodes, rels = [], []
+
+    if nodes or rels:
+        yield Chunk(position[0], position[1], nodes, rels, [])
+
+
+def yaml_to_records(stream, out, format='jsonl', parser_class=EventParser):
+    # type: (Union[str, IO], IO, str, type) -> int
+    """Convert gryaml YAML from `stream` to records written to `out`.
+
+    Anchors become keys by :func:`anchor_key`, and other nodes get
+    integers not among those. Returns the number of entities written.
+    """
+    writer = record_writer(out, format)
+    keys = {}  # type: Dict[Hashable, int]
+    # Integers of anchors, which other nodes' keys skip, & the next of those
+    taken = set()  # type: Set[int]
+    next_key = [1]
+    document = 0
+    count = 0
+
+    def key(spec_key):
+        if not isinstance(spec_key, yaml.Node):
+            anchor = anchor_key(spec_key)
+            if not isinstance(anchor, int):
+                return anchor
+            if anchor in taken or not 1 <= anchor < next_key[0]:
+                taken.add(anchor)
+                return anchor
+            return spec_key  # An integer already given to another node
+        if spec_key not in keys:
+            while next_key[0] in taken:
+                next_key[0] += 1
+            keys[spec_key] = next_key[0]
+            next_key[0] += 1
+        return keys[spec_key]
+
+    for chunk in iter_yaml_chunks(stream, chunk_size=1,
+                                  parser_class=parser_class):
+        if chunk.document != document:
+            document = chunk.document
+            writer.write({'document': document})
+
+        for node in chunk.nodes:
+            writer.write(node_record(node._replace(key=key(node.key))))
+        for rel in chunk.rels:
+            writer.write(rel_record(rel._replace(
+                key=(None if isinstance(rel.key, yaml.Node)
+                     else anchor_key(rel.key)),
+                head=key(rel.head), tail=key(rel.tail))))
+        count += len(chunk.nodes) + len(chunk.rels)
+        keys.clear()  # Unanchored nodes are only referenced within an item
+
+    return count
+
+
+class RecordEmitter(object):
+    """Emit gryaml YAML for records, one entity at a time.
+
+    Each entity is a top-level sequence item; nodes are anchored by their
+    keys, integer keys being prefixed with ``n``, so relationships can use
+    aliases.
+
+    With `edges`, consecutive relationships of one type are emitted
+    together as a ``!gryaml.edges`` table of up to :data:`EDGES_ROWS`
+    rows, its keys those of all their properties.
+
+    With `paths`, chains of consecutive relationships, each from the tail
+    of the one before, are emitted as a ``!gryaml.path`` of up to
+    :data:`EDGES_ROWS` hops. Nodes are held back until the chain they may
+    be on ends, so those on it are written within the path; the others
+    are emitted before it.
+
+    Anchored relationships are always emitted alone.
+    """
+
+    def __init__(self, out, edges=False, paths=False):
+        # type: (IO, bool, bool) -> None
+        self.dumper = yaml.SafeDumper(out, default_flow_style=False)
+        self.document = None  # type: Optional[int]
+        self.edges = edges
+        self.paths = paths
+        #: Relationships waiting for a table or a path, with whether to
+        #: reference their endpoints
+        self.table = []  # type: List[Tuple[RelSpec, bool]]
+        self.chain = []  # type: List[Tuple[RelSpec, bool]]
+        #: Nodes held back for a path, by key
+        self.pending = OrderedDict()  # type: Dict[Any, NodeSpec]
+
+    @staticmethod
+    def anchor(key):
+        # type: (Any) -> Optional[str]
+        """Anchor for the entity keyed by `key`; see :func:`key_anchor`."""
+        if key is None:
+            return None
+        return key_anchor(key)
+
+    def open(self):
+        # type: () -> None
+        """Start the stream & first document."""
+        self.dumper.open()
+        self.start_document(0)
+
+    def start_document(self, document):
+        # type: (int) -> None
+        """Start a document, ending any current one."""
+        self.flush()
+        if self.document is not None:
+            self.dumper.emit(SequenceEndEvent())
+            self.dumper.emit(DocumentEndEvent(explicit=False))
+        self.dumper.emit(DocumentStartEvent(explicit=self.document
+                                            is not None))
+        self.dumper.emit(SequenceStartEvent(None, None, True,
+                                            flow_style=False))
+        self.document = document
+
+    def represent(self, items, tag=u'tag:yaml.org,2002:seq',
+                  flow_style=False):
+        # type: (List[Any], str, bool) -> SequenceNode
+        """Represent a sequence of `items`, which may include YAML nodes."""
+        return SequenceNode(tag, [
+            item if isinstance(item, yaml.Node)
+            else self.dumper.represent_data(item)
+            for item in items], flow_style=flow_style)
+
+    def entity(self, tag, key, items):
+        # type: (str, Any, List[Any]) -> None
+        """Emit an entity of `items`, which may include alias nodes."""
+        self.emit(self.represent(items, tag), key)
+
+    def emit(self, yaml_node, key=None):
+        # type: (yaml.Node, Any) -> None
+        """Emit an item, anchored by `key`, which may hold alias nodes."""
+        dumper = self.dumper
+        dumper.anchor_node(yaml_node)
+        dumper.anchors[yaml_node] = self.anchor(key)
+        for item in list(dumper.anchors):
+            if getattr(item, 'alias', False):
+                dumper.serialized_nodes[item] = True
+                dumper.anchors[item] = item.alias
+            elif getattr(item, 'anchor', None):  # Nested entities
+                dumper.anchors[item] = item.anchor
+        dumper.serialize_node(yaml_node, None, 0)
+        # Only anchors are needed after an entity
+        dumper.anchors = {}
+        dumper.serialized_nodes = {}
+        dumper.represented_objects = {}
+        dumper.object_keeper = []
+
+    def alias(self, key):
+        # type: (Any) -> ScalarNode
+        """Placeholder for an alias to the node keyed by `key`."""
+        yaml_node = ScalarNode(u'tag:yaml.org,2002:null', u'')
+        yaml_node.alias = self.anchor(key)
+        return yaml_node
+
+    def node(self, spec):
+        # type: (NodeSpec) -> None
+        """Emit a node, or hold it back for a path."""
+        if self.paths:
+            self.pending[spec.key] = spec
+            if len(self.pending) > EDGES_ROWS:
+                self.flush()
+            return
+        self.flush()
+        self.entity(node_tag, spec.key, self.node_items(spec))
+
+    @staticmethod
+    def node_items(spec):
+        # type: (NodeSpec) -> List[Any]
+        """The items of a node."""
+        items = []  # type: List[Any]
+        if spec.labels:
+            items.append({'labels': spec.labels})
+        if spec.properties:
+            items.append({'properties': spec.properties})
+        return items
+
+    def reference(self, key):
+        # type: (Any) -> ScalarNode
+        """Reference to the node keyed by `key`, anchored in another file."""
+        return ScalarNode(ref_tag, self.anchor(key))
+
+    def rel(self, spec, references=False):
+        # type: (RelSpec, bool) -> None
+        """Emit a relationship, its endpoints being aliases or references."""
+        key = None if isinstance(spec.key, int) else spec.key
+        last = self.chain[-1] if self.chain else None
+        if last is not None and (key is not None or
+                                 last[0].tail != spec.head or
+                                 last[1] != references or
+                                 len(self.chain) >= EDGES_ROWS):
+            self.flush_chain()
+        if self.paths and key is None:
+            self.chain.append((spec, references))
+            return
+        self.flush_chain()
+        self.write_rel(spec, references, key)
+
+    def write_rel(self, spec, references, key):
+        # type: (RelSpec, bool, Any) -> None
+        """Emit a relationship alone or in a table."""
+        if self.table and (self.table[-1][0].type != spec.type or
+                           len(self.table) >= EDGES_ROWS):
+            self.flush_table()
+        if self.edges and key is None:
+            self.table.append((spec, references))
+            return
+        self.flush_table()
+        endpoint = self.reference if references else self.alias
+        items = [endpoint(spec.head), spec.type, endpoint(spec.tail)]
+        if spec.properties:
+            items.append({'properties': spec.properties})
+        self.entity(rel_tag, key, items)
+
+    def flush(self):
+        # type: () -> None
+        """Emit all that is held back."""
+        self.flush_chain()
+        self.flush_table()
+
+    def flush_chain(self):
+        # type: () -> None
+        """Emit the nodes & the chain of relationships held back.
+
+        A chain of one relationship is emitted as if not in paths mode.
+        """
+        chain, self.chain = self.chain, []
+        if len(chain) < 2:
+            self.flush_nodes()
+            for spec, references in chain:
+                self.write_rel(spec, references, None)
+            return
+        on_path = set([chain[0][0].head] + [spec.tail for spec, _ in chain])
+        self.flush_nodes(lambda key: key not in on_path)
+
+        def path_node(key, references):
+            if references:
+                return self.reference(key)
+            spec = self.pending.pop(key, None)
+            if spec is None:
+                return self.alias(key)
+            yaml_node = self.represent(self.node_items(spec), node_tag)
+            yaml_node.anchor = self.anchor(key)
+            return yaml_node
+
+        items = [path_node(chain[0][0].head, chain[0][1])]
+        for spec, references in chain:
+            items.append(self.represent([spec.type, spec.properties],
+                                        flow_style=True)
+                         if spec.properties else spec.type)
+            items.append(path_node(spec.tail, references))
+        self.emit(self.represent(items, path_tag))
+
+    def flush_nodes(self, which=lambda key: True):
+        # type: (Callable[[Any], bool]) -> None
+        """Emit the nodes held back, or `which` of them by key."""
+        for key in [key for key in self.pending if which(key)]:
+            self.flush_table()
+            self.entity(node_tag, key, self.node_items(self.pending.pop(key)))
+
+    def flush_table(self):
+        # type: () -> None
+        """Emit the relationships waiting in :attr:`table`, if any."""
+        if not self.table:
+            return
+        table, self.table = self.table, []
+        keys = []  # type: List[str]
+        for spec, _ in table:
+            keys.extend(key for key in sorted(spec.properties)
+                        if key not in keys)
+        rows = []
+        for spec, references in table:
+            endpoint = self.reference if references else self.alias
+            values = [spec.properties.get(key) for key in keys]
+            while values and values[-1] is None:
+                values.pop()
+            rows.append(self.represent([endpoint(spec.head),
+                                        endpoint(spec.tail)] + values,
+                                       flow_style=True))
+        fields = [(u'type', table[0][0].type)]  # type: List[Tuple[str, Any]]
+        if keys:
+            fields.append((u'keys', self.represent(keys, flow_style=True)))
+        fields.append((u'rows', self.represent(rows)))
+        self.emit(MappingNode(edges_tag, [
+            (self.dumper.represent_data(name),
+             value if isinstance(value, yaml.Node)
+             else self.dumper.represent_data(value))
+            for name, value in fields], flow_style=False))
+
+    def close(self):
+        # type: () -> None
+        """End the document & stream."""
+        self.flush()
+        self.dumper.emit(SequenceEndEvent())
+        self.dumper.emit(DocumentEndEvent(explicit=False))
+        self.dumper.close()
+        self.dumper.dispose()
+
+
+def records_to_yaml(stream, out, format='jsonl', edges=False, paths=False):
+    # type: (IO, IO, str, bool, bool) -> int
+    """Convert records from `stream` to gryaml YAML written to `out`.
+
+    Returns the number of entities written. With `edges` or `paths`,
+    relationships are written as tables or paths; see
+    :class:`RecordEmitter`.
+    """
+    emitter = RecordEmitter(out, edges, paths)
+    emitter.open()
+    count = 0
+    for document, _, spec in iter_specs(read_records(stream, format)):
+        if document != emitter.document:
+            emitter.start_document(document)
+        (emitter.node if isinstance(spec, NodeSpec) else emitter.rel)(spec)
+        count += 1
+    emitter.close()
+    return count
+
+
+def entity_specs(entities, batch_size=PREFETCH_SIZE):
+    # type: (Iterable[Any], int) -> Iterator[Union[NodeSpec, RelSpec]]
+    """Specs of py2neo nodes & relationships, keyed by integers.
+
+    Relationships' endpoints are yielded before them, if not already.
+    Bound nodes are keyed by database id, as py2neo may hydrate the same
+    node as several objects. Abstract nodes are keyed by object, as for
+    aliases when dumping YAML, only while the object lives, so keys are
+    kept for the abstract nodes still in use rather than all seen.
+
+    Entities are taken `batch_size` at a time, and bound ones prefetched
+    together before they are rendered; see :func:`gryaml.prefetch`.
+    """
+    from ._py2neo import bound_id, compat, prefetch
+    from .pyyaml import render_node
+    to_dict = compat().to_dict
+    # By ``(None, database id)`` or by object id
+    keys = {}  # type: Dict[Hashable, int]
+    # By object id, to forget the key when the object is collected or else
+    # to keep the object from being collected, and its id reused
+    refs = {}  # type: Dict[int, Any]
+    next_key = itertools.count(1)
+
+    def forget(object_id):
+        keys.pop(object_id, None)
+        refs.pop(object_id, None)
+
+    def identity(graph_node):
+        id_ = bound_id(graph_node)
+        return id(graph_node) if id_ is None else (None, id_)
+
+    def node_spec(graph_node):
+        node_identity = identity(graph_node)
+        if node_identity in keys:
+            return None
+        keys[node_identity] = next(next_key)
+        if not isinstance(node_identity, tuple):
+            try:
+                refs[node_identity] = weakref.ref(
+                    graph_node,
+                    lambda _, object_id=node_identity: forget(object_id))
+            except TypeError:  # Not weakly referenceable
+                refs[node_identity] = graph_node
+        fields = {}  # type: Dict[str, Any]
+        for item in render_node(graph_node):
+            fields.update(item)
+        return NodeSpec(keys[node_identity], fields.get('labels', []),
+                        fields.get('properties', {}))
+
+    iterator = iter(entities)
+    while True:
+        window = list(itertools.islice(iterator, batch_size))
+        if not window:
+            break
+        prefetch(window, batch_size)
+        for entity in window:
+            if hasattr(entity, 'start_node'):
+                for endpoint in (entity.start_node, entity.end_node):
+                    spec = node_spec(endpoint)
+                    if spec is not None:
+                        yield spec
+                yield RelSpec(None, keys[identity(entity.start_node)],
+                              entity.type, keys[identity(entity.end_node)],
+                              to_dict(entity))
+            else:
+                spec = node_spec(entity)
+                if spec is not None:
+                    yield spec
+
+
+def entity_records(entities):
+    # type: (Iterable[Any]) -> Iterator[Dict[str, Any]]
+    """Records of py2neo nodes & relationships, as :func:`dump` writes.
+
+    See :func:`entity_specs`.
+    """
+    for spec in entity_specs(entities):
+        if isinstance(spec, NodeSpec):
+            yield node_record(spec)
+        else:
+            yield rel_record(spec)
+
+
+def dump_stream(entities, stream=None, edges=False, paths=False):
+    # type: (Iterable[Any], Optional[IO], bool, bool) -> Optional[str]
+    """Dump py2neo nodes & relationships as gryaml YAML, one at a time.
+
+    Each entity is emitted as a top-level item as soon as it is taken from
+    `entities`, which may be a generator, and relationships alias nodes
+    already emitted; see :func:`entity_specs`. Unlike :func:`yaml.dump`,
+    nothing else is kept, so memory does not grow with the output.
+
+    With `edges`, consecutive relationships of one type are written as a
+    ``!gryaml.edges`` table, and with `paths`, chains of relationships as
+    a ``!gryaml.path``; see :class:`RecordEmitter`.
+
+    Bound entities are prefetched in batches as they are taken, rather
+    than each pulled when rendered.
+
+    As :func:`yaml.dump`, the YAML is written to `stream`, if given, or
+    else returned.
+    """
+    out = io.StringIO() if stream is None else stream
+    emitter = RecordEmitter(out, edges, paths)
+    emitter.open()
+    for spec in entity_specs(entities):
+        if isinstance(spec, NodeSpec):
+            emitter.node(spec)
+        else:
+            emitter.rel(spec)
+    emitter.close()
+    return out.getvalue() if stream is None else None
+
+
+def dump(entities, stream, format='jsonl'):
+    # type: (Iterable[Any], IO, str) -> int
+    """Dump py2neo nodes & relationships to `stream` as records.
+
+    Returns the number of records written.
+    """
+    writer = record_writer(stream, format)
+    count = 0
+    for record in entity_records(entities):
+        writer.write(record)
+        count += 1
+    return count
+
+
+def main(args=None):
+    # type: (Optional[List[str]]) -> None
+    """Convert between gryaml YAML & an interchange format, by extension."""
+    import argparse
+
+    parser = argparse.ArgumentParser(description=main.__doc__)
+    parser.add_argument('--edges', action='store_true',
+                        help='Write relationships to YAML as !gryaml.edges'
+                             ' tables of consecutive relationships of a'
+                             ' type.')
+    parser.add_argument('--paths', action='store_true',
+                        help='Write chains of relationships to YAML as'
+                             ' !gryaml.path sequences.')
+    parser.add_argument('source')
+    parser.add_argument('target')
+    config = parser.parse_args(args)
+
+    source_format = format_of(config.source)
+    target_format = format_of(config.target)
+    if (source_format == 'yaml') == (target_format == 'yaml'):
+        parser.error('Exactly one of the files must be YAML')
+
+    def open_file(path, mode, format):
+        if is_binary(format):
+            return io.open(path, mode + 'b')
+        return io.open(path, mode, encoding='utf-8')
+
+    with open_file(config.source, 'r', source_format) as source, \
+            open_file(config.target, 'w', target_format) as target:
+        if source_format == 'yaml':
+            count = yaml_to_records(source, target, target_format)
+        else:
+            count = records_to_yaml(source, target, source_format,
+                                    config.edges, config.paths)
+    print('{} entities converted'.format(count))
+
+
+if __name__ == '__main__':
+    main()
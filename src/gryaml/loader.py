@@ -0,0 +1,1234 @@
+"""Chunked, resumable loading of gryaml YAML into a graph database.
+
+Unlike registering constructors and calling ``yaml.load``, which creates
+each entity as soon as its tag is constructed, this composes the top-level
+sequence of each document one item at a time, collects the entities as
+specs and writes them in transactions of roughly ``chunk_size`` entities.
+After each transaction a :class:`Checkpoint` records how far the load got,
+so a failed load can be resumed rather than dropped and started over.
+"""
+from __future__ import absolute_import
+
+import array
+import itertools
+import json
+import operator
+import os
+import re
+import time
+from collections import deque, namedtuple
+from contextlib import contextmanager
+
+import yaml
+from yaml.composer import Composer
+from yaml.constructor import ConstructorError, SafeConstructor
+from yaml.events import (
+    AliasEvent, DocumentStartEvent, SequenceEndEvent, SequenceStartEvent,
+    StreamEndEvent
+)
+from yaml.nodes import MappingNode, ScalarNode, SequenceNode
+from yaml.resolver import Resolver
+
+try:
+    from typing import (  # noqa: F401
+        Any, Callable, Dict, Hashable, IO, Iterable, Iterator, List, Optional,
+        Tuple, Union, TYPE_CHECKING
+    )
+except ImportError:
+    """Module :mod:`typing` not required for Py27-compatible type comments."""
+    TYPE_CHECKING = False
+
+if TYPE_CHECKING:
+    from py2neo_compat import Graph  # noqa: F401
+
+from ._py2neo import (
+    is_label_map, resolve_node_args, resolve_rel_properties, transient_errors
+)
+from .backends import backend_for
+from .cypher import KEY, LOAD, LOAD_LABEL, SCOPE
+from .model import NodeSpec, RelSpec
+from .pyyaml import (
+    EDGES_KEYS, array_constructor, array_tag, edges_tag, node_tag, path_tag,
+    ref_tag, rel_tag, repeat_tag
+)
+
+DEFAULT_CHUNK_SIZE = 1000
+DEFAULT_RETRIES = 5
+DEFAULT_BACKOFF = 0.5
+
+# Parse with libyaml when it is available; composition is done in Python.
+EventParser = getattr(yaml, 'CBaseLoader', yaml.BaseLoader)
+
+#: Names of the YAML engines which can parse for the loader.
+ENGINES = ('pyyaml', 'ruamel')
+
+
+def event_parser(engine='pyyaml'):
+    # type: (str) -> type
+    """The parser class of YAML `engine`, for :class:`ItemComposer`.
+
+    Either engine parses with libyaml when available, PyYAML's own or
+    ``ruamel.yaml.clib``.
+    """
+    if engine == 'ruamel':
+        from .ruamel_yaml import EventParser as RuamelEventParser
+        return RuamelEventParser
+    if engine != 'pyyaml':
+        raise ValueError('Unknown YAML engine %r; expected one of: %s'
+                         % (engine, ', '.join(ENGINES)))
+    return EventParser
+
+
+class ItemComposer(Composer, Resolver):
+    """Compose YAML documents one top-level sequence item at a time.
+
+    Only anchored nodes outlive the item they appear in, as they are kept
+    by the composer for resolving aliases. Anchored nodes are marked with an
+    ``anchor`` attribute.
+
+    By default anchors are kept until the end of their document. To bound
+    memory by the anchors still in use, either give `alias_counts`, from
+    :func:`count_aliases`, to forget each anchor after its last alias, or
+    an `anchor_window` to forget anchors that many items after the item
+    defining them. Either way, :meth:`release` must be called after each
+    item.
+
+    Events come from `parser_class`, by default PyYAML's; see
+    :func:`event_parser` for the alternatives.
+    """
+
+    def __init__(self, stream, parser_class=EventParser, alias_counts=None,
+                 anchor_window=None):
+        # type: (Union[str, IO], type, Optional[List[Dict[str, int]]], Optional[int]) -> None  # noqa: E501
+        self._parser = parser_class(stream)
+        Composer.__init__(self)
+        Resolver.__init__(self)
+        self.alias_counts = alias_counts
+        self.anchor_window = anchor_window
+        self._counts = None  # type: Optional[Dict[str, int]]
+        self._item = 0
+        self._new_anchors = []  # type: List[str]
+        self._anchor_items = deque()  # type: deque
+        self._expired = []  # type: List[str]
+
+    def check_event(self, *choices):
+        # type: (*type) -> bool
+        """Delegate to the underlying parser."""
+        return self._parser.check_event(*choices)
+
+    def peek_event(self):
+        # type: () -> yaml.Event
+        """Delegate to the underlying parser."""
+        return self._parser.peek_event()
+
+    def get_event(self):
+        # type: () -> yaml.Event
+        """Delegate to the underlying parser."""
+        return self._parser.get_event()
+
+    def dispose(self):
+        # type: () -> None
+        """Release the underlying parser."""
+        self._parser.dispose()
+
+    def compose_node(self, parent, index):
+        # type: (Optional[yaml.Node], Any) -> yaml.Node
+        """Compose a node, marking it with its anchor, if any."""
+        event = self.peek_event()
+        yaml_node = Composer.compose_node(self, parent, index)
+        if isinstance(event, AliasEvent):
+            if self._counts is not None and event.anchor in self._counts:
+                self._counts[event.anchor] -= 1
+                if not self._counts[event.anchor]:
+                    del self._counts[event.anchor]
+                    self._expired.append(event.anchor)
+        elif event.anchor is not None:
+            yaml_node.anchor = event.anchor
+            self._new_anchors.append(event.anchor)
+        return yaml_node
+
+    def release(self):
+        # type: () -> List[str]
+        """Forget what is no longer needed of anchors after an item.
+
+        Anchored entities are replaced with placeholders, as all an alias
+        needs once an entity has been built is its anchor. Anchors are
+        forgotten entirely after their last alias or when they fall out of
+        the anchor window. Returns the anchors forgotten.
+        """
+        self._item += 1
+        for anchor in self._new_anchors:
+            yaml_node = self.anchors[anchor]
+            if yaml_node.tag in (node_tag, rel_tag):
+                placeholder = ScalarNode(yaml_node.tag, u'',
+                                         yaml_node.start_mark)
+                placeholder.anchor = anchor
+                self.anchors[anchor] = placeholder
+            if self._counts is not None and anchor not in self._counts:
+                self._expired.append(anchor)
+            if self.anchor_window is not None:
+                self._anchor_items.append((self._item, anchor))
+        self._new_anchors = []
+
+        while (self._anchor_items and
+               self._anchor_items[0][0] <= self._item - self.anchor_window):
+            self._expired.append(self._anchor_items.popleft()[1])
+
+        released = [anchor for anchor in self._expired
+                    if self.anchors.pop(anchor, None) is not None]
+        self._expired = []
+        return released
+
+    def iter_items(self):
+        # type: () -> Iterator[Tuple[int, int, yaml.Node]]
+        """Yield ``(document, item, node)`` for each top-level item.
+
+        A document whose root is not a plain sequence is a single item.
+        """
+        self.get_event()  # StreamStartEvent
+        document = 0
+        while not self.check_event(StreamEndEvent):
+            self.get_event()  # DocumentStartEvent
+            if self.alias_counts is not None:
+                self._counts = (self.alias_counts[document]
+                                if document < len(self.alias_counts) else {})
+            event = self.peek_event()
+            if (isinstance(event, SequenceStartEvent) and
+                    event.anchor is None and
+                    event.tag not in (node_tag, rel_tag)):
+                self.get_event()
+                item = 0
+                while not self.check_event(SequenceEndEvent):
+                    yield document, item, self.compose_node(None, None)
+                    item += 1
+                self.get_event()
+            else:
+                yield document, 0, self.compose_node(None, None)
+            self.get_event()  # DocumentEndEvent
+            self.anchors = {}
+            self._new_anchors = []
+            self._anchor_items.clear()
+            document += 1
+        self.get_event()
+
+
+def count_aliases(stream, parser_class=EventParser):
+    # type: (Union[str, IO], type) -> List[Dict[str, int]]
+    """Count the aliases of each anchor in each document of `stream`.
+
+    This only parses, so is much quicker than composing the documents. The
+    counts are for :class:`ItemComposer`, which consumes them.
+    """
+    parser = parser_class(stream)
+    counts = []  # type: List[Dict[str, int]]
+    try:
+        while parser.check_event():
+            event = parser.get_event()
+            if isinstance(event, DocumentStartEvent):
+                counts.append({})
+            elif isinstance(event, AliasEvent):
+                counts[-1][event.anchor] = counts[-1].get(event.anchor, 0) + 1
+    finally:
+        parser.dispose()
+    return counts
+
+
+class PropertyConstructor(SafeConstructor):
+    """Construct plain Python values, and arrays of ``!gryaml.array``."""
+
+
+PropertyConstructor.add_constructor(array_tag, array_constructor)
+
+
+#: Field of a ``!gryaml.repeat`` template: the index, optionally with one
+#: integer operation, as ``{i}``, ``{i+1}`` or ``{i%10}``.
+INDEX_FIELD = re.compile(r'\{i(?:\s*(\+|-|\*|//|%)\s*(\d+))?\}')
+
+OPERATORS = {u'+': operator.add, u'-': operator.sub, u'*': operator.mul,
+             u'//': operator.floordiv, u'%': operator.mod}
+
+#: Keys of ``!gryaml.repeat`` maps.
+REPEAT_KEYS = (u'count', u'start', u'anchor', u'node', u'rel')
+
+
+def substitute(value, index):
+    # type: (Any, int) -> Any
+    """`value` with the :data:`INDEX_FIELD` fields of its strings filled in.
+
+    A string of just one field becomes an integer; lists & maps are copied,
+    filling in their items, keys & values.
+    """
+    def field(match):
+        op, operand = match.groups()
+        return index if op is None else OPERATORS[op](index, int(operand))
+
+    if isinstance(value, (str, type(u''))):
+        match = INDEX_FIELD.match(value)
+        if match and match.end() == len(value):
+            return field(match)
+        return INDEX_FIELD.sub(lambda m: u'%d' % field(m), value)
+    if isinstance(value, list):
+        return [substitute(item, index) for item in value]
+    if isinstance(value, dict):
+        return {substitute(key, index): substitute(item, index)
+                for key, item in value.items()}
+    return value
+
+
+class Selection(object):
+    """Which nodes & relationships of a load to write, by label & type.
+
+    A node is selected if it has any of `labels`, if given, and none of
+    `exclude_labels`. A relationship is selected if its type is among
+    `rel_types`, if given, and not `exclude_rel_types`, and both its
+    endpoints are selected.
+    """
+
+    def __init__(self, labels=None, exclude_labels=(), rel_types=None,
+                 exclude_rel_types=()):
+        # type: (Optional[Iterable[str]], Iterable[str], Optional[Iterable[str]], Iterable[str]) -> None  # noqa: E501
+        self.labels = None if labels is None else frozenset(labels)
+        self.exclude_labels = frozenset(exclude_labels)
+        self.rel_types = None if rel_types is None else frozenset(rel_types)
+        self.exclude_rel_types = frozenset(exclude_rel_types)
+
+    def node(self, labels):
+        # type: (Iterable[str]) -> bool
+        """Whether a node with `labels` is selected."""
+        labels = frozenset(labels)
+        return ((self.labels is None or bool(labels & self.labels)) and
+                not labels & self.exclude_labels)
+
+    def rel(self, reltype):
+        # type: (str) -> bool
+        """Whether relationships of `reltype` are, if their endpoints are."""
+        return ((self.rel_types is None or reltype in self.rel_types) and
+                reltype not in self.exclude_rel_types)
+
+    def chunk(self, chunk, dropped):
+        # type: (Chunk, set) -> Chunk
+        """The selected entities of `chunk`, as already built.
+
+        The keys of nodes not selected are added to `dropped`, for later
+        relationships to them to be dropped too.
+        """
+        nodes = []  # type: List[NodeSpec]
+        for spec in chunk.nodes:
+            if self.node(spec.labels):
+                nodes.append(spec)
+            else:
+                dropped.add(spec.key)
+        rels = [spec for spec in chunk.rels
+                if self.rel(spec.type) and
+                spec.head not in dropped and spec.tail not in dropped]
+        return chunk._replace(nodes=nodes, rels=rels)
+
+
+class SpecBuilder(object):
+    """Build entity specs from composed gryaml YAML nodes.
+
+    Nodes are keyed by their anchor, if anchored, and otherwise by the YAML
+    node itself, which cannot be referenced from any other item.
+
+    Given a :class:`Selection`, entities not selected are skipped before
+    any of their properties are constructed. The anchors of nodes skipped
+    are kept in :attr:`dropped`, and unanchored nodes are marked
+    ``dropped``, so the relationships to them are skipped too.
+    """
+
+    def __init__(self, constructor=None, select=None):
+        # type: (Optional[SafeConstructor], Optional[Selection]) -> None
+        self.constructor = constructor or PropertyConstructor()
+        self.select = select
+        self.seen = set()  # type: set
+        self.dropped = set()  # type: set
+        #: Expansions of the last ``!gryaml.repeat``, or rows of the last
+        #: ``!gryaml.edges``, so far, including any skipped, from which to
+        #: resume it
+        self.offset = 0
+
+    def construct(self, yaml_node):
+        # type: (yaml.Node) -> Any
+        """Construct a plain Python value, without caching it."""
+        try:
+            return self.constructor.construct_object(yaml_node, deep=True)
+        finally:
+            self.constructor.constructed_objects = {}
+            self.constructor.recursive_objects = {}
+
+    @staticmethod
+    def key(yaml_node):
+        # type: (yaml.Node) -> Hashable
+        """Key identifying the entity for `yaml_node`.
+
+        A ``!gryaml.ref`` endpoint is keyed by the anchor it references, of
+        a node written by another file, whose id must be given to the load.
+        """
+        if yaml_node.tag == ref_tag:
+            return yaml_node.value
+        return getattr(yaml_node, 'anchor', None) or yaml_node
+
+    def specs(self, yaml_node, offset=0):
+        # type: (yaml.Node, int) -> Iterator[Union[NodeSpec, RelSpec]]
+        """Yield specs for entities within `yaml_node`, endpoints first.
+
+        Anchored entities are yielded only the first time they are seen.
+        A ``!gryaml.repeat`` skips its first `offset` expansions, and a
+        ``!gryaml.edges`` table its first `offset` rows; see :meth:`repeat`
+        & :meth:`edges`.
+        """
+        if yaml_node.tag in (node_tag, rel_tag, repeat_tag, edges_tag,
+                             path_tag):
+            key = self.key(yaml_node)
+            if key in self.seen:
+                return
+            if key is not yaml_node:
+                self.seen.add(key)
+            if yaml_node.tag == repeat_tag:
+                for spec in self.repeat(yaml_node, offset):
+                    yield spec
+            elif yaml_node.tag == edges_tag:
+                for spec in self.edges(yaml_node, offset):
+                    yield spec
+            elif yaml_node.tag == path_tag:
+                for spec in self.path_specs(yaml_node):
+                    yield spec
+            elif yaml_node.tag == node_tag:
+                if self.selected(yaml_node):
+                    yield self.node_spec(yaml_node)
+                elif key is yaml_node:
+                    yaml_node.dropped = True
+                else:
+                    self.dropped.add(key)
+            else:
+                for spec in self.rel_specs(yaml_node):
+                    yield spec
+        elif isinstance(yaml_node, SequenceNode):
+            for child in yaml_node.value:
+                for spec in self.specs(child):
+                    yield spec
+        elif isinstance(yaml_node, MappingNode):
+            for child_key, child_value in yaml_node.value:
+                for child in child_key, child_value:
+                    for spec in self.specs(child):
+                        yield spec
+
+    def check_node(self, yaml_node):
+        # type: (yaml.Node) -> None
+        """Ensure `yaml_node` is a sequence, as ``!gryaml.node`` must be."""
+        if not isinstance(yaml_node, SequenceNode):
+            raise ConstructorError(None, None,
+                                   'expected a sequence for %s' % node_tag,
+                                   yaml_node.start_mark)
+
+    def selected(self, yaml_node):
+        # type: (yaml.Node) -> bool
+        """Whether the node is selected, constructing only its labels.
+
+        These are those of the first non-empty labels map, as for
+        :func:`~gryaml._py2neo.resolve_node_args`.
+        """
+        if self.select is None:
+            return True
+        self.check_node(yaml_node)
+        label_maps = (self.construct(arg) for arg in yaml_node.value
+                      if isinstance(arg, MappingNode) and
+                      len(arg.value) == 1 and
+                      arg.value[0][0].value == u'labels')
+        labels = next((mapping['labels'] for mapping in label_maps
+                       if is_label_map(mapping) and mapping['labels']), None)
+        return self.select.node(labels or [])
+
+    def is_dropped(self, yaml_node):
+        # type: (yaml.Node) -> bool
+        """Whether an endpoint is of a node not selected."""
+        return (getattr(yaml_node, 'dropped', False) or
+                self.key(yaml_node) in self.dropped)
+
+    def node_spec(self, yaml_node):
+        # type: (yaml.Node) -> NodeSpec
+        """Build the spec for a ``!gryaml.node`` YAML node."""
+        self.check_node(yaml_node)
+        labels, properties = resolve_node_args(
+            *[self.construct(arg) for arg in yaml_node.value])
+        return NodeSpec(self.key(yaml_node), list(labels), properties)
+
+    def rel_specs(self, yaml_node):
+        # type: (yaml.Node) -> Iterator[Union[NodeSpec, RelSpec]]
+        """Yield specs for a ``!gryaml.rel`` YAML node & its endpoints."""
+        if (not isinstance(yaml_node, SequenceNode) or
+                len(yaml_node.value) not in (3, 4)):
+            raise ConstructorError(None, None,
+                                   'expected a sequence of 3 or 4 items'
+                                   ' for %s' % rel_tag,
+                                   yaml_node.start_mark)
+        head, reltype, tail = yaml_node.value[:3]
+        for endpoint in head, tail:
+            if endpoint.tag == ref_tag and isinstance(endpoint, ScalarNode):
+                continue
+            if endpoint.tag != node_tag:
+                raise ConstructorError('while constructing %s' % rel_tag,
+                                       yaml_node.start_mark,
+                                       'expected an endpoint tagged %s'
+                                       ' or %s' % (node_tag, ref_tag),
+                                       endpoint.start_mark)
+            for spec in self.specs(endpoint):
+                yield spec
+        if self.select is not None and (
+                not self.select.rel(self.construct(reltype)) or
+                self.is_dropped(head) or self.is_dropped(tail)):
+            return
+        properties = (self.construct(yaml_node.value[3])
+                      if len(yaml_node.value) == 4 else None)
+        yield RelSpec(self.key(yaml_node), self.key(head),
+                      self.construct(reltype), self.key(tail),
+                      resolve_rel_properties(properties))
+
+    def repeat(self, yaml_node, offset=0):
+        # type: (yaml.Node, int) -> Iterator[Union[NodeSpec, RelSpec]]
+        """Yield the specs a ``!gryaml.repeat`` map expands to, lazily.
+
+        The map holds a ``node`` or ``rel`` template, repeated ``count``
+        times with indexes from ``start``, by default 0. Each time,
+        :func:`substitute` fills in the index in its labels, type &
+        properties, in ``!gryaml.ref`` endpoints and in the ``anchor`` of
+        nodes, which makes them referenceable as ``!gryaml.ref``. The
+        template itself is constructed only once::
+
+            - !gryaml.repeat
+              count: 3
+              anchor: user-{i}
+              node: !gryaml.node [{properties: {name: 'user {i}'}}]
+            - !gryaml.repeat
+              count: 2
+              rel:
+              - !gryaml.ref 'user-{i}'
+              - FOLLOWS
+              - !gryaml.ref 'user-{i+1}'
+
+        The ``anchor`` of more than one node must have an index field, to
+        give each its own. The endpoints of relationships must be
+        ``!gryaml.ref`` endpoints or anchored nodes, written once before
+        the relationships.
+
+        The first `offset` expansions are skipped, and :attr:`offset` counts
+        them with those yielded, as each is, so a load can resume from it
+        whether or not anchored endpoints are yielded again.
+        """
+        def fail(problem, mark=yaml_node.start_mark):
+            return ConstructorError('while constructing %s' % repeat_tag,
+                                    yaml_node.start_mark, problem, mark)
+
+        if not isinstance(yaml_node, MappingNode):
+            raise ConstructorError(None, None,
+                                   'expected a map for %s' % repeat_tag,
+                                   yaml_node.start_mark)
+        fields = {}  # type: Dict[str, yaml.Node]
+        for key, value in yaml_node.value:
+            if key.value not in REPEAT_KEYS:
+                raise fail('found unknown key %r' % key.value, key.start_mark)
+            fields[key.value] = value
+        if u'count' not in fields:
+            raise fail('expected a count')
+        count, start = [self.construct(fields[key]) if key in fields else 0
+                        for key in (u'count', u'start')]
+        if not all(isinstance(n, int) and n >= 0 for n in (count, start)):
+            raise fail('expected non-negative integers for count & start')
+        if (u'node' in fields) == (u'rel' in fields):
+            raise fail('expected a node or rel template')
+        anchor = (self.construct(fields[u'anchor'])
+                  if u'anchor' in fields else None)
+        if anchor is not None and count > 1 and not (
+                isinstance(anchor, (str, type(u''))) and
+                INDEX_FIELD.search(anchor)):
+            raise fail('expected an index field in the anchor of more than'
+                       ' one node', fields[u'anchor'].start_mark)
+        indexes = itertools.islice(itertools.count(start), count)
+        self.offset = offset
+
+        if u'node' in fields:
+            template = fields[u'node']
+            if template.tag != node_tag:
+                raise fail('expected a node tagged %s' % node_tag,
+                           template.start_mark)
+            if not self.selected(template):
+                if anchor is not None:
+                    self.dropped.update(substitute(anchor, i)
+                                        for i in indexes)
+                return
+            spec = self.node_spec(template)
+            for self.offset, i in enumerate(
+                    itertools.islice(indexes, offset, None), offset + 1):
+                yield NodeSpec(ScalarNode(node_tag, u'') if anchor is None
+                               else substitute(anchor, i),
+                               substitute(spec.labels, i),
+                               substitute(spec.properties, i))
+            return
+
+        template = fields[u'rel']
+        if anchor is not None:
+            raise fail('expected an anchor only for nodes')
+        if template.tag not in (rel_tag, None, u'tag:yaml.org,2002:seq'):
+            raise fail('expected a relationship sequence',
+                       template.start_mark)
+        if (not isinstance(template, SequenceNode) or
+                len(template.value) not in (3, 4)):
+            raise fail('expected a sequence of 3 or 4 items',
+                       template.start_mark)
+        head, reltype, tail = template.value[:3]
+        for endpoint in head, tail:
+            for spec in self.anchored_endpoint(yaml_node, endpoint):
+                yield spec
+        reltype = self.construct(reltype)
+        if self.select is not None and not self.select.rel(reltype):
+            return
+        properties = resolve_rel_properties(
+            self.construct(template.value[3])
+            if len(template.value) == 4 else None)
+        head, tail = self.key(head), self.key(tail)
+        for self.offset, i in enumerate(
+                itertools.islice(indexes, offset, None), offset + 1):
+            rel = RelSpec(ScalarNode(rel_tag, u''), substitute(head, i),
+                          substitute(reltype, i), substitute(tail, i),
+                          substitute(properties, i))
+            if rel.head not in self.dropped and rel.tail not in self.dropped:
+                yield rel
+
+    def edges(self, yaml_node, offset=0):
+        # type: (yaml.Node, int) -> Iterator[Union[NodeSpec, RelSpec]]
+        """Yield the specs of a ``!gryaml.edges`` table, a row at a time.
+
+        The table is as for :func:`gryaml.pyyaml.construct_edges`, its type
+        & keys constructed once and each row's values as it is reached.
+        The endpoints must be ``!gryaml.ref`` endpoints or anchored nodes,
+        as the rows of a large table are written in several chunks.
+
+        The first `offset` rows are skipped, and :attr:`offset` counts them
+        with the rows whose relationships have been yielded, as for
+        :meth:`repeat`.
+        """
+        def fail(problem, mark=yaml_node.start_mark):
+            return ConstructorError('while constructing %s' % edges_tag,
+                                    yaml_node.start_mark, problem, mark)
+
+        if not isinstance(yaml_node, MappingNode):
+            raise ConstructorError(None, None,
+                                   'expected a map for %s' % edges_tag,
+                                   yaml_node.start_mark)
+        fields = {}  # type: Dict[str, yaml.Node]
+        for key, value in yaml_node.value:
+            if key.value not in EDGES_KEYS:
+                raise fail('found unknown key %r' % key.value, key.start_mark)
+            fields[key.value] = value
+        if not all(key in fields
+                   for key, required in EDGES_KEYS.items() if required):
+            raise fail('expected a type & rows')
+        reltype = self.construct(fields[u'type'])
+        keys = (self.construct(fields[u'keys']) if u'keys' in fields
+                else None) or []
+        rows = fields[u'rows']
+        if not isinstance(rows, SequenceNode):
+            raise fail('expected a sequence of rows', rows.start_mark)
+        if self.select is not None and not self.select.rel(reltype):
+            return
+
+        self.offset = offset
+        for self.offset, row in enumerate(rows.value[offset:], offset):
+            if (not isinstance(row, SequenceNode) or
+                    not 2 <= len(row.value) <= 2 + len(keys)):
+                raise fail('expected rows of a head, a tail & up to %d'
+                           ' values' % len(keys), row.start_mark)
+            head, tail = row.value[:2]
+            for endpoint in head, tail:
+                for spec in self.anchored_endpoint(yaml_node, endpoint):
+                    yield spec
+            if self.is_dropped(head) or self.is_dropped(tail):
+                continue
+            values = [self.construct(value) for value in row.value[2:]]
+            self.offset += 1
+            yield RelSpec(ScalarNode(rel_tag, u''), self.key(head), reltype,
+                          self.key(tail),
+                          {key: value for key, value in zip(keys, values)
+                           if value is not None})
+
+    def path_specs(self, yaml_node):
+        # type: (yaml.Node) -> Iterator[Union[NodeSpec, RelSpec]]
+        """Yield specs for a ``!gryaml.path`` YAML node, nodes & hops.
+
+        The path alternates nodes & relationship types, each a string or
+        a ``[type, properties]`` pair, as :func:`gryaml.path` takes them.
+        It is one item, so is written in one chunk.
+        """
+        def fail(problem, mark):
+            return ConstructorError('while constructing %s' % path_tag,
+                                    yaml_node.start_mark, problem, mark)
+
+        if (not isinstance(yaml_node, SequenceNode) or
+                len(yaml_node.value) < 3 or not len(yaml_node.value) % 2):
+            raise ConstructorError(None, None,
+                                   'expected a sequence of nodes alternating'
+                                   ' with relationship types for %s'
+                                   % path_tag, yaml_node.start_mark)
+        items = yaml_node.value
+        for endpoint in items[::2]:
+            if not (endpoint.tag == node_tag or
+                    endpoint.tag == ref_tag and
+                    isinstance(endpoint, ScalarNode)):
+                raise fail('expected a node tagged %s or %s'
+                           % (node_tag, ref_tag), endpoint.start_mark)
+            for spec in self.specs(endpoint):
+                yield spec
+        for index in range(1, len(items), 2):
+            hop = items[index]
+            properties = None
+            if isinstance(hop, SequenceNode) and len(hop.value) == 2:
+                hop, properties = hop.value
+            if not isinstance(hop, ScalarNode) or not hop.value:
+                raise fail('expected a relationship type or a [type,'
+                           ' properties] pair', hop.start_mark)
+            reltype = self.construct(hop)
+            head, tail = items[index - 1], items[index + 1]
+            if self.select is not None and (
+                    not self.select.rel(reltype) or
+                    self.is_dropped(head) or self.is_dropped(tail)):
+                continue
+            yield RelSpec(ScalarNode(rel_tag, u''), self.key(head), reltype,
+                          self.key(tail), resolve_rel_properties(
+                              self.construct(properties)
+                              if properties is not None else None))
+
+    def anchored_endpoint(self, yaml_node, endpoint):
+        # type: (yaml.Node, yaml.Node) -> Iterator[NodeSpec]
+        """Yield the spec of an `endpoint` which must be anchored, if new.
+
+        The endpoints of the relationships `yaml_node` makes in bulk must
+        be ``!gryaml.ref`` endpoints or anchored nodes, which outlive chunks.
+        """
+        if endpoint.tag == ref_tag and isinstance(endpoint, ScalarNode):
+            return
+        if endpoint.tag != node_tag or self.key(endpoint) is endpoint:
+            raise ConstructorError('while constructing %s' % yaml_node.tag,
+                                   yaml_node.start_mark,
+                                   'expected an anchored endpoint or %s'
+                                   % ref_tag, endpoint.start_mark)
+        for spec in self.specs(endpoint):
+            yield spec
+
+
+def anchor_of(key):
+    # type: (Hashable) -> Optional[str]
+    """Anchor of a spec key, if it is one; integer keys as when dumped."""
+    if key is None or isinstance(key, yaml.Node):
+        return None
+    return u'n{}'.format(key) if isinstance(key, int) else key
+
+
+def anchor_scope(source, document):
+    # type: (Optional[str], int) -> str
+    """Scope of the anchors of `document` of the file `source`, if named."""
+    return u'{}#{}'.format(source or u'', document)
+
+
+def keep_anchor(spec, scope):
+    # type: (NodeSpec, str) -> NodeSpec
+    """`spec` with its anchor, if any, as :data:`~gryaml.cypher.KEY`, and
+    `scope`, from :func:`anchor_scope`, as :data:`~gryaml.cypher.SCOPE`.
+    """
+    anchor = anchor_of(spec.key)
+    if anchor is None:
+        return spec
+    properties = dict(spec.properties)
+    properties[KEY] = anchor
+    properties[SCOPE] = scope
+    return spec._replace(properties=properties)
+
+
+def tag_load(spec, load_id):
+    # type: (Union[NodeSpec, RelSpec], str) -> Union[NodeSpec, RelSpec]
+    """`spec` tagged as of the load `load_id`, for :func:`reset`."""
+    properties = dict(spec.properties)
+    properties[LOAD] = load_id
+    if isinstance(spec, NodeSpec):
+        return spec._replace(labels=list(spec.labels) + [LOAD_LABEL],
+                             properties=properties)
+    return spec._replace(properties=properties)
+
+
+def freeze(value):
+    # type: (Any) -> Hashable
+    """Hashable equivalent of a property value or map."""
+    if isinstance(value, dict):
+        return tuple(sorted((k, freeze(v)) for k, v in value.items()))
+    if isinstance(value, (list, tuple)):
+        return tuple(freeze(v) for v in value)
+    return value
+
+
+class RelDeduplicator(object):
+    """Drop relationships duplicating others already written by a load.
+
+    Relationships are the same if their heads, types, tails & properties
+    are, endpoints being identified by their database ids once written.
+    Relationships are remembered for the rest of the load, so this costs
+    memory in proportion to the distinct relationships written; those
+    written before a resumed load are not remembered.
+    """
+
+    def __init__(self):
+        # type: () -> None
+        self.seen = set()  # type: set
+        self.pending = []  # type: List[Tuple[Hashable, RelSpec]]
+        self.dropped = 0
+
+    @staticmethod
+    def identity(spec, ids):
+        # type: (RelSpec, Dict[Hashable, int]) -> Hashable
+        """Identity of `spec`, with the `ids` of its written endpoints.
+
+        Endpoints not yet written are identified by key, wrapped so as not
+        to be mistaken for ids.
+        """
+        head, tail = [ids[key] if key in ids else (key,)
+                      for key in (spec.head, spec.tail)]
+        return head, spec.type, tail, freeze(spec.properties or {})
+
+    def filter(self, rels, ids):
+        # type: (Iterable[RelSpec], Dict[Hashable, int]) -> List[RelSpec]
+        """The relationships of a chunk not duplicating any before them."""
+        kept = []  # type: List[RelSpec]
+        for spec in rels:
+            identity = self.identity(spec, ids)
+            if identity in self.seen:
+                self.dropped += 1
+                continue
+            self.seen.add(identity)
+            kept.append(spec)
+            if spec.head not in ids or spec.tail not in ids:
+                self.pending.append((identity, spec))
+        return kept
+
+    def written(self, ids):
+        # type: (Dict[Hashable, int]) -> None
+        """Identify relationships by the `ids` of endpoints just written."""
+        for identity, spec in self.pending:
+            self.seen.discard(identity)
+            self.seen.add(self.identity(spec, ids))
+        self.pending = []
+
+
+#: Specs of consecutive items, up to but excluding `document` & `item`,
+#: and the anchors no longer needed after them; or, with an `offset`, up
+#: to that many specs of item `item`.
+Chunk = namedtuple('Chunk', 'document item nodes rels released offset')
+Chunk.__new__.__defaults__ = (0,)
+
+
+class Checkpoint(object):
+    """Progress of a chunked load, saved as JSON after each chunk.
+
+    ``document`` and ``item`` locate the first top-level item not yet
+    written and ``anchors`` maps the anchors seen so far in that document
+    to database ids. Anchors are saved as pairs, since the keys of
+    :mod:`~gryaml.interchange` records may be integers. ``dropped`` counts
+    the duplicate relationships not written. ``offset`` counts the
+    expansions of a ``!gryaml.repeat`` item, or the rows of a
+    ``!gryaml.edges`` item, already written; see :func:`iter_chunks`.
+    """
+
+    def __init__(self, path=None, document=0, item=0, anchors=None,
+                 written=0, done=False, dropped=0, offset=0):
+        # type: (Optional[str], int, int, Optional[Dict[Hashable, int]], int, bool, int, int) -> None  # noqa: E501
+        self.path = path
+        self.document = document
+        self.item = item
+        self.anchors = dict(anchors or {})  # type: Dict[Hashable, int]
+        self.written = written
+        self.done = done
+        self.dropped = dropped
+        self.offset = offset
+
+    @classmethod
+    def read(cls, path):
+        # type: (str) -> Checkpoint
+        """Read the checkpoint at `path`, or start afresh if there is none."""
+        if not os.path.exists(path):
+            return cls(path)
+        with open(path) as fp:
+            return cls(path, **json.load(fp))
+
+    def save(self):
+        # type: () -> None
+        """Atomically replace the checkpoint file, if there is one."""
+        if self.path is None:
+            return
+        tmp_path = self.path + '.tmp'
+        with open(tmp_path, 'w') as fp:
+            json.dump({'document': self.document,
+                       'item': self.item,
+                       'anchors': list(self.anchors.items()),
+                       'written': self.written,
+                       'done': self.done,
+                       'dropped': self.dropped,
+                       'offset': self.offset}, fp)
+        os.rename(tmp_path, self.path)
+
+
+class Registry(object):
+    """Ids of nodes by name, shared by all the files & documents of a load.
+
+    Anchored nodes are registered by anchor as they are written, and
+    ``!gryaml.ref NAME`` endpoints resolve against the registry, so files
+    can reference each other's nodes without looking them up. Names are
+    registered with the scope of their file & document, from
+    :func:`anchor_scope`, and a node of another scope with the same anchor
+    raises :class:`ValueError`; one of the same scope, as when a document
+    is loaded again, replaces the earlier one. Ids are kept in an array
+    rather than as integer objects. With a `path`, the registry is saved as
+    JSON with each checkpoint, to share between runs.
+    """
+
+    def __init__(self, path=None, names=None, scopes=None):
+        # type: (Optional[str], Optional[Dict[str, int]], Optional[Dict[str, str]]) -> None  # noqa: E501
+        self.path = path
+        self.positions = {}  # type: Dict[str, int]
+        self.ids = array.array('q')
+        self.scopes = {}  # type: Dict[str, str]
+        scopes = scopes or {}
+        for name, id_ in sorted((names or {}).items()):
+            self.register(name, id_, scopes.get(name))
+
+    def __contains__(self, name):
+        # type: (Any) -> bool
+        return name in self.positions
+
+    def __getitem__(self, name):
+        # type: (str) -> int
+        return self.ids[self.positions[name]]
+
+    def __len__(self):
+        # type: () -> int
+        return len(self.positions)
+
+    def check(self, name, scope):
+        # type: (str, Optional[str]) -> None
+        """Raise :class:`ValueError` if `name` is registered by another
+        scope than `scope`.
+        """
+        registered = self.scopes.get(name)
+        if scope is not None and registered not in (None, scope):
+            raise ValueError('Anchor %r of %s is already registered, by %s'
+                             % (name, scope, registered))
+
+    def register(self, name, id_, scope=None):
+        # type: (str, int, Optional[str]) -> None
+        """Register the node with `id_` by `name`, anchored in `scope`."""
+        self.check(name, scope)
+        if scope is not None:
+            self.scopes[name] = scope
+        position = self.positions.get(name)
+        if position is None:
+            self.positions[name] = len(self.ids)
+            self.ids.append(id_)
+        else:
+            self.ids[position] = id_
+
+    def items(self):
+        # type: () -> Iterator[Tuple[str, int]]
+        """Pairs of name & id."""
+        return ((name, self.ids[position])
+                for name, position in self.positions.items())
+
+    def resolve(self, nodes, rels, ids, scope=None):
+        # type: (List[NodeSpec], List[RelSpec], Dict[Hashable, int], Optional[str]) -> None  # noqa: E501
+        """Add the ids of registered endpoints of `rels` to `ids`.
+
+        The anchored `nodes` to be registered with them are checked first,
+        so a collision is raised before they are written.
+        """
+        for spec in nodes:
+            name = anchor_of(spec.key)
+            if name is not None:
+                self.check(name, scope)
+        for spec in rels:
+            for key in spec.head, spec.tail:
+                name = anchor_of(key)
+                if key not in ids and name in self.positions:
+                    ids[key] = self[name]
+
+    def written(self, nodes, ids, scope=None):
+        # type: (List[NodeSpec], Dict[Hashable, int], Optional[str]) -> None
+        """Register the anchored `nodes` just written, with `ids`, in
+        `scope`.
+        """
+        for spec in nodes:
+            name = anchor_of(spec.key)
+            if name is not None:
+                self.register(name, ids[spec.key], scope)
+
+    @classmethod
+    def read(cls, path):
+        # type: (str) -> Registry
+        """Read the registry at `path`, or start afresh if there is none."""
+        if not os.path.exists(path):
+            return cls(path)
+        with open(path) as fp:
+            saved = json.load(fp)
+        # Ids alone, without scopes, as saved before they were registered
+        names = {name: value[0] if isinstance(value, list) else value
+                 for name, value in saved.items()}
+        scopes = {name: value[1] for name, value in saved.items()
+                  if isinstance(value, list)}
+        return cls(path, names, scopes)
+
+    def save(self):
+        # type: () -> None
+        """Atomically replace the registry file, if there is one."""
+        if self.path is None:
+            return
+        tmp_path = self.path + '.tmp'
+        with open(tmp_path, 'w') as fp:
+            json.dump({name: [id_, self.scopes.get(name)]
+                       for name, id_ in self.items()}, fp)
+        os.rename(tmp_path, self.path)
+
+
+def retry(func, retries=DEFAULT_RETRIES, backoff=DEFAULT_BACKOFF,
+          errors=None, sleep=time.sleep):
+    # type: (Callable[[], Any], int, float, Optional[Tuple[type, ...]], Callable[[float], Any]) -> Any  # noqa: E501
+    """Call `func`, retrying up to `retries` times on `errors`.
+
+    `errors` are by default those which are transient. The delay before each
+    retry doubles, starting from `backoff` seconds.
+    """
+    errors = errors or transient_errors()
+    for attempt in range(retries + 1):
+        try:
+            return func()
+        except errors:
+            if attempt == retries:
+                raise
+            sleep(backoff * 2 ** attempt)
+
+
+def iter_chunks(stream, chunk_size=DEFAULT_CHUNK_SIZE, document=0, item=0,
+                seen=(), alias_counts=None, anchor_window=None,
+                parser_class=EventParser, select=None, offset=0):
+    # type: (Union[str, IO], int, int, int, Iterable[str], Optional[List[Dict[str, int]]], Optional[int], type, Optional[Selection], int) -> Iterator[Chunk]  # noqa: E501
+    """Yield the entity specs of `stream` in chunks of whole items.
+
+    Chunks hold at least `chunk_size` specs, except at the end of a document,
+    as chunks never span documents. Items before `document` & `item` are
+    skipped; `seen` are the anchors of already written entities among them.
+    Only ``!gryaml.repeat`` & ``!gryaml.edges`` items are split between
+    chunks, as they are expanded, a chunk ending within one giving its
+    ``offset``: the number of a repeat's expansions so far, or of a
+    table's rows; the first `offset` of item `item` are skipped.
+    `alias_counts`, `anchor_window` & `parser_class` are as for
+    :class:`ItemComposer`; each chunk lists the anchors released by its
+    items. Given `select`, only the entities it selects are built; see
+    :class:`SpecBuilder`.
+    """
+    composer = ItemComposer(stream, parser_class=parser_class,
+                            alias_counts=alias_counts,
+                            anchor_window=anchor_window)
+    builder = SpecBuilder(select=select)
+    builder.seen.update(seen)
+    nodes = []  # type: List[NodeSpec]
+    rels = []  # type: List[RelSpec]
+    released = []  # type: List[str]
+    position = document, item
+
+    try:
+        for yaml_document, yaml_item, yaml_node in composer.iter_items():
+            if (yaml_document, yaml_item) >= (document, item):
+                if yaml_document != position[0]:
+                    if nodes or rels:
+                        yield Chunk(position[0], position[1],
+                                    nodes, rels, released)
+                        nodes, rels, released = [], [], []
+                    builder.seen.clear()
+                    builder.dropped.clear()
+
+                split = yaml_node.tag in (repeat_tag, edges_tag)
+                skip = offset if (yaml_document, yaml_item) == (document,
+                                                                item) else 0
+                for spec in builder.specs(yaml_node, skip):
+                    (nodes if isinstance(spec, NodeSpec)
+                     else rels).append(spec)
+                    if split and len(nodes) + len(rels) >= chunk_size:
+                        yield Chunk(yaml_document, yaml_item, nodes, rels,
+                                    released, builder.offset)
+                        nodes, rels, released = [], [], []
+                position = yaml_document, yaml_item + 1
+
+            for anchor in composer.release():
+                builder.seen.discard(anchor)
+                builder.dropped.discard(anchor)
+                released.append(anchor)
+
+            if len(nodes) + len(rels) >= chunk_size:
+                yield Chunk(position[0], position[1], nodes, rels, released)
+                nodes, rels, released = [], [], []
+    finally:
+        composer.dispose()
+
+    if nodes or rels:
+        yield Chunk(position[0], position[1], nodes, rels, released)
+
+
+def load(stream, graph, chunk_size=DEFAULT_CHUNK_SIZE, checkpoint=None,
+         retries=DEFAULT_RETRIES, backoff=DEFAULT_BACKOFF, alias_counts=None,
+         anchor_window=None, parser_class=EventParser, format='yaml',
+         dedupe=False, keep_anchors=False, load_id=None, transaction=None,
+         registry=None, select=None, load_index=True, source=None):
+    # type: (Union[str, IO, Iterable[Chunk]], Graph, int, Optional[Checkpoint], int, float, Optional[List[Dict[str, int]]], Optional[int], type, str, bool, bool, Optional[str], Any, Optional[Registry], Optional[Selection], bool, Optional[str]) -> Checkpoint  # noqa: E501
+    """Load gryaml YAML from `stream` into `graph` in chunks.
+
+    `graph` is a py2neo ``Graph`` or a :class:`~gryaml.backends.Backend`.
+    Each chunk from :func:`iter_chunks` is written in one transaction,
+    retrying on transient errors before its commit, and `checkpoint` is
+    saved after each. A commit failing such that the chunk may have been
+    written raises :exc:`~gryaml.backends.CommitUnknownError`. If
+    `checkpoint` records earlier progress, items before it are skipped and
+    its anchors are used for relationships to nodes already written.
+
+    Ids are kept only for anchors still in use; see :class:`ItemComposer`
+    for `alias_counts`, `anchor_window` & `parser_class`.
+
+    With another `format` than ``'yaml'``, `stream` holds records of the
+    :mod:`~gryaml.interchange` format instead. With ``'chunks'``, it is an
+    iterable of chunks already read, as by :func:`iter_chunks`, so a
+    fixture parsed once can be loaded repeatedly.
+
+    With `dedupe`, relationships duplicating those written before them are
+    dropped, as by :class:`RelDeduplicator`, and counted in the
+    checkpoint's ``dropped``.
+
+    With `keep_anchors`, anchored nodes keep their anchors, scoped by the
+    `source` file's name & their document, as by :func:`keep_anchor`, for
+    :mod:`~gryaml.delta` to identify them by.
+
+    With a `load_id`, entities are tagged with it, so :func:`reset` can
+    delete just them, through an index created first unless `load_index`
+    is false, as when the caller has already created it. Given a
+    `transaction`, as from :func:`rolled_back`, all chunks are written in
+    it, uncommitted, and not retried.
+
+    With a `registry`, shared by the loads of several files, anchored nodes
+    are registered in it, scoped by `source` & their document, and
+    ``!gryaml.ref`` endpoints resolved against it; see :class:`Registry`.
+    It is not saved by loads in a `transaction`. A relationship whose
+    endpoint's id, from the registry or `checkpoint`, is of no node raises
+    :exc:`~gryaml.backends.MissingEndpointError`.
+
+    With `select`, a :class:`Selection`, only the nodes & relationships it
+    selects are written. From YAML, the others are skipped before their
+    properties are constructed; otherwise the keys of the nodes skipped
+    are kept to the end of their document.
+    """
+    checkpoint = checkpoint or Checkpoint()
+    if checkpoint.done:
+        return checkpoint
+
+    backend = backend_for(graph)
+    ids = dict(checkpoint.anchors)  # type: Dict[Hashable, int]
+    deduplicator = RelDeduplicator() if dedupe else None
+    if load_id is not None and transaction is None and load_index:
+        backend.create_load_index()
+
+    if format == 'yaml':
+        chunks = iter_chunks(stream, chunk_size,
+                             checkpoint.document, checkpoint.item, ids,
+                             alias_counts, anchor_window, parser_class,
+                             select, checkpoint.offset)
+    elif format == 'chunks':
+        chunks = stream
+    else:
+        from .interchange import iter_chunks as iter_record_chunks
+        chunks = iter_record_chunks(stream, format, chunk_size,
+                                    checkpoint.document, checkpoint.item)
+
+    dropped = set()  # type: set
+    for chunk in chunks:
+        if chunk.document != checkpoint.document:
+            ids.clear()  # Anchors are scoped to their document
+            dropped.clear()
+        if select is not None and format != 'yaml':
+            chunk = select.chunk(chunk, dropped)
+        nodes, rels = chunk.nodes, chunk.rels
+        if keep_anchors:
+            nodes = [keep_anchor(spec, anchor_scope(source, chunk.document))
+                     for spec in nodes]
+        if deduplicator is not None:
+            rels = deduplicator.filter(rels, ids)
+        if load_id is not None:
+            nodes = [tag_load(spec, load_id) for spec in nodes]
+            rels = [tag_load(spec, load_id) for spec in rels]
+        if registry is not None:
+            registry.resolve(chunk.nodes, rels, ids,
+                             anchor_scope(source, chunk.document))
+        if transaction is not None:
+            ids.update(backend.write_chunk(nodes, rels, ids, transaction))
+        else:
+            ids.update(retry(lambda: backend.write_chunk(nodes, rels, ids),
+                             retries=retries, backoff=backoff,
+                             errors=backend.transient_errors()))
+        if deduplicator is not None:
+            deduplicator.written(ids)
+            checkpoint.dropped += len(chunk.rels) - len(rels)
+        if registry is not None:
+            registry.written(chunk.nodes, ids,
+                             anchor_scope(source, chunk.document))
+        # Only anchored entities can be referenced by later chunks
+        for key in [k for k in ids if k is None or isinstance(k, yaml.Node)]:
+            del ids[key]
+        for anchor in chunk.released:
+            ids.pop(anchor, None)
+
+        checkpoint.written += len(chunk.nodes) + len(rels)
+        checkpoint.document, checkpoint.item = chunk.document, chunk.item
+        checkpoint.offset = chunk.offset
+        checkpoint.anchors = dict(ids)
+        checkpoint.save()
+        if registry is not None and transaction is None:
+            registry.save()  # Not the ids of nodes yet to be rolled back
+
+    checkpoint.done = True
+    checkpoint.save()
+    return checkpoint
+
+
+def reset(graph, load_id, batch_size=DEFAULT_CHUNK_SIZE, rels=False):
+    # type: (Graph, str, int, bool) -> int
+    """Delete the entities of the load `load_id`, returning their number.
+
+    Nodes are deleted in transactions of `batch_size`, along with their
+    relationships; see :meth:`~gryaml.backends.Backend.delete_load` for
+    `rels`. Everything else in `graph` is left alone.
+    """
+    return backend_for(graph).delete_load(load_id, batch_size, rels)
+
+
+@contextmanager
+def rolled_back(graph):
+    # type: (Graph) -> Iterator[Any]
+    """Transaction for loads into `graph`, rolled back when done.
+
+    Entities loaded with it as the ``transaction`` of :func:`load` are only
+    visible within it, so query them with it too::
+
+        with rolled_back(graph) as tx:
+            load(stream, graph, transaction=tx)
+            tx.append(u'MATCH (n) RETURN count(n)', {})
+            assert tx.process() == [[(3,)]]
+
+    Statements cannot be run in the transactions of a
+    :class:`~gryaml.backends.MemoryBackend`, whose entities are read from
+    its ``nodes`` & ``rels`` until they are rolled back.
+    """
+    tx = backend_for(graph).transaction()
+    try:
+        yield tx
+    finally:
+        if not getattr(tx, 'finished', False):
+            tx.rollback()
@@ -0,0 +1,21 @@
+"""Database-independent description of gryaml nodes & relationships.
+
+A *spec* describes an entity to be written without creating it. Entities
+refer to each other by *key*: the YAML anchor of an anchored node, or some
+other hashable object that is unique within a load.
+
+:class:`Changes` describe updates & deletions of existing entities, by
+database id.
+"""
+from __future__ import absolute_import
+
+from collections import namedtuple
+
+NodeSpec = namedtuple('NodeSpec', 'key labels properties')
+RelSpec = namedtuple('RelSpec', 'key head type tail properties')
+
+#: Properties to replace, as ``(id, properties)`` pairs; labels to add to &
+#: remove from nodes, each mapped to a list of node ids; and the ids of
+#: relationships & nodes to delete.
+Changes = namedtuple('Changes', 'node_properties add_labels remove_labels'
+                                ' rel_properties delete_rels delete_nodes')
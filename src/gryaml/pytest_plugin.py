@@ -0,0 +1,312 @@
+"""Pytest plugin loading gryaml fixtures into a test database.
+
+Installed with gryaml, it provides two fixtures:
+
+* ``gryaml_graph``, the graph of the worker running the test, connected
+  and indexed by load id once per session; with
+  ``--gryaml-skip-unreachable``, tests are skipped if it is unreachable;
+* ``gryaml_load``, a function loading a YAML fixture into it by name or
+  path, which is deleted again after the test.
+
+Each fixture file is parsed once per session and its chunks kept, so
+loading it again only writes. Entities are tagged with a load id, as by
+:func:`gryaml.loader.load`, and reset by it, so tests need not delete
+everything.
+
+Under ``pytest-xdist`` each worker must get its own database, the URI
+naming one with ``{worker}`` (``gw0``, ...; ``master`` without workers) or
+``{index}`` (0, 1, ...), e.g. ``bolt://localhost:76{index}7``, since tests
+sharing one would see, and may delete, each other's entities. Load ids
+start with the worker id.
+
+Load, reset & parse timings are reported in the terminal summary, and
+those of the previous run in the header.
+"""
+from __future__ import absolute_import, division
+
+import os
+import re
+import time
+
+import pytest
+
+try:
+    from typing import (  # noqa: F401
+        Any, Callable, Dict, Iterator, List, Optional, Tuple
+    )
+except ImportError:
+    """Module :mod:`typing` not required for Py27-compatible type comments."""
+
+import gryaml
+from . import backends, loader
+
+#: Name the :class:`Timings` of a session are registered under.
+PLUGIN_NAME = 'gryaml-timings'
+
+#: Cache key of the previous run's totals.
+CACHE_KEY = 'gryaml/timings'
+
+DEFAULT_URI = 'http://localhost:7474/db/data'
+
+
+def pytest_addoption(parser):
+    # type: (Any) -> None
+    """Add options for the test database & fixtures."""
+    group = parser.getgroup('gryaml')
+    group.addoption('--gryaml-uri', action='store',
+                    default=os.environ.get('NEO4J_URI', DEFAULT_URI),
+                    help='Neo4j database to load fixtures into, per worker'
+                    ' with {worker} or {index}; default $NEO4J_URI or'
+                    ' %s' % DEFAULT_URI)
+    group.addoption('--gryaml-backend', action='store',
+                    choices=sorted(backends.BACKENDS),
+                    default=backends.Py2neoBackend.name,
+                    help='Write fixtures with this backend; "memory" needs'
+                    ' no database')
+    group.addoption('--gryaml-skip-unreachable', action='store_true',
+                    help='Skip tests using the database if it cannot be'
+                    ' reached, rather than fail them')
+    parser.addini('gryaml_fixtures', 'Directory of YAML fixtures loaded by'
+                  ' name, relative to the rootdir', default='tests/samples')
+
+
+def pytest_configure(config):
+    # type: (Any) -> None
+    """Register the session's :class:`Timings`."""
+    config.pluginmanager.register(Timings(config), PLUGIN_NAME)
+
+
+def worker_id():
+    # type: () -> str
+    """The ``pytest-xdist`` worker running this process, or ``master``."""
+    return os.environ.get('PYTEST_XDIST_WORKER', 'master')
+
+
+def worker_uri(uri, worker):
+    # type: (str, str) -> str
+    """`uri` with ``{worker}`` & ``{index}`` replaced for `worker`."""
+    index = re.sub(r'\D', '', worker) or '0'
+    return uri.replace('{worker}', worker).replace('{index}', index)
+
+
+def skip_py2neo1(reason):
+    # type: (str) -> None
+    """Skip the current test for `reason` if py2neo is older than 2.0."""
+    from ._py2neo import compat
+    if compat().py2neo_ver < 2:
+        pytest.skip(reason)
+
+
+def is_shared(uri, backend=None):
+    # type: (str, Optional[str]) -> bool
+    """Whether ``pytest-xdist`` workers would share the database at `uri`."""
+    return (backend != backends.MemoryBackend.name and
+            worker_uri(uri, 'gw0') == worker_uri(uri, 'gw1'))
+
+
+def connect_worker(uri, backend=None, skip_unreachable=False):
+    # type: (str, Optional[str], bool) -> Any
+    """Connect gryaml to this worker's database at `uri`, returning it.
+
+    Under ``pytest-xdist``, a database shared by the workers raises
+    :class:`pytest.UsageError`. With `skip_unreachable`, the current test
+    is skipped if the database cannot be reached; otherwise the error is
+    raised.
+    """
+    if worker_id() != 'master' and is_shared(uri, backend):
+        raise pytest.UsageError(
+            'pytest-xdist workers cannot share the Neo4j database at %s;'
+            ' name one per worker with {worker} or {index}' % uri)
+    graph = gryaml.connect(worker_uri(uri, worker_id()), backend=backend)
+    checked = backends.backend_for(graph)
+    try:
+        checked.check()
+    except checked.transient_errors() as error:
+        if not skip_unreachable:
+            raise
+        pytest.skip('Cannot reach Neo4j at %s: %s' % (uri, error))
+    return graph
+
+
+def fixture_name(path):
+    # type: (str) -> str
+    """Name of the fixture at `path` in timings: its file's, less extension."""
+    return os.path.splitext(os.path.basename(path))[0]
+
+
+def isolation(config):
+    # type: (Any) -> str
+    """Which database workers use: ``'database per worker'`` or
+    ``'shared database'``, which ``pytest-xdist`` workers cannot use.
+    """
+    if is_shared(config.getoption('gryaml_uri'),
+                 config.getoption('gryaml_backend')):
+        return 'shared database'
+    return 'database per worker'
+
+
+class Timings(object):
+    """Load, reset & parse timings of a session, by fixture.
+
+    Workers send theirs to the controlling process, which reports them all.
+    """
+
+    #: Fields of each fixture's record.
+    FIELDS = ('loads', 'load', 'resets', 'reset', 'parses', 'parse')
+
+    def __init__(self, config):
+        # type: (Any) -> None
+        self.config = config
+        self.records = {}  # type: Dict[str, Dict[str, float]]
+
+    def add(self, name, kind, seconds):
+        # type: (str, str, float) -> None
+        """Record a `kind` of operation on fixture `name` taking `seconds`."""
+        record = self.records.setdefault(
+            name, dict.fromkeys(self.FIELDS, 0))
+        record[kind + 's'] += 1
+        record[kind] += seconds
+
+    def merge(self, records):
+        # type: (Dict[str, Dict[str, float]]) -> None
+        """Add the `records` of another process."""
+        for name, other in records.items():
+            record = self.records.setdefault(
+                name, dict.fromkeys(self.FIELDS, 0))
+            for field in self.FIELDS:
+                record[field] += other[field]
+
+    def totals(self):
+        # type: () -> Dict[str, float]
+        """Sum of each field over all fixtures."""
+        return {field: sum(record[field] for record in self.records.values())
+                for field in self.FIELDS}
+
+    @staticmethod
+    def describe(record):
+        # type: (Dict[str, float]) -> str
+        return ('{loads:.0f} loads in {load:.3f}s, {resets:.0f} resets in'
+                ' {reset:.3f}s, {parses:.0f} parsed in {parse:.3f}s'
+                .format(**record))
+
+    def pytest_report_header(self, config):
+        # type: (Any) -> List[str]
+        lines = ['gryaml: %s backend, %s'
+                 % (config.getoption('gryaml_backend'), isolation(config))]
+        cache = getattr(config, 'cache', None)
+        previous = cache.get(CACHE_KEY, None) if cache is not None else None
+        if previous:
+            lines.append('gryaml fixtures, last run: %s'
+                         % self.describe(previous))
+        return lines
+
+    def pytest_sessionfinish(self, session):
+        # type: (Any) -> None
+        workeroutput = getattr(session.config, 'workeroutput', None)
+        if workeroutput is not None:
+            workeroutput['gryaml_timings'] = self.records
+
+    @pytest.hookimpl(optionalhook=True)
+    def pytest_testnodedown(self, node, error):
+        # type: (Any, Any) -> None
+        self.merge(getattr(node, 'workeroutput', {}).get('gryaml_timings',
+                                                         {}))
+
+    def pytest_terminal_summary(self, terminalreporter):
+        # type: (Any) -> None
+        if not self.records:
+            return
+        totals = self.totals()
+        terminalreporter.write_sep('-', 'gryaml fixtures')
+        terminalreporter.write_line('total: %s' % self.describe(totals))
+        for name, record in sorted(self.records.items(),
+                                   key=lambda item: -item[1]['load']):
+            terminalreporter.write_line('%s: %s'
+                                        % (name, self.describe(record)))
+        cache = getattr(self.config, 'cache', None)
+        if cache is not None:
+            cache.set(CACHE_KEY, totals)
+
+
+@pytest.fixture(scope='session')
+def gryaml_graph(pytestconfig):
+    # type: (Any) -> Any
+    """The graph of this worker's database, connected once per session.
+
+    It is also gryaml's module-level graph. Its index on load ids is
+    created here, once. Tests using it are skipped if py2neo, being older
+    than 2.0, cannot load fixtures, or, with ``--gryaml-skip-unreachable``,
+    if the database cannot be reached; they fail if it cannot otherwise, or
+    if ``pytest-xdist`` workers would share it. See :func:`connect_worker`.
+    """
+    backend = pytestconfig.getoption('gryaml_backend')
+    if backend == backends.Py2neoBackend.name:
+        skip_py2neo1('Fixtures are not loaded by py2neo < 2')
+    graph = connect_worker(
+        pytestconfig.getoption('gryaml_uri'), backend,
+        pytestconfig.getoption('gryaml_skip_unreachable'))
+    backends.backend_for(graph).create_load_index()
+    return graph
+
+
+@pytest.fixture(scope='session')
+def gryaml_chunks(pytestconfig):
+    # type: (Any) -> Callable[[str], List[loader.Chunk]]
+    """Function parsing a fixture into chunks, cached for the session.
+
+    Fixtures are named by a path, or by a name in the ``gryaml_fixtures``
+    directory, to which ``.yaml`` is added if it has no extension.
+    """
+    timings = pytestconfig.pluginmanager.get_plugin(PLUGIN_NAME)
+    directory = os.path.join(str(pytestconfig.rootdir),
+                             pytestconfig.getini('gryaml_fixtures'))
+    cache = {}  # type: Dict[str, List[loader.Chunk]]
+
+    def gryaml_chunks(fixture):
+        # type: (str) -> List[loader.Chunk]
+        path = str(fixture)
+        if not os.path.isfile(path):
+            path = os.path.join(directory, path)
+            if not os.path.splitext(path)[1]:
+                path += '.yaml'
+        if path not in cache:
+            start = time.time()
+            with open(path, 'rb') as stream:
+                cache[path] = list(loader.iter_chunks(stream))
+            timings.add(fixture_name(path), 'parse', time.time() - start)
+        return cache[path]
+
+    return gryaml_chunks
+
+
+@pytest.fixture
+def gryaml_load(request, gryaml_graph, gryaml_chunks):
+    # type: (Any, Any, Callable[[str], List[loader.Chunk]]) -> Iterator[Callable[[str], str]]  # noqa: E501
+    """Function loading a fixture into ``gryaml_graph``, returning its id.
+
+    Entities are tagged with the load id, which starts with the worker's,
+    and deleted by it after the test. See ``gryaml_chunks`` for naming
+    fixtures; a :class:`~gryaml.loader.Selection` loads just part of one.
+    """
+    timings = request.config.pluginmanager.get_plugin(PLUGIN_NAME)
+    loaded = []  # type: List[Tuple[str, str]]
+
+    def gryaml_load(fixture, select=None):
+        # type: (str, Optional[loader.Selection]) -> str
+        chunks = gryaml_chunks(fixture)
+        name = fixture_name(str(fixture))
+        load_id = '%s:%s:%d' % (worker_id(), request.node.nodeid,
+                                len(loaded))
+        start = time.time()
+        loader.load(chunks, gryaml_graph, format='chunks', load_id=load_id,
+                    select=select, load_index=False)
+        timings.add(name, 'load', time.time() - start)
+        loaded.append((name, load_id))
+        return load_id
+
+    yield gryaml_load
+
+    for name, load_id in reversed(loaded):
+        start = time.time()
+        loader.reset(gryaml_graph, load_id)
+        timings.add(name, 'reset', time.time() - start)
@@ -1,17 +1,40 @@
 """Support for dump/load w/PyYAML."""
 from __future__ import absolute_import, print_function
 
-from typing import Dict, List, Optional, Union
+import array
+import sys
+
+from typing import (
+    Any, Callable, Dict, List, Optional, Tuple, Union, TYPE_CHECKING
+)
 
 import yaml
 
-from py2neo_compat import Node, Relationship, to_dict
+if TYPE_CHECKING:
+    from py2neo_compat import Node, Relationship  # noqa: F401
 # from py2neo.cypher.core import Record
 
-from . import node, rel
+from . import arrays
+from ._py2neo import compat, edges, node, path, prefetch, rel
 
 node_tag = u'!gryaml.node'
 rel_tag = u'!gryaml.rel'
+#: Relationship endpoint referencing a node anchored in another file.
+ref_tag = u'!gryaml.ref'
+#: Typed numeric array property value; see :mod:`gryaml.arrays`.
+array_tag = u'!gryaml.array'
+#: Template of a node or relationship repeated with an index, which only
+#: the chunked loader expands; see :meth:`gryaml.loader.SpecBuilder.repeat`.
+repeat_tag = u'!gryaml.repeat'
+#: Table of relationships of one type, a row of endpoints & property
+#: values per relationship; see :func:`construct_edges`.
+edges_tag = u'!gryaml.edges'
+
+#: Keys of ``!gryaml.edges`` maps, and whether each is required.
+EDGES_KEYS = {u'type': True, u'keys': False, u'rows': True}
+#: Chain of nodes & the types of the relationships between them; see
+#: :func:`gryaml.path`.
+path_tag = u'!gryaml.path'
 
 
 def render_node(graph_node):
@@ -37,7 +60,7 @@ def render_node(graph_node):
     except TypeError:  # "Abstract nodes cannot have labels"
         pass
 
-    properties = to_dict(graph_node)
+    properties = compat().to_dict(graph_node)
     if properties:
         data.append({'properties': properties})
 
@@ -89,7 +112,7 @@ def render_relationship(graph_rel):
         graph_rel.end_node,
     ]
 
-    properties = to_dict(graph_rel)
+    properties = compat().to_dict(graph_rel)
     if properties:
         data.append({'properties': properties})
 
@@ -122,6 +145,223 @@ def rel_constructor(loader, yaml_node):
     return rel(*rel_constructor_simple(loader, yaml_node))
 
 
+def construct_edges(loader, yaml_node):
+    # type: (yaml.BaseLoader, yaml.Node) -> Tuple[str, List[Tuple[Any, Any, Dict[str, Any]]]]  # noqa: E501
+    """Construct the type & rows of a ``!gryaml.edges`` table.
+
+    The table is a map of a relationship ``type``, the property ``keys``,
+    if any, and ``rows`` of a head, a tail and up to a value per key::
+
+        !gryaml.edges
+        type: FOLLOWS
+        keys: [since, weight]
+        rows:
+        - [*alice, *bob, 2019, 0.5]
+        - [*bob, *alice]
+
+    Rows are constructed as ``(head, tail, properties)``; null values are
+    left out of the properties.
+    """
+    if yaml_node.id != 'mapping':  # Of either PyYAML or ruamel.yaml
+        raise yaml.constructor.ConstructorError(
+            None, None, 'expected a map for %s' % edges_tag,
+            yaml_node.start_mark)
+    fields = loader.construct_mapping(yaml_node, deep=True)
+    if (set(fields) - set(EDGES_KEYS) or
+            not all(key in fields
+                    for key, required in EDGES_KEYS.items() if required)):
+        raise yaml.constructor.ConstructorError(
+            'while constructing %s' % edges_tag, yaml_node.start_mark,
+            'expected a map of type, keys & rows, found keys %s'
+            % ', '.join(map(repr, fields)), yaml_node.start_mark)
+    keys = fields.get(u'keys') or []
+    if not isinstance(fields[u'rows'], list):
+        raise yaml.constructor.ConstructorError(
+            'while constructing %s' % edges_tag, yaml_node.start_mark,
+            'expected a sequence of rows', yaml_node.start_mark)
+    rows = []
+    for row in fields[u'rows']:
+        if not isinstance(row, list) or not 2 <= len(row) <= 2 + len(keys):
+            raise yaml.constructor.ConstructorError(
+                'while constructing %s' % edges_tag, yaml_node.start_mark,
+                'expected rows of a head, a tail & up to %d values'
+                % len(keys), yaml_node.start_mark)
+        rows.append((row[0], row[1],
+                     {key: value for key, value in zip(keys, row[2:])
+                      if value is not None}))
+    return fields[u'type'], rows
+
+
+def edges_constructor_simple(loader, yaml_node):
+    # type: (yaml.BaseLoader, yaml.Node) -> List[List]
+    """Construct a ``!gryaml.edges`` table as relationship sequences."""
+    reltype, rows = construct_edges(loader, yaml_node)
+    return [[head, reltype, tail] + ([properties] if properties else [])
+            for head, tail, properties in rows]
+
+
+def edges_constructor(loader, yaml_node):
+    # type: (yaml.BaseLoader, yaml.Node) -> List[Relationship]
+    """Construct the Neo4j relationships of a ``!gryaml.edges`` table.
+
+    They are created together; see :func:`gryaml.edges`.
+    """
+    return edges(*construct_edges(loader, yaml_node))
+
+
+def path_constructor_simple(loader, yaml_node):
+    # type: (yaml.BaseLoader, yaml.Node) -> List
+    """Construct a sequence from a ``!gryaml.path`` sequence."""
+    return loader.construct_sequence(yaml_node, deep=True)
+
+
+def path_constructor(loader, yaml_node):
+    # type: (yaml.BaseLoader, yaml.Node) -> List[Relationship]
+    """Construct the Neo4j relationships along a ``!gryaml.path``."""
+    try:
+        return path(*path_constructor_simple(loader, yaml_node))
+    except ValueError as error:
+        raise yaml.constructor.ConstructorError(
+            'while constructing %s' % path_tag, yaml_node.start_mark,
+            str(error), yaml_node.start_mark)
+
+
+def repeat_constructor(loader, yaml_node):
+    # type: (yaml.BaseLoader, yaml.Node) -> None
+    """Refuse a ``!gryaml.repeat``, which only the chunked loader expands."""
+    raise yaml.constructor.ConstructorError(
+        'while constructing %s' % repeat_tag, yaml_node.start_mark,
+        'templates are expanded only by gryaml.loader.load & gryaml-load',
+        yaml_node.start_mark)
+
+
+def array_representer(dumper, value):
+    # type: (yaml.BaseDumper, Any) -> yaml.Node
+    """Represent an array as a ``!gryaml.array`` map, if it can be.
+
+    Arrays of other than booleans & numbers are represented as lists.
+    """
+    try:
+        fields = arrays.encode(value)
+    except ValueError:
+        return dumper.represent_list(arrays.to_list(value))
+    return dumper.represent_mapping(array_tag, fields, flow_style=True)
+
+
+def array_constructor(loader, yaml_node):
+    # type: (yaml.BaseLoader, yaml.Node) -> Any
+    """Construct an array from a ``!gryaml.array`` map."""
+    if not isinstance(yaml_node, yaml.MappingNode):
+        raise yaml.constructor.ConstructorError(
+            None, None, 'expected a map for %s' % array_tag,
+            yaml_node.start_mark)
+    fields = loader.construct_mapping(yaml_node, deep=True)
+    try:
+        return arrays.decode(fields['dtype'], fields['data'],
+                             fields.get('shape'))
+    except (KeyError, TypeError, ValueError) as error:
+        raise yaml.constructor.ConstructorError(
+            'while constructing %s' % array_tag, yaml_node.start_mark,
+            'expected dtype, data & shape: %s' % error,
+            yaml_node.start_mark)
+
+
+def add_array_representers(dumper):
+    # type: (type) -> None
+    """Represent :class:`array.array` & NumPy arrays with `dumper`.
+
+    NumPy arrays only if NumPy is installed. `dumper` may also be a
+    ruamel.yaml representer class.
+    """
+    dumper.add_representer(array.array, array_representer)
+    numpy = arrays.numpy_module()
+    if numpy is not None:
+        dumper.add_multi_representer(numpy.ndarray, array_representer)
+
+
+# Representers waiting for :mod:`py2neo` to be imported
+_deferred = []  # type: List[Tuple[type, Callable, Callable]]
+# Representers of ``object`` of dumpers with deferred representers, as
+# before their hook was added
+_fallbacks = {}  # type: Dict[type, Optional[Callable]]
+
+
+def add_entity_representers(dumper, node_rep, rel_rep, defer=False):
+    # type: (type, Callable, Callable, bool) -> None
+    """Add representers for py2neo nodes & relationships to `dumper`.
+
+    `dumper` may also be a ruamel.yaml representer class.
+
+    With `defer`, if py2neo has not been imported there can be no entities
+    to represent yet, so this waits until it is, by gryaml or otherwise:
+    until then, `dumper` represents objects it has no representer for by
+    :func:`represent_deferred`.
+    """
+    if defer and 'py2neo' not in sys.modules:
+        _deferred.append((dumper, node_rep, rel_rep))
+        if dumper not in _fallbacks:
+            _fallbacks[dumper] = dumper.yaml_multi_representers.get(object)
+            dumper.add_multi_representer(object, represent_deferred)
+        return
+
+    _restore_fallback(dumper)
+    py2neo_compat = compat()
+    dumper.add_multi_representer(py2neo_compat.Node, node_rep)
+    dumper.add_multi_representer(py2neo_compat.Relationship, rel_rep)
+    dumper.add_representer(list, list_representer)
+
+
+def list_representer(dumper, data):
+    # type: (Any, list) -> yaml.SequenceNode
+    """Represent a list, first prefetching the bound entities in it.
+
+    So ``yaml.dump`` of query results pulls them in batches rather than one
+    by one as they are rendered; see :func:`gryaml.prefetch`.
+    """
+    prefetch(data)
+    return dumper.represent_list(data)
+
+
+def _restore_fallback(dumper):
+    # type: (type) -> None
+    """Remove the hook of :func:`represent_deferred` from `dumper`."""
+    if dumper not in _fallbacks:
+        return
+    fallback = _fallbacks.pop(dumper)
+    if fallback is None:
+        dumper.yaml_multi_representers.pop(object, None)
+    else:
+        dumper.add_multi_representer(object, fallback)
+
+
+def represent_deferred(dumper, data):
+    # type: (Any, Any) -> Any
+    """Represent `data`, adding deferred representers if py2neo is imported.
+
+    Dumpers fall back on this for objects without representers, so py2neo
+    entities are represented once py2neo has been imported, whether or not
+    gryaml imported it. Other objects are represented as before.
+    """
+    if 'py2neo' in sys.modules:
+        compat()  # Adds deferred representers, & removes this
+        return dumper.represent_data(data)
+    fallback = None
+    for cls in type(dumper).__mro__:
+        if cls in _fallbacks:
+            fallback = _fallbacks[cls]
+            break
+    if fallback is None:
+        fallback = dumper.yaml_representers[None]
+    return fallback(dumper, data)
+
+
+def register_deferred():
+    # type: () -> None
+    """Add representers deferred until :mod:`py2neo` was imported."""
+    while _deferred:
+        add_entity_representers(*_deferred.pop(0))
+
+
 def register(safe=False):
     # type: (Optional[bool]) -> None
     """Register representers & constructors for nodes & rels."""
@@ -133,11 +373,15 @@ def register(safe=False):
         dumper = yaml.Dumper
         loader = yaml.Loader
 
-    yaml.add_multi_representer(Node, node_representer, Dumper=dumper)
-    yaml.add_multi_representer(Relationship, rel_representer, Dumper=dumper)
+    add_entity_representers(dumper, node_representer, rel_representer)
+    add_array_representers(dumper)
 
     yaml.add_constructor(node_tag, node_constructor, Loader=loader)
     yaml.add_constructor(rel_tag, rel_constructor, Loader=loader)
+    yaml.add_constructor(edges_tag, edges_constructor, Loader=loader)
+    yaml.add_constructor(path_tag, path_constructor, Loader=loader)
+    yaml.add_constructor(repeat_tag, repeat_constructor, Loader=loader)
+    yaml.add_constructor(array_tag, array_constructor, Loader=loader)
 
 
 def register_simple(safe=True):
@@ -151,13 +395,17 @@ def register_simple(safe=True):
         dumper = yaml.Dumper
         loader = yaml.Loader
 
-    yaml.add_multi_representer(Node, node_representer_simple, Dumper=dumper)
-    yaml.add_multi_representer(Relationship, rel_representer_simple,
-                               Dumper=dumper)
+    add_entity_representers(dumper, node_representer_simple,
+                            rel_representer_simple, defer=True)
+    add_array_representers(dumper)
 
     yaml.add_constructor(node_tag, node_constructor_simple, Loader=loader)
 
     yaml.add_constructor(rel_tag, rel_constructor_simple, Loader=loader)
+    yaml.add_constructor(edges_tag, edges_constructor_simple, Loader=loader)
+    yaml.add_constructor(path_tag, path_constructor_simple, Loader=loader)
+    yaml.add_constructor(repeat_tag, repeat_constructor, Loader=loader)
+    yaml.add_constructor(array_tag, array_constructor, Loader=loader)
 
 
 def _unregister():
@@ -172,12 +420,28 @@ def _unregister():
     """
 
     for loader in [yaml.BaseLoader, yaml.Loader, yaml.SafeLoader]:
-        for tag in [node_tag, rel_tag]:
+        for tag in [node_tag, rel_tag, edges_tag, path_tag, repeat_tag,
+                    array_tag]:
             loader.yaml_constructors.pop(tag, None)
             loader.yaml_multi_constructors.pop(tag, None)
 
+    numpy = sys.modules.get('numpy')
+    for dumper in [yaml.BaseDumper, yaml.Dumper, yaml.SafeDumper]:
+        dumper.yaml_representers.pop(array.array, None)
+        if numpy is not None:
+            dumper.yaml_multi_representers.pop(numpy.ndarray, None)
+
+    del _deferred[:]
+    for dumper in list(_fallbacks):
+        _restore_fallback(dumper)
+    if 'py2neo_compat' not in sys.modules:
+        return
+
+    py2neo_compat = compat()
     for dumper in [yaml.BaseDumper, yaml.Dumper, yaml.SafeDumper]:
-        for cls in [Node, Relationship]:
+        if dumper.yaml_representers.get(list) is list_representer:
+            dumper.add_representer(list, yaml.SafeDumper.represent_list)
+        for cls in [py2neo_compat.Node, py2neo_compat.Relationship]:
             dumper.yaml_representers.pop(cls, None)
             dumper.yaml_multi_representers.pop(cls, None)
 
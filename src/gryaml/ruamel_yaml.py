@@ -0,0 +1,123 @@
+"""Support for dump/load w/ruamel.yaml.
+
+Unlike PyYAML, ruamel.yaml keeps constructors & representers per ``YAML``
+instance (by way of its classes), so rather than registering globally,
+:func:`engine` makes an instance with gryaml's added.
+"""
+from __future__ import absolute_import
+
+try:
+    from typing import Any, IO, Optional, Union  # noqa: F401
+except ImportError:
+    """Module :mod:`typing` not required for Py27-compatible type comments."""
+
+import yaml.events
+from ruamel.yaml import YAML
+
+from .pyyaml import (
+    add_array_representers, add_entity_representers, array_constructor,
+    array_tag, edges_constructor, edges_constructor_simple, edges_tag,
+    node_constructor, node_constructor_simple, node_representer,
+    node_representer_simple, node_tag, path_constructor,
+    path_constructor_simple, path_tag, rel_constructor,
+    rel_constructor_simple, rel_representer, rel_representer_simple, rel_tag,
+    repeat_constructor, repeat_tag
+)
+
+
+def engine(typ='safe', simple=False, pure=False):
+    # type: (str, bool, bool) -> YAML
+    """Make a ruamel.yaml ``YAML`` instance handling gryaml nodes & rels.
+
+    With ``typ='safe'``, loading uses ruamel.yaml's C parser if
+    ``ruamel.yaml.clib`` is installed and not `pure`. With ``typ='rt'``,
+    loading & dumping round-trip, keeping comments, key order & styles.
+
+    With `simple`, nodes & rels are constructed with only native types, as
+    by :func:`gryaml.register_simple`, except that round-trip instances
+    leave them as sequences with their tags, so YAML loaded, edited &
+    dumped again keeps its tags as well as its comments. Round-trip
+    instances also leave ``!gryaml.array`` maps as they are.
+    """
+    yaml_ = YAML(typ=typ, pure=pure)
+    # Subclass to add to the instance without touching ruamel.yaml's own
+    yaml_.Constructor = constructor = type(
+        'GryamlConstructor', (yaml_.Constructor,), {})
+    yaml_.Representer = representer = type(
+        'GryamlRepresenter', (yaml_.Representer,), {})
+
+    if simple:
+        add_entity_representers(representer, node_representer_simple,
+                                rel_representer_simple, defer=True)
+        if typ != 'rt':
+            constructor.add_constructor(node_tag, node_constructor_simple)
+            constructor.add_constructor(rel_tag, rel_constructor_simple)
+            constructor.add_constructor(edges_tag, edges_constructor_simple)
+            constructor.add_constructor(path_tag, path_constructor_simple)
+    else:
+        add_entity_representers(representer, node_representer,
+                                rel_representer, defer=True)
+        constructor.add_constructor(node_tag, node_constructor)
+        constructor.add_constructor(rel_tag, rel_constructor)
+        constructor.add_constructor(edges_tag, edges_constructor)
+        constructor.add_constructor(path_tag, path_constructor)
+
+    add_array_representers(representer)
+    if typ != 'rt':
+        constructor.add_constructor(array_tag, array_constructor)
+        constructor.add_constructor(repeat_tag, repeat_constructor)
+    return yaml_
+
+
+class EventParser(object):
+    """Parse with ruamel.yaml, producing PyYAML events.
+
+    This can stand in for PyYAML's parser in the chunked loader; see
+    :class:`~gryaml.loader.ItemComposer`.
+    """
+
+    #: Attributes of the events of either library.
+    attributes = ('anchor', 'tag', 'implicit', 'value', 'style',
+                  'flow_style', 'explicit', 'version', 'tags', 'encoding',
+                  'start_mark', 'end_mark')
+
+    def __init__(self, stream, pure=False):
+        # type: (Union[str, IO], bool) -> None
+        self._events = YAML(typ='safe', pure=pure).parse(stream)
+        self._event = None  # type: Optional[yaml.events.Event]
+
+    def _convert(self, event):
+        # type: (Any) -> yaml.events.Event
+        event_class = getattr(yaml.events, type(event).__name__)
+        converted = event_class.__new__(event_class)
+        for attribute in self.attributes:
+            if hasattr(event, attribute):
+                setattr(converted, attribute, getattr(event, attribute))
+        return converted
+
+    def peek_event(self):
+        # type: () -> Optional[yaml.events.Event]
+        """Return the next event without consuming it."""
+        if self._event is None:
+            event = next(self._events, None)
+            self._event = None if event is None else self._convert(event)
+        return self._event
+
+    def check_event(self, *choices):
+        # type: (*type) -> bool
+        """Check whether the next event is one of `choices`, if any."""
+        event = self.peek_event()
+        return event is not None and (not choices or
+                                      isinstance(event, choices))
+
+    def get_event(self):
+        # type: () -> Optional[yaml.events.Event]
+        """Consume & return the next event."""
+        event = self.peek_event()
+        self._event = None
+        return event
+
+    def dispose(self):
+        # type: () -> None
+        """Stop parsing."""
+        self._events.close()
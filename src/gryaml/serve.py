@@ -0,0 +1,468 @@
+"""Load gryaml YAML posted to a long-running local HTTP service.
+
+Starting Python, importing py2neo & PyYAML and connecting to Neo4j can take
+far longer than loading a small fixture, so a test suite running hundreds
+of loads spends most of its time starting up. ``gryaml-serve`` pays that
+once: it listens on a local TCP port or Unix socket, and each load posted
+to it is queued for one of a fixed number of workers, each writing with a
+connection opened & checked at startup and reused by every later load.
+
+Endpoints, all answering with JSON:
+
+``POST /load``
+    Load the YAML (or :mod:`~gryaml.interchange` records) in the request
+    body, as :func:`gryaml.loader.load`, taking ``chunk_size``,
+    ``load_id``, ``dedupe``, ``keep_anchors`` & ``format`` from the query
+    string. YAML is validated first, unless ``validate=0``, in the request
+    thread, so malformed files are rejected without taking a worker.
+``POST /reset``
+    Delete the entities of ``load_id``, as :func:`gryaml.loader.reset`.
+``GET /metrics``
+    Counts of loads, failures, rejections & entities written, load times,
+    and the numbers of loads queued & running.
+
+When the queue is full, requests are refused with 503 rather than held,
+so clients can back off.
+"""
+from __future__ import absolute_import, print_function
+
+import io
+import json
+import os
+import threading
+import time
+from contextlib import contextmanager
+
+import yaml
+
+try:
+    from http.server import BaseHTTPRequestHandler, HTTPServer
+    from queue import Full, Queue
+    from socketserver import ThreadingMixIn, UnixStreamServer
+    from urllib.parse import parse_qs, urlsplit
+except ImportError:  # Python 2
+    from BaseHTTPServer import (  # type: ignore
+        BaseHTTPRequestHandler, HTTPServer
+    )
+    from Queue import Full, Queue  # type: ignore
+    from SocketServer import ThreadingMixIn, UnixStreamServer  # type: ignore
+    from urlparse import parse_qs, urlsplit  # type: ignore
+
+try:
+    from typing import (  # noqa: F401
+        Any, Callable, Dict, List, Optional, Tuple, Union
+    )
+except ImportError:
+    """Module :mod:`typing` not required for Py27-compatible type comments."""
+
+from . import loader, validate
+from .backends import backend_for
+from .interchange import FORMATS
+
+DEFAULT_ADDRESS = ('127.0.0.1', 7475)
+DEFAULT_WORKERS = 4
+DEFAULT_QUEUE_SIZE = 64
+
+
+class ConnectionPool(object):
+    """Graph connections opened up front and lent to one load at a time.
+
+    `connect` is called for each connection, which is checked before use. A
+    connection failing with a transient error is dropped and reopened when
+    next taken, so a restarted database is reconnected to.
+    """
+
+    def __init__(self, connect, size):
+        # type: (Callable[[], Any], int) -> None
+        self.connect = connect
+        self.idle = Queue()  # type: Queue
+        for _ in range(size):
+            self.idle.put(self.open())
+
+    def open(self):
+        # type: () -> Any
+        """Open & check a new connection."""
+        graph = self.connect()
+        backend_for(graph).check()
+        return graph
+
+    @contextmanager
+    def connection(self):
+        # type: () -> Any
+        """Borrow an idle connection, waiting for one if need be."""
+        graph = self.idle.get()
+        try:
+            if graph is None:
+                graph = self.open()
+            yield graph
+        except Exception as error:
+            if (graph is not None and
+                    isinstance(error, backend_for(graph).transient_errors())):
+                graph = None
+            raise
+        finally:
+            self.idle.put(graph)
+
+
+class Job(object):
+    """A queued call, which the submitting thread waits on."""
+
+    def __init__(self, func):
+        # type: (Callable[[Any], Any]) -> None
+        self.func = func
+        self.result = None  # type: Any
+        self.error = None  # type: Optional[BaseException]
+        self.done = threading.Event()
+
+    def wait(self):
+        # type: () -> Any
+        """Wait for the job, returning its result or raising its error."""
+        self.done.wait()
+        if self.error is not None:
+            raise self.error
+        return self.result
+
+
+class Metrics(object):
+    """Counts & times of loads, updated by the workers."""
+
+    def __init__(self):
+        # type: () -> None
+        self.lock = threading.Lock()
+        self.started = time.time()
+        self.loads = 0
+        self.failed = 0
+        self.rejected = 0
+        self.written = 0
+        self.dropped = 0
+        self.seconds = 0.0
+        self.max_seconds = 0.0
+        self.active = 0
+
+    def loaded(self, checkpoint, seconds):
+        # type: (loader.Checkpoint, float) -> None
+        """Count a load that wrote `checkpoint` in `seconds`."""
+        with self.lock:
+            self.loads += 1
+            self.written += checkpoint.written
+            self.dropped += checkpoint.dropped
+            self.seconds += seconds
+            self.max_seconds = max(self.max_seconds, seconds)
+
+    def as_dict(self):
+        # type: () -> Dict[str, Any]
+        """The metrics as JSON-able values."""
+        with self.lock:
+            return {'uptime': time.time() - self.started,
+                    'loads': self.loads, 'failed': self.failed,
+                    'rejected': self.rejected, 'written': self.written,
+                    'dropped': self.dropped, 'seconds': self.seconds,
+                    'max_seconds': self.max_seconds,
+                    'mean_seconds': self.seconds / self.loads
+                    if self.loads else 0.0,
+                    'active': self.active}
+
+
+class Service(object):
+    """Loads queued for `workers` threads writing through `pool`.
+
+    At most `queue_size` loads wait; :meth:`submit` raises
+    :class:`queue.Full` rather than wait for room.
+    """
+
+    def __init__(self, pool, workers=DEFAULT_WORKERS,
+                 queue_size=DEFAULT_QUEUE_SIZE,
+                 parser_class=loader.EventParser):
+        # type: (ConnectionPool, int, int, type) -> None
+        self.pool = pool
+        self.parser_class = parser_class
+        self.jobs = Queue(queue_size)  # type: Queue
+        self.metrics = Metrics()
+        self.threads = [threading.Thread(target=self.work)
+                        for _ in range(workers)]
+        for thread in self.threads:
+            thread.daemon = True
+            thread.start()
+
+    def work(self):
+        # type: () -> None
+        """Run queued jobs, until given ``None``."""
+        metrics = self.metrics
+        while True:
+            job = self.jobs.get()
+            if job is None:
+                return
+            with metrics.lock:
+                metrics.active += 1
+            try:
+                with self.pool.connection() as graph:
+                    job.result = job.func(graph)
+            except Exception as error:
+                job.error = error
+                with metrics.lock:
+                    metrics.failed += 1
+            finally:
+                with metrics.lock:
+                    metrics.active -= 1
+                job.done.set()
+
+    def submit(self, func):
+        # type: (Callable[[Any], Any]) -> Job
+        """Queue a call of `func` with a connection."""
+        job = Job(func)
+        try:
+            self.jobs.put_nowait(job)
+        except Full:
+            with self.metrics.lock:
+                self.metrics.rejected += 1
+            raise
+        return job
+
+    def load(self, data, **kwargs):
+        # type: (bytes, **Any) -> loader.Checkpoint
+        """Load `data`, as :func:`gryaml.loader.load` with `kwargs`."""
+        def load(graph):
+            start = time.time()
+            checkpoint = loader.load(io.BytesIO(data), graph,
+                                     parser_class=self.parser_class,
+                                     **kwargs)
+            self.metrics.loaded(checkpoint, time.time() - start)
+            return checkpoint
+        return self.submit(load).wait()
+
+    def reset(self, load_id):
+        # type: (str) -> int
+        """Delete the entities of `load_id`, returning how many."""
+        return self.submit(lambda graph: loader.reset(graph, load_id)).wait()
+
+    def metrics_dict(self):
+        # type: () -> Dict[str, Any]
+        """:class:`Metrics` and the numbers of workers & queued loads."""
+        return dict(self.metrics.as_dict(), queued=self.jobs.qsize(),
+                    workers=len(self.threads))
+
+    def close(self):
+        # type: () -> None
+        """Stop the workers once the loads already queued are done."""
+        for _ in self.threads:
+            self.jobs.put(None)
+        for thread in self.threads:
+            thread.join()
+
+
+class BadRequest(ValueError):
+    """A request that cannot be served as made."""
+
+
+def flag(value):
+    # type: (str) -> bool
+    """Parse a boolean query parameter."""
+    if value.lower() in ('1', 'true', 'yes', 'on', ''):
+        return True
+    if value.lower() in ('0', 'false', 'no', 'off'):
+        return False
+    raise BadRequest('expected a boolean, found %r' % value)
+
+
+def load_options(query):
+    # type: (Dict[str, str]) -> Dict[str, Any]
+    """Keyword arguments of :func:`gryaml.loader.load` from a query."""
+    options = {}  # type: Dict[str, Any]
+    for key, value in query.items():
+        if key == 'chunk_size':
+            try:
+                options[key] = int(value)
+            except ValueError:
+                raise BadRequest('chunk_size must be an integer')
+            if options[key] < 1:
+                raise BadRequest('chunk_size must be positive')
+        elif key == 'load_id':
+            options[key] = value
+        elif key in ('dedupe', 'keep_anchors'):
+            options[key] = flag(value)
+        elif key == 'format':
+            if value not in FORMATS:
+                raise BadRequest('format must be one of: %s'
+                                 % ', '.join(FORMATS))
+            options[key] = value
+        elif key != 'validate':
+            raise BadRequest('unknown parameter %r' % key)
+    return options
+
+
+class Handler(BaseHTTPRequestHandler):
+    """Serve loads, resets & metrics of ``server.service``."""
+
+    def address_string(self):
+        # type: () -> str
+        # Clients of Unix sockets have no address
+        if isinstance(self.client_address, tuple):
+            return self.client_address[0]
+        return self.server.server_address
+
+    def respond(self, status, body, headers=()):
+        # type: (int, Dict[str, Any], Any) -> None
+        """Send `body` as JSON."""
+        data = json.dumps(body, sort_keys=True).encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(data)))
+        for header in headers:
+            self.send_header(*header)
+        self.end_headers()
+        self.wfile.write(data)
+
+    def route(self):
+        # type: () -> Tuple[str, Dict[str, str]]
+        """The path & query parameters of the request."""
+        url = urlsplit(self.path)
+        query = parse_qs(url.query, keep_blank_values=True)
+        return url.path, {key: values[-1] for key, values in query.items()}
+
+    def do_GET(self):
+        # type: () -> None
+        path, _ = self.route()
+        if path == '/metrics':
+            self.respond(200, self.server.service.metrics_dict())
+        else:
+            self.respond(404, {'error': 'not found: %s' % path})
+
+    def do_POST(self):
+        # type: () -> None
+        path, query = self.route()
+        service = self.server.service
+        try:
+            if path == '/load':
+                options = load_options(query)
+                data = self.rfile.read(int(self.headers.get('Content-Length')
+                                           or 0))
+                if (options.get('format', 'yaml') == 'yaml' and
+                        flag(query.get('validate', '1'))):
+                    problems = validate.validate(data, service.parser_class)
+                    if problems:
+                        return self.respond(422, {'problems': [
+                            str(problem) for problem in problems]})
+                checkpoint = service.load(data, **options)
+                self.respond(200, {'written': checkpoint.written,
+                                   'dropped': checkpoint.dropped})
+            elif path == '/reset':
+                if 'load_id' not in query:
+                    raise BadRequest('load_id is required')
+                self.respond(200, {'deleted':
+                                   service.reset(query['load_id'])})
+            else:
+                self.respond(404, {'error': 'not found: %s' % path})
+        except Full:
+            self.respond(503, {'error': 'too many loads queued'},
+                         [('Retry-After', '1')])
+        except (BadRequest, yaml.YAMLError) as error:
+            self.respond(400, {'error': str(error)})
+        except Exception as error:
+            self.respond(500, {'error': '%s: %s' % (type(error).__name__,
+                                                    error)})
+
+
+class ThreadingHTTPServer(ThreadingMixIn, HTTPServer):
+    """HTTP server handling each request in a thread."""
+
+    daemon_threads = True
+
+
+class UnixHTTPServer(ThreadingMixIn, UnixStreamServer):
+    """HTTP server on a Unix socket, handling each request in a thread."""
+
+    daemon_threads = True
+
+    def server_bind(self):
+        # type: () -> None
+        if os.path.exists(self.server_address):
+            os.unlink(self.server_address)  # Left by an earlier server
+        UnixStreamServer.server_bind(self)
+
+    def server_close(self):
+        # type: () -> None
+        UnixStreamServer.server_close(self)
+        if os.path.exists(self.server_address):
+            os.unlink(self.server_address)
+
+
+def make_server(service, address=DEFAULT_ADDRESS):
+    # type: (Service, Union[str, Tuple[str, int]]) -> Any
+    """A server for `service` at `address`, a Unix socket path or pair of
+    host & port."""
+    if isinstance(address, tuple):
+        server = ThreadingHTTPServer(address, Handler)
+    else:
+        server = UnixHTTPServer(address, Handler)
+    server.service = service
+    return server
+
+
+def main(args=None):
+    # type: (Optional[List[str]]) -> None
+    """Serve loads of gryaml YAML over local HTTP, with warm connections."""
+    import argparse
+    from .backends import BACKENDS, MemoryBackend, Py2neoBackend, get_backend
+
+    parser = argparse.ArgumentParser(description=main.__doc__)
+    parser.add_argument('--neo4j-uri', action='store',
+                        default=os.environ.get('NEO4J_URI', None),
+                        help='URI for Neo4j; environment variable'
+                             ' "NEO4J_URI" may also be used.')
+    parser.add_argument('--backend', action='store', choices=sorted(BACKENDS),
+                        default=Py2neoBackend.name,
+                        help='Write with this backend. (Default: %(default)s)')
+    parser.add_argument('--yaml-engine', action='store',
+                        choices=loader.ENGINES, default='pyyaml',
+                        help='Parse YAML with this library.'
+                             ' (Default: %(default)s)')
+    listen = parser.add_mutually_exclusive_group()
+    listen.add_argument('--listen', action='store', metavar='[HOST:]PORT',
+                        default='%s:%d' % DEFAULT_ADDRESS,
+                        help='Listen on this TCP address.'
+                             ' (Default: %(default)s)')
+    listen.add_argument('--socket', action='store', metavar='PATH',
+                        help='Listen on this Unix socket instead.')
+    parser.add_argument('--workers', action='store', type=int,
+                        default=DEFAULT_WORKERS,
+                        help='Loads run at once, each with its own'
+                             ' connection. (Default: %(default)s)')
+    parser.add_argument('--queue-size', action='store', type=int,
+                        default=DEFAULT_QUEUE_SIZE,
+                        help='Loads waiting for a worker before more are'
+                             ' refused. (Default: %(default)s)')
+    config = parser.parse_args(args)
+
+    if config.backend == MemoryBackend.name:
+        memory = MemoryBackend()
+        connect = lambda: memory  # noqa: E731 -- Shared by all workers
+    elif not config.neo4j_uri:
+        parser.error('--neo4j-uri or environment variable "NEO4J_URI"'
+                     ' is required')
+    else:
+        backend = get_backend(config.backend)
+        connect = lambda: backend.connect(config.neo4j_uri)  # noqa: E731
+
+    if config.socket:
+        address = config.socket  # type: Union[str, Tuple[str, int]]
+    else:
+        host, _, port = config.listen.rpartition(':')
+        address = (host or DEFAULT_ADDRESS[0], int(port))
+
+    service = Service(ConnectionPool(connect, config.workers),
+                      config.workers, config.queue_size,
+                      loader.event_parser(config.yaml_engine))
+    server = make_server(service, address)
+    print('Serving on %s' % (address if config.socket else
+                             'http://%s:%d' % address))
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        service.close()
+
+
+if __name__ == '__main__':
+    main()
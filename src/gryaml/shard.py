@@ -0,0 +1,330 @@
+"""Sharded, parallel dumps & loads.
+
+A dump is partitioned, by label or by ranges of node ids, and each
+partition dumped by a worker process to its own YAML shard. A shard holds
+the nodes of its partition, each anchored by its id as ``n<id>``, and the
+relationships from them to nodes of the same partition. Relationships to
+nodes of other partitions go in a second file, alongside, with endpoints
+of ``!gryaml.ref n<id>``, since anchors cannot span files.
+
+A JSON manifest lists the shards and, for each, the anchors its
+cross-shard relationships reference, by shard. Loading a manifest loads
+the shards in parallel, keeping the ids of the anchors referenced, then the
+cross-shard relationships.
+
+Dumping requires Neo4j 3.1 or later, for ``properties()`` & ``db.labels()``.
+"""
+from __future__ import absolute_import, print_function
+
+import bisect
+import io
+import json
+import multiprocessing
+import os
+from collections import namedtuple
+
+try:
+    from typing import (  # noqa: F401
+        Any, Callable, Dict, Iterable, List, Optional, Set, Tuple
+    )
+except ImportError:
+    """Module :mod:`typing` not required for Py27-compatible type comments."""
+
+from . import cypher, loader
+from ._py2neo import connect
+from .backends import backend_for
+from .interchange import RecordEmitter
+from .model import NodeSpec, RelSpec
+
+DEFAULT_SHARDS = 4
+
+MANIFEST_NAME = 'manifest.json'
+SHARD_NAME = 'shard-{:03d}.yaml'
+CROSS_NAME = 'shard-{:03d}.cross.yaml'
+
+#: Part of the graph dumped to one shard: nodes whose least label is
+#: `value`, or which have none if it is ``None``, when `by` is ``'label'``;
+#: nodes with ids in the range ``[value[0], value[1])`` when ``'id'``.
+Partition = namedtuple('Partition', 'index by value')
+
+
+def plan(graph, by='label', shards=DEFAULT_SHARDS):
+    # type: (Any, str, int) -> List[Partition]
+    """Partition `graph` by label, or by id into about `shards` ranges."""
+    backend = backend_for(graph)
+    if by == 'label':
+        labels = sorted(row[0] for row in backend.run(u'CALL db.labels()'))
+        values = labels + [None]  # type: List[Any]
+    elif by == 'id':
+        low, high = backend.run(u'MATCH (n) RETURN min(id(n)), max(id(n))')[0]
+        if low is None:
+            values = []
+        else:
+            step = -(-(high + 1 - low) // shards)  # Rounded up
+            values = [[start, min(start + step, high + 1)]
+                      for start in range(low, high + 1, step)]
+    else:
+        raise ValueError('Cannot partition by %r' % by)
+    return [Partition(index, by, value) for index, value in enumerate(values)]
+
+
+class Partitioner(object):
+    """Find the partition of a node."""
+
+    def __init__(self, partitions):
+        # type: (List[Partition]) -> None
+        self.partitions = partitions
+        self.by_label = {p.value: p.index for p in partitions
+                         if p.by == 'label'}
+        self.starts = [p.value[0] for p in partitions if p.by == 'id']
+
+    def owner(self, node_id, labels):
+        # type: (int, List[str]) -> int
+        """Index of the partition of the node with `node_id` & `labels`."""
+        if self.by_label:
+            return self.by_label[min(labels) if labels else None]
+        return bisect.bisect_right(self.starts, node_id) - 1
+
+
+def node_condition(partition, backend):
+    # type: (Partition, Any) -> Tuple[str, Dict[str, Any]]
+    """Cypher condition on ``n`` for nodes of `partition`, & parameters."""
+    if partition.by == 'id':
+        return (u'id(n) >= {} AND id(n) < {}'.format(
+            backend.placeholder('low'), backend.placeholder('high')),
+            {'low': partition.value[0], 'high': partition.value[1]})
+    if partition.value is None:
+        return u'size(labels(n)) = 0', {}
+    return (u'n:{} AND all(l IN labels(n) WHERE l >= {})'.format(
+        cypher.quote_name(partition.value), backend.placeholder('label')),
+        {'label': partition.value})
+
+
+def query_shard(graph, partition):
+    # type: (Any, Partition) -> Tuple[List[Tuple], List[Tuple]]
+    """Query the nodes & outgoing relationships of `partition`.
+
+    Nodes are rows of ``(id, labels, properties)`` and relationships of
+    ``(head id, type, tail id, tail labels, properties)``.
+    """
+    backend = backend_for(graph)
+    condition, parameters = node_condition(partition, backend)
+    nodes = backend.run(u'MATCH (n) WHERE {} RETURN id(n), labels(n),'
+                        u' properties(n)'.format(condition), parameters)
+    rels = backend.run(u'MATCH (n)-[r]->(m) WHERE {} RETURN id(n), type(r),'
+                       u' id(m), labels(m), properties(r)'.format(condition),
+                       parameters)
+    return nodes, rels
+
+
+def write_shard(directory, partition, partitioner, nodes, rels):
+    # type: (str, Partition, Partitioner, Iterable[Tuple], Iterable[Tuple]) -> Dict[str, Any]  # noqa: E501
+    """Write the shard of `partition`, returning its manifest entry.
+
+    `nodes` & `rels` are rows as from :func:`query_shard`.
+    """
+    shard_name = SHARD_NAME.format(partition.index)
+    cross_name = CROSS_NAME.format(partition.index)
+    references = {}  # type: Dict[int, Set[str]]
+    counts = {'nodes': 0, 'rels': 0, 'cross_rels': 0}
+
+    with io.open(os.path.join(directory, shard_name), 'w',
+                 encoding='utf-8') as shard_file, \
+            io.open(os.path.join(directory, cross_name), 'w',
+                    encoding='utf-8') as cross_file:
+        shard, cross = RecordEmitter(shard_file), RecordEmitter(cross_file)
+        shard.open()
+        cross.open()
+
+        for node_id, labels, properties in nodes:
+            shard.node(NodeSpec(node_id, labels, properties))
+            counts['nodes'] += 1
+
+        for head, reltype, tail, tail_labels, properties in rels:
+            spec = RelSpec(None, head, reltype, tail, properties)
+            owner = partitioner.owner(tail, tail_labels)
+            if owner == partition.index:
+                shard.rel(spec)
+                counts['rels'] += 1
+            else:
+                cross.rel(spec, references=True)
+                counts['cross_rels'] += 1
+                references.setdefault(partition.index, set()).add(
+                    RecordEmitter.anchor(head))
+                references.setdefault(owner, set()).add(
+                    RecordEmitter.anchor(tail))
+
+        shard.close()
+        cross.close()
+
+    entry = {'path': shard_name, 'cross': cross_name,
+             'partition': partition.value,
+             'references': {str(owner): sorted(anchors)
+                            for owner, anchors in references.items()}}
+    entry.update(counts)
+    return entry
+
+
+def dump_shard(graph, directory, partition, partitions):
+    # type: (Any, str, Partition, List[Partition]) -> Dict[str, Any]
+    """Query & write the shard of `partition`; see :func:`write_shard`."""
+    nodes, rels = query_shard(graph, partition)
+    return write_shard(directory, partition, Partitioner(partitions),
+                       nodes, rels)
+
+
+def load_shard(graph, path, exports, chunk_size):
+    # type: (Any, str, List[str], int) -> Tuple[int, Dict[str, int]]
+    """Load a shard, returning the count written & ids of `exports`."""
+    with io.open(path, encoding='utf-8') as stream:
+        checkpoint = loader.load(stream, graph, chunk_size=chunk_size)
+    return checkpoint.written, {anchor: checkpoint.anchors[anchor]
+                                for anchor in exports}
+
+
+def load_cross(graph, path, ids, chunk_size):
+    # type: (Any, str, Dict[str, int], int) -> int
+    """Load cross-shard relationships, given the `ids` of their endpoints."""
+    with io.open(path, encoding='utf-8') as stream:
+        checkpoint = loader.load(stream, graph, chunk_size=chunk_size,
+                                 checkpoint=loader.Checkpoint(anchors=ids))
+    return checkpoint.written
+
+
+# Graph of a worker process
+_worker_graph = None
+
+
+def _connect_worker(uri, backend):
+    # type: (Optional[str], Optional[str]) -> None
+    global _worker_graph
+    _worker_graph = connect(uri, backend=backend)
+
+
+def _call_worker(task):
+    # type: (Tuple[Callable, tuple]) -> Any
+    func, args = task
+    return func(_worker_graph, *args)
+
+
+def run_tasks(func, tasks, graph=None, uri=None, backend=None, workers=None):
+    # type: (Callable, List[tuple], Any, Optional[str], Optional[str], Optional[int]) -> List[Any]  # noqa: E501
+    """Call ``func(graph, *args)`` for the args of each of `tasks`.
+
+    Given a `graph`, calls are made in turn in this process; otherwise in
+    a pool of `workers` processes (by default, one per CPU), each connected
+    to the database at `uri` with `backend`.
+    """
+    if graph is not None:
+        return [func(graph, *args) for args in tasks]
+    pool = multiprocessing.Pool(workers, _connect_worker, (uri, backend))
+    try:
+        return pool.map(_call_worker, [(func, args) for args in tasks],
+                        chunksize=1)
+    finally:
+        pool.close()
+        pool.join()
+
+
+def dump_sharded(directory, graph=None, uri=None, backend=None, by='label',
+                 shards=DEFAULT_SHARDS, workers=None):
+    # type: (str, Any, Optional[str], Optional[str], str, int, Optional[int]) -> Dict[str, Any]  # noqa: E501
+    """Dump the graph to shards in `directory`, returning the manifest.
+
+    The manifest is also written to ``manifest.json``. See :func:`plan` for
+    `by` & `shards` and :func:`run_tasks` for the rest.
+    """
+    if not os.path.isdir(directory):
+        os.makedirs(directory)
+    partitions = plan(graph if graph is not None
+                      else connect(uri, backend=backend), by, shards)
+    entries = run_tasks(dump_shard,
+                        [(directory, partition, partitions)
+                         for partition in partitions],
+                        graph, uri, backend, workers)
+
+    manifest = {'by': by, 'shards': entries}
+    with io.open(os.path.join(directory, MANIFEST_NAME), 'w',
+                 encoding='utf-8') as out:
+        out.write(u'{}\n'.format(json.dumps(manifest, indent=2,
+                                            sort_keys=True)))
+    return manifest
+
+
+def load_manifest(path, graph=None, uri=None, backend=None, workers=None,
+                  chunk_size=loader.DEFAULT_CHUNK_SIZE):
+    # type: (str, Any, Optional[str], Optional[str], Optional[int], int) -> int  # noqa: E501
+    """Load the shards of the manifest at `path`, returning the count written.
+
+    Shards are loaded in parallel, then their cross-shard relationships;
+    see :func:`run_tasks` for `graph`, `uri`, `backend` & `workers`.
+    """
+    directory = os.path.dirname(path)
+    with io.open(path, encoding='utf-8') as stream:
+        entries = json.load(stream)['shards']
+
+    exports = [set() for _ in entries]  # type: List[Set[str]]
+    for entry in entries:
+        for owner, anchors in entry['references'].items():
+            exports[int(owner)].update(anchors)
+
+    results = run_tasks(load_shard,
+                        [(os.path.join(directory, entry['path']),
+                          sorted(exports[index]), chunk_size)
+                         for index, entry in enumerate(entries)],
+                        graph, uri, backend, workers)
+    written = sum(count for count, _ in results)
+
+    tasks = []
+    for entry in entries:
+        if entry['cross_rels']:
+            ids = {}  # type: Dict[str, int]
+            for owner, anchors in entry['references'].items():
+                owner_ids = results[int(owner)][1]
+                ids.update((anchor, owner_ids[anchor]) for anchor in anchors)
+            tasks.append((os.path.join(directory, entry['cross']), ids,
+                          chunk_size))
+    written += sum(run_tasks(load_cross, tasks, graph, uri, backend, workers))
+    return written
+
+
+def main(args=None):
+    # type: (Optional[List[str]]) -> None
+    """Dump a Neo4j graph to YAML shards, in parallel."""
+    import argparse
+    from .backends import BACKENDS, Py2neoBackend
+
+    parser = argparse.ArgumentParser(description=main.__doc__)
+    parser.add_argument('--neo4j-uri', action='store',
+                        default=os.environ.get('NEO4J_URI', None),
+                        help='URI for Neo4j; environment variable'
+                             ' "NEO4J_URI" may also be used.')
+    parser.add_argument('--backend', action='store', choices=sorted(BACKENDS),
+                        default=Py2neoBackend.name,
+                        help='Read with this backend. (Default: %(default)s)')
+    parser.add_argument('--by', action='store', choices=('label', 'id'),
+                        default='label',
+                        help='Partition by least label or by id range.'
+                             ' (Default: %(default)s)')
+    parser.add_argument('--shards', action='store', type=int,
+                        default=DEFAULT_SHARDS,
+                        help='Number of id ranges. (Default: %(default)s)')
+    parser.add_argument('--workers', action='store', type=int,
+                        help='Worker processes. (Default: one per CPU)')
+    parser.add_argument('directory')
+    config = parser.parse_args(args)
+
+    if not config.neo4j_uri:
+        parser.error('--neo4j-uri or environment variable "NEO4J_URI"'
+                     ' is required')
+
+    manifest = dump_sharded(config.directory, uri=config.neo4j_uri,
+                            backend=config.backend, by=config.by,
+                            shards=config.shards, workers=config.workers)
+    for entry in manifest['shards']:
+        print('{path}: nodes: {nodes}, relationships: {rels},'
+              ' cross-shard relationships: {cross_rels}'.format(**entry))
+
+
+if __name__ == '__main__':
+    main()
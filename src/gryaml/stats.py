@@ -0,0 +1,285 @@
+"""Statistics of gryaml YAML files, for planning loads.
+
+The parse events of a file are counted as they stream past, constructing
+nothing and needing no database, so even very large files are inspected
+about as fast as libyaml parses them, in memory for the anchors of one
+document:
+
+* the numbers of documents, top-level items, nodes & relationships;
+* how often each label, relationship type & property key occurs;
+* for ``!gryaml.repeat`` templates, the above as they are expanded, and
+  the nodes anchored;
+* the numbers of anchors & aliases, and the greatest *anchor span*, the
+  number of top-level items from an anchor to its last alias, which
+  bounds ``--anchor-window``.
+"""
+from __future__ import absolute_import, print_function
+
+import json
+from collections import Counter
+
+from yaml.events import (
+    AliasEvent, DocumentStartEvent, MappingEndEvent, MappingStartEvent,
+    ScalarEvent, SequenceEndEvent, SequenceStartEvent, StreamEndEvent
+)
+
+try:
+    from typing import Any, Dict, IO, List, Optional, Union  # noqa: F401
+except ImportError:
+    """Module :mod:`typing` not required for Py27-compatible type comments."""
+
+from .loader import ENGINES, EventParser, event_parser
+from .pyyaml import edges_tag, node_tag, path_tag, rel_tag, repeat_tag
+
+# Roles of collections, by what their children are
+(ROOT, NODE, ARG_MAP, LABELS, PROPERTIES, REL, REL_PROPERTIES, EDGES,
+ EDGE_KEYS, ROWS, ROW, PATH, PATH_HOP, REPEAT, OTHER) = range(15)
+
+NULLS = frozenset([u'', u'~', u'null', u'Null', u'NULL'])
+
+
+class Stats(object):
+    """Counts of the entities, labels, keys & anchors of gryaml YAML."""
+
+    def __init__(self):
+        # type: () -> None
+        self.documents = 0
+        self.items = 0
+        self.nodes = 0
+        self.rels = 0
+        self.labels = Counter()  # type: Counter
+        self.rel_types = Counter()  # type: Counter
+        self.property_keys = Counter()  # type: Counter
+        self.anchors = 0
+        self.aliases = 0
+        self.max_anchor_span = 0
+
+    def collect(self, stream, parser_class=EventParser):
+        # type: (Union[str, IO], type) -> Stats
+        """Add the counts of `stream`, returning these stats."""
+        parser = parser_class(stream)
+        try:
+            self._collect(parser.get_event)
+        finally:
+            parser.dispose()
+        return self
+
+    def _collect(self, get_event):
+        # type: (Any) -> None
+        # Per open collection: [role, index of the next child, last key],
+        # for tables: [..., type, keys, number of rows], and for repeats:
+        # [..., count, whether anchored, counts before the template]
+        stack = []  # type: List[List[Any]]
+        defined = {}  # type: Dict[str, int]
+        item = 0
+        labels, rel_types = self.labels, self.rel_types
+        property_keys = self.property_keys
+
+        while True:
+            event = get_event()
+            kind = type(event)
+            if kind is SequenceEndEvent or kind is MappingEndEvent:
+                frame = stack.pop()
+                if frame[0] == EDGES and frame[3] is not None:
+                    rel_types[frame[3]] += frame[5]
+                elif frame[0] == REPEAT:
+                    self._expand(*frame[3:])
+                    labels, rel_types = self.labels, self.rel_types
+                    property_keys = self.property_keys
+                if stack:
+                    stack[-1][1] += 1
+                continue
+            if kind is DocumentStartEvent:
+                self.documents += 1
+                defined.clear()  # Anchors are scoped to their document
+                continue
+            if kind is StreamEndEvent:
+                return
+            if kind not in (ScalarEvent, SequenceStartEvent,
+                            MappingStartEvent, AliasEvent):
+                continue
+
+            if len(stack) == 1:
+                item = self.items
+                self.items += 1
+            if kind is AliasEvent:
+                self.aliases += 1
+                span = item - defined.get(event.anchor, item)
+                if span > self.max_anchor_span:
+                    self.max_anchor_span = span
+                if stack:
+                    stack[-1][1] += 1
+                continue
+            if event.anchor is not None:
+                self.anchors += 1
+                defined[event.anchor] = item
+
+            frame = stack[-1] if stack else None
+            role, index, key = frame[:3] if frame else (ROOT, 0, None)
+            if event.tag == node_tag:
+                self.nodes += 1
+                child = NODE
+            elif event.tag == rel_tag:
+                self.rels += 1
+                child = REL
+            elif event.tag == edges_tag:
+                child = EDGES
+            elif event.tag == path_tag:
+                child = PATH
+            elif event.tag == repeat_tag and kind is MappingStartEvent:
+                child = REPEAT
+            elif (role == REPEAT and index % 2 and key == u'rel' and
+                  kind is SequenceStartEvent):
+                self.rels += 1  # An untagged template
+                child = REL
+            elif role == NODE:
+                child = ARG_MAP
+            elif role == ARG_MAP and index % 2:
+                child = {u'labels': LABELS,
+                         u'properties': PROPERTIES}.get(key, OTHER)
+            elif role == REL:
+                child = REL_PROPERTIES if index == 3 else OTHER
+            elif role == PATH and index % 2:
+                self.rels += 1
+                child = PATH_HOP
+            elif role == PATH_HOP:
+                child = REL_PROPERTIES if index == 1 else OTHER
+            elif role == EDGES and index % 2:
+                child = {u'keys': EDGE_KEYS, u'rows': ROWS}.get(key, OTHER)
+            elif role == ROWS:
+                self.rels += 1
+                stack[-2][5] += 1
+                child = ROW
+            elif role == ROW and index >= 2:
+                column = index - 2
+                keys = stack[-3][4]
+                if column < len(keys) and (
+                        kind is not ScalarEvent or event.tag or
+                        not event.implicit[0] or event.value not in NULLS):
+                    property_keys[keys[column]] += 1
+                child = OTHER
+            elif role == REL_PROPERTIES and index % 2:
+                if key == u'properties' and kind is MappingStartEvent:
+                    child = PROPERTIES
+                else:
+                    property_keys[key] += 1
+                    child = OTHER
+            else:
+                child = OTHER
+
+            if kind is ScalarEvent:
+                if frame is not None:
+                    if role == LABELS:
+                        labels[event.value] += 1
+                    elif role == PROPERTIES and not index % 2:
+                        property_keys[event.value] += 1
+                    elif (role == REL and index == 1 or
+                          role == PATH and index % 2 or
+                          role == PATH_HOP and index == 0):
+                        rel_types[event.value] += 1
+                    elif role == EDGES and key == u'type' and index % 2:
+                        frame[3] = event.value
+                    elif role == EDGE_KEYS:
+                        stack[-2][4].append(event.value)
+                    elif role == REPEAT and index % 2 and key == u'count':
+                        frame[3] = (int(event.value) if event.value.isdigit()
+                                    else 1)
+                    elif role == REPEAT and index % 2 and key == u'anchor':
+                        frame[4] = True
+                    frame[2] = event.value
+                    frame[1] += 1
+            elif child == EDGES:
+                stack.append([child, 0, None, None, [], 0])
+            elif child == REPEAT:
+                stack.append([child, 0, None, 1, False,
+                              (self.nodes, self.rels, self.labels,
+                               self.rel_types, self.property_keys)])
+                # Count the template apart, to multiply by its count
+                labels = self.labels = Counter()
+                rel_types = self.rel_types = Counter()
+                property_keys = self.property_keys = Counter()
+            else:
+                stack.append([child, 0, None])
+
+    def _expand(self, count, anchored, before):
+        # type: (int, bool, Any) -> None
+        """Count the template of a repeat, counted apart, `count` times."""
+        nodes, rels, labels, rel_types, property_keys = before
+        self.nodes = nodes + (self.nodes - nodes) * count
+        self.rels = rels + (self.rels - rels) * count
+        for counter, template in ((labels, self.labels),
+                                  (rel_types, self.rel_types),
+                                  (property_keys, self.property_keys)):
+            for name, n in template.items():
+                counter[name] += n * count
+        self.labels, self.rel_types = labels, rel_types
+        self.property_keys = property_keys
+        if anchored:
+            self.anchors += count
+
+    def as_dict(self, top=None):
+        # type: (Optional[int]) -> Dict[str, Any]
+        """The stats as JSON-able values; see :meth:`report` for `top`."""
+        return {'documents': self.documents, 'items': self.items,
+                'nodes': self.nodes, 'rels': self.rels,
+                'anchors': self.anchors, 'aliases': self.aliases,
+                'max_anchor_span': self.max_anchor_span,
+                'labels': self.labels.most_common(top),
+                'rel_types': self.rel_types.most_common(top),
+                'property_keys': self.property_keys.most_common(top)}
+
+    def report(self, top=None):
+        # type: (Optional[int]) -> str
+        """The stats as text, with the `top` labels, types & keys."""
+        lines = ['documents: {0.documents}, items: {0.items}'.format(self),
+                 'nodes: {0.nodes}, relationships: {0.rels}'.format(self),
+                 'anchors: {0.anchors}, aliases: {0.aliases},'
+                 ' max anchor span: {0.max_anchor_span} items'.format(self)]
+        for title, counter in [('labels', self.labels),
+                               ('relationship types', self.rel_types),
+                               ('property keys', self.property_keys)]:
+            lines.append('{} ({} distinct):'.format(title, len(counter)))
+            lines.extend('  {}: {}'.format(name, count)
+                         for name, count in counter.most_common(top))
+        return '\n'.join(lines)
+
+
+def collect(stream, parser_class=EventParser):
+    # type: (Union[str, IO], type) -> Stats
+    """The :class:`Stats` of gryaml YAML `stream`."""
+    return Stats().collect(stream, parser_class)
+
+
+def main(args=None):
+    # type: (Optional[List[str]]) -> None
+    """Report statistics of gryaml YAML files, without loading them."""
+    import argparse
+
+    parser = argparse.ArgumentParser(description=main.__doc__)
+    parser.add_argument('--yaml-engine', action='store', choices=ENGINES,
+                        default='pyyaml',
+                        help='Parse YAML with this library.'
+                             ' (Default: %(default)s)')
+    parser.add_argument('--top', action='store', type=int, metavar='N',
+                        help='List only the N most frequent labels,'
+                             ' relationship types & property keys.')
+    parser.add_argument('--json', action='store_true',
+                        help='Print the statistics of each file as a line'
+                             ' of JSON.')
+    parser.add_argument('yaml_files', nargs='+')
+    config = parser.parse_args(args)
+
+    parser_class = event_parser(config.yaml_engine)
+    for path in config.yaml_files:
+        with open(path, 'rb') as stream:
+            stats = collect(stream, parser_class)
+        if config.json:
+            print(json.dumps(dict(stats.as_dict(config.top), path=path),
+                             sort_keys=True))
+        else:
+            print('{}:'.format(path))
+            print(stats.report(config.top))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,124 @@
+"""Dump the neighbourhood of some nodes, such as to make a test fixture.
+
+The nodes within `depth` relationships of the start nodes, either way, are
+found a hop at a time: the relationships of all the nodes reached by the
+last hop, the *frontier*, are read in one query per batch, and then the
+nodes they reach for the first time, in another. Nodes & relationships
+already dumped are kept in :class:`IdSet` bitmaps, so memory is bounded by
+the largest id and the frontier rather than by the neighbourhood.
+
+Each hop's nodes are written before its relationships, anchored by id as
+``n<id>``, so the YAML can be loaded as it is. Relationships between nodes
+of the last hop are included, so the dump holds every relationship between
+its nodes.
+
+This requires Neo4j 3.1 or later, for ``properties()``.
+"""
+from __future__ import absolute_import
+
+import io
+
+try:
+    from typing import Any, IO, Iterable, List, Optional  # noqa: F401
+except ImportError:
+    """Module :mod:`typing` not required for Py27-compatible type comments."""
+
+from .backends import backend_for
+from .interchange import RecordEmitter
+from .loader import DEFAULT_CHUNK_SIZE
+from .model import NodeSpec, RelSpec
+
+
+class IdSet(object):
+    """Set of non-negative integer ids, as a bitmap of one bit per id."""
+
+    def __init__(self, ids=()):
+        # type: (Iterable[int]) -> None
+        self.bits = bytearray()
+        self.count = 0
+        for id_ in ids:
+            self.add(id_)
+
+    def __contains__(self, id_):
+        # type: (int) -> bool
+        index = id_ >> 3
+        return (index < len(self.bits) and
+                bool(self.bits[index] & (1 << (id_ & 7))))
+
+    def __len__(self):
+        # type: () -> int
+        return self.count
+
+    def add(self, id_):
+        # type: (int) -> bool
+        """Add `id_`, returning whether it was not already in the set."""
+        index, bit = id_ >> 3, 1 << (id_ & 7)
+        if index >= len(self.bits):
+            # Grow geometrically, so adding ids in order is amortized O(1)
+            self.bits.extend(bytearray(max(index + 1 - len(self.bits),
+                                           len(self.bits))))
+        if self.bits[index] & bit:
+            return False
+        self.bits[index] |= bit
+        self.count += 1
+        return True
+
+
+def dump_subgraph(graph, start_nodes, depth, rel_types=None, stream=None,
+                  batch_size=DEFAULT_CHUNK_SIZE, edges=False):
+    # type: (Any, Iterable[int], int, Optional[List[str]], Optional[IO], int, bool) -> Optional[str]  # noqa: E501
+    """Dump the nodes within `depth` hops of `start_nodes` as gryaml YAML.
+
+    `start_nodes` are node ids, and hops follow relationships of
+    `rel_types`, if given, either way. Each hop reads the relationships of
+    up to `batch_size` frontier nodes per query. With `edges`, each hop's
+    relationships are written as ``!gryaml.edges`` tables, one per type.
+
+    As :func:`yaml.dump`, the YAML is written to `stream`, if given, or
+    else returned.
+    """
+    backend = backend_for(graph)
+    out = io.StringIO() if stream is None else stream
+    emitter = RecordEmitter(out, edges)
+    emitter.open()
+
+    def batches(ids):
+        return [ids[start:start + batch_size]
+                for start in range(0, len(ids), batch_size)]
+
+    def write_nodes(ids):
+        for batch in batches(ids):
+            for row in backend.read_nodes(batch):
+                emitter.node(NodeSpec(*row))
+
+    nodes, rels = IdSet(), IdSet()
+    frontier = [id_ for id_ in start_nodes if nodes.add(id_)]
+    write_nodes(frontier)
+
+    for hop in range(depth + 1):
+        if not frontier:
+            break
+        reached = []  # type: List[int]
+        found = []  # type: List[RelSpec]
+        for batch in batches(frontier):
+            for row in backend.expand(batch, rel_types):
+                rel = RelSpec(*row)
+                if rel.key in rels:
+                    continue
+                if hop < depth:
+                    reached.extend(id_ for id_ in (rel.head, rel.tail)
+                                   if nodes.add(id_))
+                elif rel.head not in nodes or rel.tail not in nodes:
+                    continue  # Beyond the last hop
+                rels.add(rel.key)
+                found.append(rel)
+
+        write_nodes(reached)
+        if edges:
+            found.sort(key=lambda rel: rel.type)
+        for rel in found:
+            emitter.rel(rel)
+        frontier = reached
+
+    emitter.close()
+    return out.getvalue() if stream is None else None
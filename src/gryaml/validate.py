@@ -0,0 +1,566 @@
+"""Validate gryaml YAML without a database, before loading it.
+
+Constructors only find a malformed entity when they reach it, by when
+everything before it has been written. This checks a whole stream first,
+from its parse events alone, so in memory bounded by its nesting and
+anchors rather than by its size:
+
+* ``!gryaml.node`` is a sequence of "arg maps" (see
+  :func:`~gryaml._py2neo.is_arg_map`): single-key maps of ``labels``, a
+  sequence of scalars, or of ``properties``, a map;
+* ``!gryaml.rel`` is a sequence of a head, a scalar type, a tail and,
+  optionally, properties, as :func:`~gryaml._py2neo.rel` takes them;
+* endpoints are nodes, aliases of nodes or ``!gryaml.ref`` references;
+* aliases are of anchors defined before them in the same document;
+* property values are scalars or sequences of scalars, as Neo4j requires,
+  or ``!gryaml.array`` maps of ``dtype``, ``data`` & optionally ``shape``;
+* ``!gryaml.repeat`` is a map of an integer ``count``, optionally a
+  ``start`` & an ``anchor``, and a ``node`` or ``rel`` template;
+* ``!gryaml.edges`` is a map of a ``type``, optionally ``keys``, and
+  ``rows`` of aliased or referenced endpoints & up to a value per key;
+* ``!gryaml.path`` is a sequence of endpoints alternating with types, or
+  ``[type, properties]`` pairs;
+* there are no other ``!gryaml.*`` tags.
+"""
+from __future__ import absolute_import
+
+from collections import namedtuple
+
+import yaml
+from yaml.constructor import ConstructorError
+from yaml.events import (
+    AliasEvent, MappingEndEvent, MappingStartEvent, ScalarEvent,
+    SequenceEndEvent, SequenceStartEvent, StreamEndEvent
+)
+from yaml.nodes import ScalarNode
+from yaml.resolver import Resolver
+
+try:
+    from typing import Dict, IO, List, Optional, Union  # noqa: F401
+except ImportError:
+    """Module :mod:`typing` not required for Py27-compatible type comments."""
+
+from .loader import INDEX_FIELD, REPEAT_KEYS, EventParser
+from .pyyaml import (
+    EDGES_KEYS, array_tag, edges_tag, node_tag, path_tag, ref_tag, rel_tag,
+    repeat_tag
+)
+
+#: Tags of gryaml entities, references & arrays.
+TAGS = (node_tag, rel_tag, ref_tag, array_tag, repeat_tag, edges_tag,
+        path_tag)
+
+#: Keys of ``!gryaml.array`` maps, and whether each is required.
+ARRAY_KEYS = {u'dtype': True, u'data': True, u'shape': False}
+
+NULL_TAG = u'tag:yaml.org,2002:null'
+
+#: What is known of a YAML node once its start is consumed: its `kind`,
+#: ``'scalar'``, ``'sequence'`` or ``'mapping'``, its explicit `tag`, its
+#: start `mark`, its scalar `value` and whether it is an `alias`, in which
+#: case the rest is of the anchored node but for `mark`.
+Info = namedtuple('Info', 'kind tag mark value alias')
+
+
+class StopValidation(Exception):
+    """Enough problems have been found."""
+
+
+class Validator(object):
+    """Check the gryaml structure of a stream, event by event.
+
+    Problems are collected as :class:`~yaml.constructor.ConstructorError`,
+    as constructors would raise, up to `max_problems`, if given. A stream
+    which cannot be parsed has just the one problem.
+    """
+
+    def __init__(self, parser_class=EventParser, max_problems=None):
+        # type: (type, Optional[int]) -> None
+        self.parser_class = parser_class
+        self.max_problems = max_problems
+        self.resolver = Resolver()
+        self.parser = None  # type: Optional[yaml.BaseLoader]
+        self.anchors = {}  # type: Dict[str, Info]
+        self.problems = []  # type: List[yaml.MarkedYAMLError]
+
+    def validate(self, stream):
+        # type: (Union[str, IO]) -> List[yaml.MarkedYAMLError]
+        """The problems of `stream`, or none if it is valid."""
+        self.parser = self.parser_class(stream)
+        self.problems = []
+        try:
+            self.stream()
+        except yaml.MarkedYAMLError as error:
+            self.problems.append(error)
+        except StopValidation:
+            pass
+        finally:
+            self.parser.dispose()
+            self.anchors = {}
+        return self.problems
+
+    def problem(self, context, problem, mark, context_mark=None):
+        # type: (Optional[str], str, yaml.Mark, Optional[yaml.Mark]) -> None
+        """Record a problem, stopping if there are enough."""
+        self.problems.append(ConstructorError(context, context_mark,
+                                              problem, mark))
+        if self.max_problems and len(self.problems) >= self.max_problems:
+            raise StopValidation()
+
+    def stream(self):
+        # type: () -> None
+        """Check each document of the stream."""
+        parser = self.parser
+        parser.get_event()  # StreamStartEvent
+        while not parser.check_event(StreamEndEvent):
+            parser.get_event()  # DocumentStartEvent
+            self.node()
+            parser.get_event()  # DocumentEndEvent
+            self.anchors = {}  # Anchors are scoped to their document
+        parser.get_event()
+
+    def start(self):
+        # type: () -> Optional[Info]
+        """Consume the event starting a node, describing the node.
+
+        Anchors are recorded; aliases of undefined anchors are problems,
+        described as ``None``.
+        """
+        event = self.parser.get_event()
+        if isinstance(event, AliasEvent):
+            info = self.anchors.get(event.anchor)
+            if info is None:
+                self.problem(None, 'found undefined alias %r' % event.anchor,
+                             event.start_mark)
+                return None
+            return info._replace(mark=event.start_mark, alias=True)
+
+        value = None
+        if isinstance(event, ScalarEvent):
+            kind, value = 'scalar', event.value
+        elif isinstance(event, SequenceStartEvent):
+            kind = 'sequence'
+        else:
+            kind = 'mapping'
+        tag = event.tag if event.tag != u'!' else None
+        info = Info(kind, tag, event.start_mark, value, False)
+        if event.anchor is not None:
+            # Marks may hold on to the parser's buffer
+            self.anchors[event.anchor] = info._replace(mark=None)
+        return info
+
+    def is_null(self, info):
+        # type: (Info) -> bool
+        """Whether `info` describes a null scalar."""
+        return (info.kind == 'scalar' and
+                (info.tag or self.resolver.resolve(
+                    ScalarNode, info.value, (True, False))) == NULL_TAG)
+
+    def node(self, endpoint=False):
+        # type: (bool) -> Optional[Info]
+        """Check a node & all within it, describing it.
+
+        ``!gryaml.ref`` is only allowed as an `endpoint`.
+        """
+        info = self.start()
+        if info is None or info.alias:
+            return info
+        if info.tag == node_tag:
+            self.gryaml_node(info)
+        elif info.tag == rel_tag:
+            self.gryaml_rel(info)
+        elif info.tag == repeat_tag:
+            self.gryaml_repeat(info)
+        elif info.tag == edges_tag:
+            self.gryaml_edges(info)
+        elif info.tag == path_tag:
+            self.gryaml_path(info)
+        else:
+            if info.tag == ref_tag and not endpoint:
+                self.problem(None, '%s is only for relationship endpoints'
+                             % ref_tag, info.mark)
+            elif (info.tag and info.tag.startswith(u'!gryaml.') and
+                  info.tag not in TAGS):
+                self.problem(None, 'found unknown tag %s' % info.tag,
+                             info.mark)
+            self.children(info)
+        return info
+
+    def children(self, info):
+        # type: (Info) -> None
+        """Check the nodes within a collection, up to its end."""
+        if info.kind == 'sequence':
+            while not self.parser.check_event(SequenceEndEvent):
+                self.node()
+            self.parser.get_event()
+        elif info.kind == 'mapping':
+            while not self.parser.check_event(MappingEndEvent):
+                self.node()
+                self.node()
+            self.parser.get_event()
+
+    def gryaml_node(self, info):
+        # type: (Info) -> None
+        """Check the rest of a ``!gryaml.node``."""
+        if info.kind != 'sequence':
+            self.problem(None, 'expected a sequence for %s' % node_tag,
+                         info.mark)
+            self.children(info)
+            return
+
+        while not self.parser.check_event(SequenceEndEvent):
+            if not self.parser.check_event(MappingStartEvent):
+                arg = self.node()
+                if arg is not None and arg.kind != 'mapping':
+                    self.problem('while constructing %s' % node_tag,
+                                 'expected a labels or properties map',
+                                 arg.mark, info.mark)
+                continue
+
+            arg = self.start()
+            keys = []  # type: List[Optional[str]]
+            while not self.parser.check_event(MappingEndEvent):
+                key = self.node()
+                keys.append(key.value if key is not None else None)
+                if keys[-1] == u'labels':
+                    self.labels()
+                elif keys[-1] == u'properties':
+                    self.properties()
+                else:
+                    self.node()
+            self.parser.get_event()
+            if len(keys) != 1 or keys[0] not in (u'labels', u'properties'):
+                self.problem('while constructing %s' % node_tag,
+                             'expected a map of just labels or properties,'
+                             ' found keys %s' % ', '.join(map(repr, keys)),
+                             arg.mark, info.mark)
+        self.parser.get_event()
+
+    def labels(self):
+        # type: () -> None
+        """Check the labels of a node: a sequence of scalars, or null."""
+        info = self.start()
+        if info is None or info.alias:
+            return
+        if info.kind != 'sequence':
+            if not self.is_null(info):
+                self.problem(None, 'expected a sequence of labels', info.mark)
+            self.children(info)
+            return
+        while not self.parser.check_event(SequenceEndEvent):
+            label = self.node()
+            if label is not None and label.kind != 'scalar':
+                self.problem(None, 'expected a scalar label', label.mark)
+        self.parser.get_event()
+
+    def properties(self):
+        # type: () -> None
+        """Check a properties map: values of scalars or sequences of them."""
+        info = self.start()
+        if info is None or info.alias:
+            return
+        if info.kind != 'mapping':
+            if not self.is_null(info):
+                self.problem(None, 'expected a map of properties', info.mark)
+            self.children(info)
+            return
+        while not self.parser.check_event(MappingEndEvent):
+            self.node()
+            self.property_value()
+        self.parser.get_event()
+
+    def property_value(self):
+        # type: () -> None
+        """Check a property value: a scalar or a sequence of scalars."""
+        info = self.start()
+        if info is None or info.alias:
+            return
+        if info.tag == array_tag:
+            self.gryaml_array(info)
+        elif info.kind == 'sequence':
+            while not self.parser.check_event(SequenceEndEvent):
+                item = self.node()
+                if item is not None and item.kind != 'scalar':
+                    self.problem(None, 'expected a scalar in a property'
+                                 ' value', item.mark)
+            self.parser.get_event()
+        elif info.kind == 'mapping':
+            self.problem(None, 'expected a scalar or sequence of scalars'
+                         ' for a property value', info.mark)
+            self.children(info)
+
+    def gryaml_array(self, info):
+        # type: (Info) -> None
+        """Check the rest of a ``!gryaml.array``, a map of its fields."""
+        if info.kind != 'mapping':
+            self.problem(None, 'expected a map for %s' % array_tag,
+                         info.mark)
+            self.children(info)
+            return
+        keys = []  # type: List[Optional[str]]
+        while not self.parser.check_event(MappingEndEvent):
+            key = self.node()
+            keys.append(key.value if key is not None else None)
+            value = self.node()
+            kind = 'sequence' if keys[-1] == u'shape' else 'scalar'
+            if (value is not None and keys[-1] in ARRAY_KEYS and
+                    value.kind != kind):
+                self.problem('while constructing %s' % array_tag,
+                             'expected a %s for %s' % (kind, keys[-1]),
+                             value.mark, info.mark)
+        self.parser.get_event()
+        unknown = [key for key in keys if key not in ARRAY_KEYS]
+        missing = [key for key, required in sorted(ARRAY_KEYS.items())
+                   if required and key not in keys]
+        if unknown or missing:
+            self.problem('while constructing %s' % array_tag,
+                         'expected a map of dtype, data & shape, found'
+                         ' keys %s' % ', '.join(map(repr, keys)),
+                         info.mark, info.mark)
+
+    def gryaml_rel(self, info):
+        # type: (Info) -> None
+        """Check the rest of a ``!gryaml.rel``."""
+        if info.kind != 'sequence':
+            self.children(info)
+            count = 0
+        else:
+            count = 0
+            while not self.parser.check_event(SequenceEndEvent):
+                if count in (0, 2):
+                    self.endpoint(info)
+                elif count == 1:
+                    reltype = self.node()
+                    if reltype is not None and (reltype.kind != 'scalar' or
+                                                not reltype.value):
+                        self.problem('while constructing %s' % rel_tag,
+                                     'expected a relationship type',
+                                     reltype.mark, info.mark)
+                elif count == 3:
+                    self.rel_properties()
+                else:
+                    self.node()
+                count += 1
+            self.parser.get_event()
+        if count not in (3, 4):
+            self.problem(None, 'expected a sequence of 3 or 4 items for %s'
+                         % rel_tag, info.mark)
+
+    def gryaml_repeat(self, info):
+        # type: (Info) -> None
+        """Check the rest of a ``!gryaml.repeat``, a map of a template."""
+        if info.kind != 'mapping':
+            self.problem(None, 'expected a map for %s' % repeat_tag,
+                         info.mark)
+            self.children(info)
+            return
+        keys = []  # type: List[Optional[str]]
+        scalars = {}  # type: Dict[Optional[str], Info]
+        while not self.parser.check_event(MappingEndEvent):
+            key = self.node()
+            keys.append(key.value if key is not None else None)
+            if keys[-1] == u'rel':
+                # The template of a relationship may be left untagged
+                value = self.start()
+                if value is not None and not value.alias and (
+                        value.tag in (None, rel_tag)):
+                    self.gryaml_rel(value)
+                    continue
+                if value is not None and not value.alias:
+                    self.children(value)
+            else:
+                value = self.node()
+            if value is None:
+                continue
+            tag = {u'node': node_tag, u'rel': rel_tag}.get(keys[-1])
+            if tag is not None and value.tag != tag:
+                self.problem('while constructing %s' % repeat_tag,
+                             'expected a template tagged %s' % tag,
+                             value.mark, info.mark)
+            elif (keys[-1] in (u'count', u'start', u'anchor') and
+                  value.kind != 'scalar'):
+                self.problem('while constructing %s' % repeat_tag,
+                             'expected a scalar for %s' % keys[-1],
+                             value.mark, info.mark)
+            elif value.kind == 'scalar':
+                scalars[keys[-1]] = value
+        self.parser.get_event()
+        anchor, count = scalars.get(u'anchor'), scalars.get(u'count')
+        if (anchor is not None and count is not None and
+                count.value.isdigit() and int(count.value) > 1 and
+                not INDEX_FIELD.search(anchor.value)):
+            self.problem('while constructing %s' % repeat_tag,
+                         'expected an index field in the anchor of more'
+                         ' than one node', anchor.mark, info.mark)
+        unknown = [key for key in keys if key not in REPEAT_KEYS]
+        if (unknown or u'count' not in keys or
+                (u'node' in keys) == (u'rel' in keys)):
+            self.problem('while constructing %s' % repeat_tag,
+                         'expected a map of count, start, anchor & a node'
+                         ' or rel, found keys %s'
+                         % ', '.join(map(repr, keys)), info.mark, info.mark)
+
+    def gryaml_edges(self, info):
+        # type: (Info) -> None
+        """Check the rest of a ``!gryaml.edges``, a map of a table.
+
+        Rows are checked against the number of keys given before them.
+        """
+        if info.kind != 'mapping':
+            self.problem(None, 'expected a map for %s' % edges_tag,
+                         info.mark)
+            self.children(info)
+            return
+        keys = []  # type: List[Optional[str]]
+        columns = None  # type: Optional[int]
+        while not self.parser.check_event(MappingEndEvent):
+            key = self.node()
+            keys.append(key.value if key is not None else None)
+            value = self.start()
+            if value is None or value.alias:
+                continue
+            if keys[-1] == u'rows' and value.kind == 'sequence':
+                while not self.parser.check_event(SequenceEndEvent):
+                    self.edges_row(info, columns)
+                self.parser.get_event()
+                continue
+            if keys[-1] == u'keys' and value.kind == 'sequence':
+                columns = 0
+                while not self.parser.check_event(SequenceEndEvent):
+                    self.node()
+                    columns += 1
+                self.parser.get_event()
+                continue
+            expected = {u'type': 'scalar', u'keys': 'sequence',
+                        u'rows': 'sequence'}.get(keys[-1])
+            if expected is not None and (value.kind != expected and
+                                         not self.is_null(value)):
+                self.problem('while constructing %s' % edges_tag,
+                             'expected a %s for %s' % (expected, keys[-1]),
+                             value.mark, info.mark)
+            self.children(value)
+        self.parser.get_event()
+        unknown = [key for key in keys if key not in EDGES_KEYS]
+        missing = [key for key, required in sorted(EDGES_KEYS.items())
+                   if required and key not in keys]
+        if unknown or missing:
+            self.problem('while constructing %s' % edges_tag,
+                         'expected a map of type, keys & rows, found keys'
+                         ' %s' % ', '.join(map(repr, keys)),
+                         info.mark, info.mark)
+
+    def edges_row(self, edges_info, columns):
+        # type: (Info, Optional[int]) -> None
+        """Check a row of a table, of at most `columns` values if known."""
+        info = self.start()
+        if info is None or info.alias:
+            return
+        if info.kind != 'sequence':
+            self.problem('while constructing %s' % edges_tag,
+                         'expected a sequence for a row', info.mark,
+                         edges_info.mark)
+            self.children(info)
+            return
+        count = 0
+        while not self.parser.check_event(SequenceEndEvent):
+            if count < 2:
+                self.endpoint(edges_info, anchored=True)
+            else:
+                self.property_value()
+            count += 1
+        self.parser.get_event()
+        if count < 2 or columns is not None and count > 2 + columns:
+            self.problem('while constructing %s' % edges_tag,
+                         'expected a row of a head, a tail & up to %s'
+                         ' values' % ('a value per key' if columns is None
+                                      else columns),
+                         info.mark, edges_info.mark)
+
+    def gryaml_path(self, info):
+        # type: (Info) -> None
+        """Check the rest of a ``!gryaml.path``."""
+        count = 0
+        if info.kind == 'sequence':
+            while not self.parser.check_event(SequenceEndEvent):
+                if count % 2:
+                    self.path_hop(info)
+                else:
+                    self.endpoint(info)
+                count += 1
+            self.parser.get_event()
+        else:
+            self.children(info)
+        if count < 3 or not count % 2:
+            self.problem(None, 'expected a sequence of nodes alternating'
+                         ' with relationship types for %s' % path_tag,
+                         info.mark)
+
+    def path_hop(self, path_info):
+        # type: (Info) -> None
+        """Check a hop of a path: a type, or a type & properties pair."""
+        info = self.start()
+        if info is None:
+            return
+        reltype, count = info, 2
+        if info.kind == 'sequence' and not info.alias:
+            count = 0
+            while not self.parser.check_event(SequenceEndEvent):
+                if count:
+                    self.rel_properties()
+                else:
+                    reltype = self.node()
+                count += 1
+            self.parser.get_event()
+        elif not info.alias:
+            self.children(info)
+        if count != 2 or reltype is not None and (reltype.kind != 'scalar' or
+                                                  not reltype.value):
+            self.problem('while constructing %s' % path_tag,
+                         'expected a relationship type or a [type,'
+                         ' properties] pair', info.mark, path_info.mark)
+
+    def endpoint(self, rel_info, anchored=False):
+        # type: (Info, bool) -> None
+        """Check a relationship endpoint, with `anchored` if it must be."""
+        anchored = anchored and self.parser.peek_event().anchor is None
+        info = self.node(endpoint=True)
+        if info is None:
+            return
+        if info.tag == ref_tag:
+            if info.kind != 'scalar' or not info.value:
+                self.problem(None, 'expected an anchor for %s' % ref_tag,
+                             info.mark)
+        elif info.tag != node_tag:
+            self.problem('while constructing %s' % (rel_info.tag or rel_tag),
+                         'expected an endpoint tagged %s or %s'
+                         % (node_tag, ref_tag), info.mark, rel_info.mark)
+        elif anchored:
+            self.problem('while constructing %s' % rel_info.tag,
+                         'expected an anchored endpoint or %s' % ref_tag,
+                         info.mark, rel_info.mark)
+
+    def rel_properties(self):
+        # type: () -> None
+        """Check relationship properties, a map or a properties arg map."""
+        info = self.start()
+        if info is None or info.alias:
+            return
+        if info.kind != 'mapping':
+            if not self.is_null(info):
+                self.problem(None, 'expected a map of properties', info.mark)
+            self.children(info)
+            return
+        while not self.parser.check_event(MappingEndEvent):
+            key = self.node()
+            if (key is not None and key.value == u'properties' and
+                    self.parser.check_event(MappingStartEvent)):
+                self.properties()
+            else:
+                self.property_value()
+        self.parser.get_event()
+
+
+def validate(stream, parser_class=EventParser, max_problems=None):
+    # type: (Union[str, IO], type, Optional[int]) -> List[yaml.MarkedYAMLError]  # noqa: E501
+    """The problems of gryaml YAML `stream`; see :class:`Validator`."""
+    return Validator(parser_class, max_problems).validate(stream)
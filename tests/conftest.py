@@ -20,6 +20,8 @@ import yaml
 
 from py2neo_compat import py2neo_ver
 
+from gryaml.pytest_plugin import connect_worker, skip_py2neo1
+
 pytest.mark.skip_py2neo1 = pytest.mark.skipif(py2neo_ver == 1,
                                               reason='py2neo v1 not supported')
 
@@ -43,12 +45,15 @@ def pytest_report_header(config, startdir):
 
 
 @pytest.fixture
-def graphdb():
-    # type: () -> py2neo.Graph
-    """Fixture connecting to graphdb."""
+def graphdb(pytestconfig):
+    # type: (Any) -> py2neo.Graph
+    """Fixture connecting to graphdb, that of the worker under xdist."""
     if 'NEO4J_URI' not in os.environ:
         os.environ['NEO4J_URI'] = 'http://localhost:7474/db/data'
-    graphdb = gryaml.connect(uri=os.environ['NEO4J_URI'])
+    graphdb = connect_worker(
+        os.environ['NEO4J_URI'],
+        skip_unreachable=pytestconfig.getoption('gryaml_skip_unreachable',
+                                                False))
     graphdb.delete_all()
     return graphdb
 
@@ -57,8 +62,7 @@ def graphdb():
 def graphdb_offline():
     # type: () -> None
     """Ensure the database is not connected."""
-    if py2neo_ver < 2:
-        pytest.skip('Offline not supported in py2neo < 2')
+    skip_py2neo1('Offline not supported in py2neo < 2')
     neo4j_uri_env = os.environ.get('NEO4J_URI', None)
     if neo4j_uri_env:
         del os.environ['NEO4J_URI']
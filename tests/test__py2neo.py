@@ -12,3 +12,13 @@ import pytest  # noqa
 def test_connect(graphdb):
     """Test :func:`~py2neo_compat.connect`."""
     assert graphdb.neo4j_version
+
+
+@pytest.mark.unit
+def test_resolve_node_args():
+    """The first non-empty labels & properties win."""
+    from gryaml._py2neo import resolve_node_args
+    assert (['A'], {'a': 1}) == resolve_node_args(
+        {'labels': []}, {'properties': {}}, {'labels': ['A']},
+        {'properties': {'a': 1}}, {'labels': ['B']})
+    assert ([], {}) == resolve_node_args({'labels': []})
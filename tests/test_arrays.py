@@ -0,0 +1,157 @@
+"""Tests for :mod:`gryaml.arrays` & the ``!gryaml.array`` tag."""
+from __future__ import print_function, absolute_import
+
+import array
+from textwrap import dedent
+
+import pytest
+import yaml
+
+from gryaml import arrays, backends, loader, validate
+from gryaml.pyyaml import (
+    add_array_representers, array_constructor, array_tag
+)
+
+try:
+    from typing import Any  # noqa: F401
+except ImportError:
+    """Module :mod:`typing` not required for Py27-compatible type comments."""
+
+
+class Dumper(yaml.SafeDumper):
+    """Dumper representing arrays."""
+
+
+class Loader(yaml.SafeLoader):
+    """Loader constructing arrays."""
+
+
+add_array_representers(Dumper)
+Loader.add_constructor(array_tag, array_constructor)
+
+
+@pytest.mark.unit
+@pytest.mark.parametrize('typecode,dtype', [('b', 'i1'), ('B', 'u1'),
+                                            ('h', 'i2'), ('i', 'i4'),
+                                            ('q', 'i8'), ('f', 'f4'),
+                                            ('d', 'f8')])
+def test_encode(typecode, dtype):
+    # type: (str, str) -> None
+    """Arrays are encoded little-endian, with their dtype & shape."""
+    value = array.array(typecode, [1, 2, 3])
+    encoded = arrays.encode(value)
+    assert {'dtype': dtype, 'shape': [3]} == {
+        key: encoded[key] for key in ('dtype', 'shape')}
+
+    decoded = arrays.decode(**encoded)
+    assert [1, 2, 3] == arrays.to_list(decoded)
+
+
+@pytest.mark.unit
+def test_encode_little_endian():
+    # type: () -> None
+    """The buffer is little-endian whatever the platform."""
+    assert {'dtype': 'u2', 'shape': [2], 'data': 'AQACAA=='} == \
+        arrays.encode(array.array('H', [1, 2]))
+
+
+@pytest.mark.unit
+def test_decode_bad_size():
+    # type: () -> None
+    """Data must fit the dtype & shape."""
+    with pytest.raises(ValueError):
+        arrays.decode('u2', 'AQACAA==', [3])
+    with pytest.raises(ValueError):
+        arrays.decode('x8', 'AQACAA==')
+
+
+@pytest.mark.unit
+def test_decode_half(monkeypatch):
+    # type: (Any) -> None
+    """``f2`` arrays decode without NumPy, widened to ``f4``."""
+    monkeypatch.setattr(arrays, 'numpy_module', lambda: None)
+    decoded = arrays.decode('f2', 'ADwAQABC', [3])
+    assert 'f' == decoded.typecode
+    assert [1.0, 2.0, 3.0] == arrays.to_list(decoded)
+
+
+@pytest.mark.unit
+def test_yaml_round_trip():
+    # type: () -> None
+    """Arrays are dumped as tagged maps and loaded as arrays."""
+    text = yaml.dump({'embedding': array.array('f', [1.0, 2.0, 3.0])},
+                     Dumper=Dumper)
+    assert ('embedding: !gryaml.array {data: AACAPwAAAEAAAEBA, dtype: f4,'
+            ' shape: [3]}\n') == text
+
+    loaded = yaml.load(text, Loader=Loader)['embedding']
+    assert [1.0, 2.0, 3.0] == arrays.to_list(loaded)
+
+    with pytest.raises(yaml.constructor.ConstructorError):
+        yaml.load(u'!gryaml.array {dtype: f4}', Loader=Loader)
+
+
+@pytest.mark.unit
+def test_numpy_round_trip():
+    # type: () -> None
+    """NumPy arrays keep their shape and view the decoded buffer."""
+    numpy = pytest.importorskip('numpy')
+    value = numpy.arange(6, dtype='>i4').reshape(2, 3)
+
+    loaded = yaml.load(yaml.dump(value, Dumper=Dumper), Loader=Loader)
+
+    assert numpy.dtype('<i4') == loaded.dtype
+    assert (2, 3) == loaded.shape
+    assert (value == loaded).all()
+    assert not loaded.flags.owndata
+
+
+@pytest.mark.unit
+def test_numpy_half_round_trip():
+    # type: () -> None
+    """NumPy ``f2`` arrays, which :mod:`array` has no typecode for, load."""
+    numpy = pytest.importorskip('numpy')
+    value = numpy.array([1.0, 2.0, 3.0], dtype='f2')
+
+    loaded = yaml.load(yaml.dump(value, Dumper=Dumper), Loader=Loader)
+
+    assert numpy.dtype('<f2') == loaded.dtype
+    assert (value == loaded).all()
+
+
+@pytest.mark.unit
+def test_load_arrays():
+    # type: () -> None
+    """Chunked loads construct arrays, written as lists to databases."""
+    graph = backends.MemoryBackend()
+    text = dedent("""\
+        - !gryaml.node
+          - labels: [Word]
+          - properties:
+              name: graph
+              embedding: !gryaml.array {dtype: i2, data: AQACAA==}
+    """)
+    assert [] == validate.validate(text)
+
+    loader.load(text, graph)
+
+    properties, = [n.properties for n in graph.nodes.values()]
+    assert [1, 2] == arrays.to_list(properties['embedding'])
+    assert {'name': 'graph', 'embedding': [1, 2]} == arrays.plain(properties)
+
+
+@pytest.mark.unit
+def test_validate_arrays():
+    # type: () -> None
+    """Arrays are maps of dtype, data & optionally shape."""
+    assert ["3: expected a sequence for shape",
+            "3: expected a map of dtype, data & shape, found keys 'dtype',"
+            " 'shape'",
+            "4: expected a map for !gryaml.array"] == [
+                '%d: %s' % (error.problem_mark.line + 1, error.problem)
+                for error in validate.validate(dedent("""\
+                    - !gryaml.node
+                      - properties:
+                          a: !gryaml.array {dtype: f4, shape: 3}
+                          b: !gryaml.array [1, 2]
+                """))]
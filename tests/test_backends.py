@@ -0,0 +1,298 @@
+"""Tests for :mod:`gryaml.backends`."""
+from __future__ import print_function, absolute_import
+
+import itertools
+
+import pytest
+
+import gryaml
+from gryaml import backends, cypher, loader
+from gryaml.model import Changes, NodeSpec, RelSpec
+
+try:
+    from typing import Any, Callable  # noqa: F401
+except ImportError:
+    """Module :mod:`typing` not required for Py27-compatible type comments."""
+
+
+class StubRecord(object):
+    """Record of a stub ``neo4j-driver`` result."""
+
+    def __init__(self, values):
+        self._values = values
+
+    def values(self):
+        return list(self._values)
+
+
+class StubTransaction(object):
+    """Stand-in for a ``neo4j-driver`` explicit transaction.
+
+    Each row of a returning statement's ``rows`` parameter gets a new id,
+    but for rows with an endpoint among the driver's ``missing`` ids, which
+    match no node. Results are lazy, like the driver's, so the log shows
+    when each was fetched.
+    """
+
+    def __init__(self, driver):
+        self.driver = driver
+
+    def run(self, statement, parameters):
+        self.driver.log.append(('run', statement))
+        rows = parameters['rows']
+
+        def fetch():
+            self.driver.log.append(('fetch', statement))
+            for row in rows if u' RETURN ' in statement else []:
+                if {row.get('head'), row.get('tail')} & self.driver.missing:
+                    continue
+                yield StubRecord((row['ref'], next(self.driver.ids)))
+        return fetch()
+
+    def commit(self):
+        self.driver.log.append(('commit', None))
+
+    def rollback(self):
+        self.driver.log.append(('rollback', None))
+
+
+class StubDriver(object):
+    """Stand-in for a ``neo4j-driver`` driver, logging what is sent."""
+
+    def __init__(self):
+        self.ids = itertools.count(100)
+        self.log = []
+        self.missing = set()
+
+    def session(self):
+        return self
+
+    def begin_transaction(self):
+        return StubTransaction(self)
+
+
+@pytest.mark.unit
+def test_get_backend():
+    # type: () -> None
+    """Backends are looked up by name."""
+    assert backends.BoltBackend is backends.get_backend('bolt')
+    with pytest.raises(ValueError):
+        backends.get_backend('carrier-pigeon')
+
+
+@pytest.mark.unit
+def test_memory_node_rel(monkeypatch):
+    # type: (object) -> None
+    """:func:`gryaml.node` & :func:`gryaml.rel` write through the backend."""
+    monkeypatch.setattr(gryaml._py2neo, 'graphdb', None)
+    graph = gryaml.connect(backend='memory')
+
+    keanu = gryaml.node({'labels': ['Person']},
+                        {'properties': {'name': 'Keanu Reeves'}})
+    matrix = gryaml.node({'labels': ['Movie']})
+    acted_in = gryaml.rel(keanu, 'ACTED_IN', matrix, {'roles': ['Neo']})
+
+    assert {'name': 'Keanu Reeves'} == graph.nodes[keanu.id].properties
+    assert (keanu.id, 'ACTED_IN', matrix.id, {'roles': ['Neo']}) \
+        == graph.rels[acted_in.id][1:]
+
+
+@pytest.mark.unit
+def test_memory_load(sample_yaml):
+    # type: (Callable[[str], str]) -> None
+    """The chunked loader writes each chunk through the backend."""
+    graph = backends.MemoryBackend()
+    loader.load(sample_yaml('nodes-and-relationships'), graph, chunk_size=5)
+
+    assert 9 == len(graph.nodes)
+    assert 12 == len(graph.rels)
+    assert 5 == graph.transactions
+    lana = [n.id for n in graph.nodes.values()
+            if n.properties.get('name') == 'Lana Wachowski']
+    assert 4 == len([r for r in graph.rels.values() if r.head in lana])
+
+
+@pytest.mark.unit
+def test_memory_rollback():
+    # type: () -> None
+    """A failed chunk leaves nothing behind."""
+    graph = backends.MemoryBackend()
+    with pytest.raises(KeyError):
+        graph.write_chunk([NodeSpec('a', [], {})],
+                          [RelSpec('r', 'a', 'KNOWS', 'missing', {})], {})
+    assert not graph.nodes
+    assert not graph.rels
+
+
+@pytest.mark.unit
+def test_bolt_pipelined_write():
+    # type: () -> None
+    """Statements are sent before any results are fetched."""
+    driver = StubDriver()
+    graph = backends.BoltBackend(driver=driver)
+    ids = graph.write_chunk(
+        [NodeSpec('a', ['Person'], {}), NodeSpec('b', ['Movie'], {})],
+        [RelSpec('r', 'a', 'ACTED_IN', 'b', {}),
+         RelSpec('s', 'a', 'DIRECTED', 'c', {})],
+        {'c': 1})
+
+    assert {'a': 100, 'b': 101, 'r': 102, 's': 103} == ids
+    assert ['run', 'run', 'fetch', 'fetch', 'run', 'run', 'fetch', 'fetch',
+            'commit'] == [event for event, _ in driver.log]
+    assert all(u'$rows' in statement
+               for event, statement in driver.log if event == 'run')
+
+
+@pytest.mark.unit
+def test_missing_endpoint():
+    # type: () -> None
+    """Relationships to ids of no node fail their chunk, not silently."""
+    driver = StubDriver()
+    driver.missing.add(2)
+    graph = backends.BoltBackend(driver=driver)
+    with pytest.raises(backends.MissingEndpointError):
+        graph.write_chunk([], [RelSpec(None, 'a', 'KNOWS', 'b', {}),
+                               RelSpec(None, 'b', 'KNOWS', 'a', {})],
+                          {'a': 1, 'b': 2})
+    assert ('rollback', None) == driver.log[-1]
+
+    memory = backends.MemoryBackend()
+    node = memory.create_node([], {})
+    with pytest.raises(backends.MissingEndpointError):
+        memory.write_chunk([], [RelSpec(None, 'a', 'KNOWS', 'b', {})],
+                           {'a': node.id, 'b': node.id + 1})
+    assert not memory.rels
+
+
+@pytest.mark.unit
+def test_write_changes():
+    # type: () -> None
+    """Changes are written in one transaction, a statement per kind."""
+    driver = StubDriver()
+    graph = backends.BoltBackend(driver=driver)
+    graph.write_changes(Changes([(1, {'born': 1965})], {'Film': [2]},
+                                {'Movie': [2]}, [], [3, 4], [5]))
+
+    statements = [statement for event, statement in driver.log
+                  if event == 'run']
+    assert [u'DELETE r', u'DETACH DELETE n', u'SET n = row.properties',
+            u'SET n:`Film`', u'REMOVE n:`Movie`'] \
+        == [statement.split(' WHERE ')[1].split(' ', 3)[-1]
+            for statement in statements]
+    assert ('commit', None) == driver.log[-1]
+
+
+@pytest.mark.unit
+def test_delete_load_batches(monkeypatch):
+    # type: (object) -> None
+    """Loads are deleted in batches until one falls short."""
+    graph = backends.BoltBackend(driver=StubDriver())
+    counts = iter([2, 2, 1, 0])
+    statements = []
+
+    def run(statement, parameters=None):
+        statements.append((statement, parameters['limit']))
+        return [(next(counts),)]
+
+    monkeypatch.setattr(graph, 'run', run)
+    assert 5 == graph.delete_load('fixture', 2, rels=True)
+    assert [(True, 2)] * 3 + [(False, 2)] == [
+        (u'DETACH DELETE n' in statement, limit)
+        for statement, limit in statements]
+
+
+@pytest.mark.unit
+@pytest.mark.parametrize('version, named', [
+    ((3, 5, 14), False),
+    ((4, 0), False),
+    ((4, 1, 0), True),
+    ((5, 12, 0), True),
+])
+def test_load_index_syntax(version, named):
+    # type: (tuple, bool) -> None
+    """Indexes are created by name from Neo4j 4.1, as Neo4j 5 requires."""
+    statement = cypher.create_load_index_statement(version)
+    assert statement.startswith(u'CREATE INDEX `gryaml_load` IF NOT EXISTS'
+                                if named else u'CREATE INDEX ON ')
+
+
+@pytest.mark.unit
+@pytest.mark.parametrize('components, statement', [
+    (u'3.5.14', u'CREATE INDEX ON :`_GryamlLoad`(`_gryaml_load`)'),
+    (u'5.12.0', u'CREATE INDEX `gryaml_load` IF NOT EXISTS'
+                u' FOR (n:`_GryamlLoad`) ON (n.`_gryaml_load`)'),
+])
+def test_bolt_version(monkeypatch, components, statement):
+    # type: (object, str, str) -> None
+    """The server's version is read once, when checked, and followed."""
+    graph = backends.BoltBackend(driver=StubDriver())
+    statements = []
+
+    def run(statement, parameters=None):
+        statements.append(statement)
+        return [(components,)] if u'dbms.components' in statement else []
+
+    monkeypatch.setattr(graph, 'run', run)
+    graph.check()
+    graph.create_load_index()
+    assert 2 == len(statements)
+    assert statement == statements[-1]
+
+
+@pytest.mark.unit
+def test_py2neo_version():
+    # type: () -> None
+    """py2neo's version tuple is read, ignoring its release suffix."""
+    class Graph(object):
+        neo4j_version = (2, 3, 0, u'')
+
+    graph = backends.Py2neoBackend(Graph())
+    graph.check()
+    assert (2, 3, 0) == graph.version()
+    assert (5, 12) == backends.version_tuple(u'5.12-aura')
+
+
+@pytest.mark.unit
+def test_cli_closes_backend(monkeypatch, tmpdir):
+    # type: (Any, Any) -> None
+    """``gryaml-load`` closes its backend, even when loading fails."""
+    from gryaml.__main__ import __main__ as gryaml_load
+    closed = []
+    monkeypatch.setattr(backends.MemoryBackend, 'close',
+                        lambda self: closed.append(self))
+    bad = tmpdir.join('bad.jsonl')
+    bad.write('{"rel": 1, "head": 2, "type": "KNOWS", "tail": 3}\n')
+    monkeypatch.setattr('sys.argv', ['gryaml-load', '--backend', 'memory',
+                                     '--no-validate', str(bad)])
+
+    with pytest.raises(KeyError):  # Neither endpoint was loaded
+        gryaml_load()
+    assert 1 == len(closed)
+
+
+@pytest.mark.unit
+def test_commit_not_retried(monkeypatch):
+    # type: (Any) -> None
+    """Chunks are retried on failures before their commit, not in it."""
+    monkeypatch.setattr(loader.time, 'sleep', lambda seconds: None)
+    driver = StubDriver()
+    graph = backends.BoltBackend(driver=driver)
+    monkeypatch.setattr(graph, 'transient_errors', lambda: (IOError,))
+    failures = ['Connection reset']
+    run, commit = StubTransaction.run, StubTransaction.commit
+
+    def flaky_run(self, statement, parameters):
+        if failures:
+            raise IOError(failures.pop())
+        return run(self, statement, parameters)
+
+    def lost_commit(self):
+        commit(self)  # Committed, but the response never arrives
+        raise IOError('Connection reset')
+
+    monkeypatch.setattr(StubTransaction, 'run', flaky_run)
+    monkeypatch.setattr(StubTransaction, 'commit', lost_commit)
+    with pytest.raises(backends.CommitUnknownError):
+        loader.load(u'- !gryaml.node [{labels: [Person]}]', graph)
+    assert [('rollback', None), ('commit', None)] == [
+        entry for entry in driver.log if entry[1] is None]
@@ -0,0 +1,123 @@
+"""Tests for :mod:`gryaml.compiler`."""
+from __future__ import print_function, absolute_import
+
+import io
+from textwrap import dedent
+
+import pytest
+
+from gryaml import compiler, cypher
+
+try:
+    from typing import Callable  # noqa: F401
+    from py2neo_compat import Graph  # noqa: F401
+except ImportError:
+    """Module :mod:`typing` not required for Py27-compatible type comments."""
+
+
+@pytest.mark.unit
+def test_literal_round_trip():
+    # type: () -> None
+    """Parameters survive rendering as Cypher literals & parsing back."""
+    rows = [{'ref': 0,
+             'properties': {'name': u'Tom "T" Hanks\n', 'odd`key': [1, 2.5],
+                            'flag': True, 'none': None}}]
+    assert rows == cypher.parse_literal(cypher.literal(rows))
+
+
+@pytest.mark.unit
+def test_compile_load(sample_yaml):
+    # type: (Callable[[str], str]) -> None
+    """Compile a sample to a script of batched statements."""
+    out = io.StringIO()
+    plan = compiler.compile_load([sample_yaml('relationships')], out,
+                                 chunk_size=3)
+
+    assert (3, 2, 5, 2) == (plan.nodes, plan.rels,
+                            plan.batches, plan.transactions)
+    assert 7 == plan.round_trips
+
+    script = out.getvalue().splitlines()
+    # Refs left by an earlier script are cleared before any are created
+    assert cypher.remove_refs_statement() + u';' == script[1]
+    assert 2 == script.count(':begin')
+    assert 5 == len([line for line in script if line.startswith(':param')])
+    assert script[-1] == '// ' + str(plan)
+
+    rel_rows = [cypher.parse_literal(line.partition('=>')[2])
+                for line in script if line.startswith(':param')
+                and 'head' in line]
+    assert [[{'head': 1, 'tail': 0, 'properties': {}}],
+            [{'head': 2, 'tail': 0,
+              'properties': {'roles': ['Neo'], 'costume': 'black trenchcoat',
+                             'hands': 2, 'feet': 2,
+                             'hair': 'slicked back'}}]] == rel_rows
+
+
+@pytest.mark.unit
+def test_compile_arrays():
+    # type: () -> None
+    """Array properties are written as lists."""
+    out = io.StringIO()
+    compiler.compile_load([dedent(u"""\
+        - &word !gryaml.node
+          - properties:
+              embedding: !gryaml.array {dtype: i2, data: AQACAA==}
+        - !gryaml.rel
+          - *word
+          - SIMILAR
+          - *word
+          - properties: {weights: !gryaml.array {dtype: i2, data: AwA=}}
+    """)], out)
+
+    rows = [cypher.parse_literal(line.partition('=>')[2])
+            for line in out.getvalue().splitlines()
+            if line.startswith(':param')]
+    assert [[{'ref': 0, 'properties': {'embedding': [1, 2]}}],
+            [{'head': 0, 'tail': 0, 'properties': {'weights': [3]}}]] == rows
+
+
+@pytest.mark.unit
+def test_compile_refs():
+    # type: () -> None
+    """References to nodes of other files cannot be compiled."""
+    with pytest.raises(ValueError) as excinfo:
+        compiler.compile_load([dedent(u"""\
+            - &keanu !gryaml.node [{labels: [Person]}]
+            - !gryaml.rel [*keanu, ACTED_IN, !gryaml.ref matrix]
+        """)], io.StringIO())
+    assert 'matrix' in str(excinfo.value)
+    assert '!gryaml.ref' in str(excinfo.value)
+
+
+@pytest.mark.unit
+@pytest.mark.parametrize('version, index', [
+    (None, u'CREATE INDEX ON :`_GryamlRef`(`_gryaml_ref`)'),
+    ((5, 12), u'CREATE INDEX `gryaml_ref` IF NOT EXISTS'
+              u' FOR (n:`_GryamlRef`) ON (n.`_gryaml_ref`)'),
+])
+def test_compile_index(version, index):
+    # type: (tuple, str) -> None
+    """The index on refs is in the syntax of the version compiled for."""
+    out = io.StringIO()
+    compiler.compile_load([u'- !gryaml.node [{labels: [Person]}]\n'], out,
+                          neo4j_version=version)
+
+    script = out.getvalue().splitlines()
+    assert index + u';' in script
+    assert (u'DROP INDEX `gryaml_ref` IF EXISTS;' in script) \
+        == (version is not None)
+
+
+@pytest.mark.integration
+def test_replay(graphdb, sample_yaml):
+    # type: (Graph, Callable[[str], str]) -> None
+    """A compiled script loads the same graph."""
+    out = io.StringIO()
+    compiler.compile_load([sample_yaml('nodes-and-relationships')], out)
+    out.seek(0)
+    compiler.replay(out, graphdb)
+
+    assert 9 == len(graphdb.cypher.execute('MATCH (n) RETURN n'))
+    assert 12 == len(graphdb.cypher.execute('MATCH ()-[r]->() RETURN r'))
+    assert 0 == len(graphdb.cypher.execute('MATCH (n:_GryamlRef) RETURN n'))
@@ -0,0 +1,186 @@
+"""Tests for :mod:`gryaml.delta`."""
+from __future__ import print_function, absolute_import
+
+import json
+from textwrap import dedent
+
+import pytest
+
+from gryaml import backends, cypher, delta, loader
+
+try:
+    from typing import Set, Tuple  # noqa: F401
+except ImportError:
+    """Module :mod:`typing` not required for Py27-compatible type comments."""
+
+MOVIES = dedent("""\
+    - &keanu !gryaml.node
+      - labels: [Person]
+      - properties: {name: Keanu Reeves, born: 1964}
+    - &carrie !gryaml.node
+      - labels: [Person]
+      - properties: {name: Carrie-Anne Moss}
+    - &matrix !gryaml.node
+      - labels: [Movie]
+      - properties: {title: The Matrix}
+    - !gryaml.rel [*keanu, ACTED_IN, *matrix, {roles: [Neo]}]
+    - !gryaml.rel [*carrie, ACTED_IN, *matrix, {roles: [Trinity]}]
+""")
+
+CHANGED = dedent("""\
+    - &keanu !gryaml.node
+      - labels: [Person]
+      - properties: {name: Keanu Reeves, born: 1965}
+    - &matrix !gryaml.node
+      - labels: [Film]
+      - properties: {title: The Matrix}
+    - !gryaml.rel [*keanu, ACTED_IN, *matrix, {roles: [Neo, The One]}]
+    - !gryaml.rel [*keanu, KNOWS, *matrix]
+""")
+
+
+def shape(graph):
+    # type: (backends.MemoryBackend) -> Tuple[Set, Set]
+    """Nodes & rels of `graph`, by name or title."""
+    def name(id_):
+        properties = graph.nodes[id_].properties
+        return properties.get('name', properties.get('title'))
+
+    return ({(tuple(n.labels), name(n.id)) for n in graph.nodes.values()},
+            {(name(r.head), r.type, name(r.tail),
+              json.dumps(r.properties, sort_keys=True))
+             for r in graph.rels.values()})
+
+
+@pytest.mark.unit
+def test_apply_unchanged():
+    # type: () -> None
+    """Applying the same document again writes nothing."""
+    graph = backends.MemoryBackend()
+    assert 5 == len(delta.apply(MOVIES, graph))
+    before = shape(graph)
+
+    assert 0 == len(delta.apply(MOVIES, graph))
+    assert before == shape(graph)
+
+
+@pytest.mark.unit
+def test_apply_arrays():
+    # type: () -> None
+    """Array properties compare equal to the lists a graph holds."""
+    graph = backends.MemoryBackend()
+    text = dedent("""\
+        - &word !gryaml.node
+          - properties: {embedding: !gryaml.array {dtype: i2, data: AQACAA==}}
+        - !gryaml.rel
+          - *word
+          - SIMILAR
+          - *word
+          - properties: {weights: !gryaml.array {dtype: i2, data: AwA=}}
+    """)
+    assert 2 == len(delta.apply(text, graph))
+    assert 0 == len(delta.apply(text, graph))
+
+    changed = delta.apply(text.replace('AwA=', 'BAA='), graph)
+    assert [{'weights': [4]}] == [properties for _, properties
+                                  in changed.rel_properties]
+
+
+@pytest.mark.unit
+def test_apply_changes():
+    # type: () -> None
+    """Only what changed is written, identified by anchors kept by a load."""
+    graph = backends.MemoryBackend()
+    loader.load(MOVIES, graph, keep_anchors=True)
+    transactions = graph.transactions
+
+    applied = delta.apply(CHANGED, graph, chunk_size=2)
+
+    assert 6 == len(applied)
+    assert ('nodes: 0 created, 2 updated, 1 deleted;'
+            ' relationships: 1 created, 1 updated, 0 deleted') == str(applied)
+    assert 6 == graph.transactions - transactions
+    assert ({(('Person',), 'Keanu Reeves'), (('Film',), 'The Matrix')},
+            {('Keanu Reeves', 'ACTED_IN', 'The Matrix',
+              '{"roles": ["Neo", "The One"]}'),
+             ('Keanu Reeves', 'KNOWS', 'The Matrix', '{}')}) \
+        == shape(graph)
+
+
+@pytest.mark.unit
+def test_apply_dry_run():
+    # type: () -> None
+    """A dry run only reports the delta."""
+    graph = backends.MemoryBackend()
+    delta.apply(MOVIES, graph)
+    before = shape(graph)
+    assert 6 == len(delta.apply(CHANGED, graph, dry_run=True))
+    assert before == shape(graph)
+
+
+@pytest.mark.unit
+def test_declared_keys():
+    # type: () -> None
+    """Nodes with declared keys need no anchors, and others are left."""
+    graph = backends.MemoryBackend()
+    other = graph.create_node(['Person'], {'name': 'Hugo Weaving'})
+    unmanaged = graph.create_node(['Movie'], {'title': 'Speed'})
+    keys = {'Person': ['name']}
+    text = dedent("""\
+        - !gryaml.rel
+          - !gryaml.node [{labels: [Person]}, {properties: {name: Keanu}}]
+          - KNOWS
+          - !gryaml.node [{labels: [Person]}, {properties: {name: Carrie}}]
+        - !gryaml.rel
+          - !gryaml.node [{labels: [Person]}, {properties: {name: Carrie}}]
+          - KNOWS
+          - !gryaml.node [{labels: [Person]}, {properties: {name: Keanu}}]
+    """)
+
+    applied = delta.apply(text, graph, keys)
+
+    assert [other.id] == applied.delete_nodes
+    assert (2, 2) == (len(applied.create_nodes), len(applied.create_rels))
+    assert unmanaged.id in graph.nodes
+    assert not any(cypher.KEY in n.properties for n in graph.nodes.values())
+    assert 0 == len(delta.apply(text, graph, keys))
+
+
+@pytest.mark.unit
+def test_unidentified_node():
+    # type: () -> None
+    """Nodes must have an anchor or declared key."""
+    with pytest.raises(ValueError):
+        delta.Document().read(u'- !gryaml.node [{labels: [Person]}]\n')
+    with pytest.raises(ValueError):
+        delta.Document({'Person': ['name']}).read(dedent("""\
+            - !gryaml.node [{labels: [Person]}, {properties: {name: a}}]
+            - !gryaml.node [{labels: [Person]}, {properties: {name: a, b: 1}}]
+        """))
+
+
+@pytest.mark.unit
+def test_scoped_anchors():
+    # type: () -> None
+    """Anchors are scoped by file & document, and a delta of one file leaves
+    the nodes of others.
+    """
+    graph = backends.MemoryBackend()
+    person = u'- &a !gryaml.node [{labels: [Person]}]\n'
+    movie = u'- &a !gryaml.node [{labels: [Movie]}]\n'
+    assert 2 == len(delta.apply(person + u'---\n' + movie, graph))
+
+    delta.apply(person, graph, source='people.yaml')
+    loader.load(movie, graph, keep_anchors=True, source='movies.yaml')
+    assert 0 == len(delta.apply(person, graph, source='people.yaml'))
+    assert 4 == len(graph.nodes)
+
+    document = delta.Document()
+    document.read(person, source='people.yaml')
+    document.read(u'- !gryaml.rel [!gryaml.ref a, LIKES, !gryaml.ref a]\n',
+                  source='likes.yaml')
+    assert 1 == len(delta.Delta.compare(document, graph))
+
+    document.read(movie, source='movies.yaml')
+    with pytest.raises(ValueError):
+        delta.Delta.compare(document, graph)
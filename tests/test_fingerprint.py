@@ -0,0 +1,112 @@
+"""Tests for :mod:`gryaml.fingerprint`."""
+from __future__ import print_function, absolute_import
+
+from textwrap import dedent
+
+import pytest
+
+from gryaml import backends, cypher, fingerprint, loader
+
+try:
+    from typing import Any, Callable  # noqa: F401
+except ImportError:
+    """Module :mod:`typing` not required for Py27-compatible type comments."""
+
+MOVIE = dedent("""\
+    - &keanu !gryaml.node
+      - labels: [Person, Actor]
+      - properties: {name: Keanu}
+    - &matrix !gryaml.node [{labels: [Movie]}, {properties: {released: 1999}}]
+    - !gryaml.rel [*keanu, ACTED_IN, *matrix, {roles: [Neo]}]
+""")
+
+
+@pytest.mark.unit
+def test_order_independent():
+    # type: () -> None
+    """Neither the order of items nor of labels & keys matters."""
+    reordered = dedent("""\
+        - &film !gryaml.node
+          - properties: {released: 1999}
+          - labels: [Movie]
+        - !gryaml.rel
+          - !gryaml.node [{labels: [Actor, Person]},
+                          {properties: {name: Keanu}}]
+          - ACTED_IN
+          - *film
+          - properties: {roles: [Neo]}
+    """)
+    assert fingerprint.of_yaml(MOVIE) == fingerprint.of_yaml(reordered)
+
+
+@pytest.mark.unit
+@pytest.mark.parametrize('change', [('Neo', 'Thomas'), ('1999', '1999.0'),
+                                    ('ACTED_IN', 'DIRECTED'),
+                                    ('[*keanu, ACTED_IN, *matrix',
+                                     '[*matrix, ACTED_IN, *keanu'),
+                                    ('Person, Actor', 'Person')])
+def test_content_sensitive(change):
+    # type: (Any) -> None
+    """Any change of labels, properties, types or direction shows."""
+    assert fingerprint.of_yaml(MOVIE) \
+        != fingerprint.of_yaml(MOVIE.replace(*change))
+
+
+@pytest.mark.unit
+def test_null_properties():
+    # type: () -> None
+    """Null properties do not count, as Neo4j does not store them."""
+    assert fingerprint.of_yaml(MOVIE) == fingerprint.of_yaml(
+        MOVIE.replace('{released: 1999}', '{released: 1999, sequel: null}'))
+
+
+@pytest.mark.unit
+def test_of_graph(sample_yaml):
+    # type: (Callable[[str], str]) -> None
+    """A loaded fixture has the fingerprint of its file, apart from others."""
+    text = sample_yaml('relationships')
+    graph = backends.MemoryBackend()
+    loader.load(text, graph, load_id='a', keep_anchors=True)
+    loader.load(MOVIE, graph, chunk_size=1, load_id='b')
+
+    assert fingerprint.of_yaml(text) == fingerprint.of_graph(graph, 'a')
+    assert fingerprint.of_yaml(MOVIE) \
+        == fingerprint.of_graph(graph, 'b')
+    assert fingerprint.of_yaml(text + MOVIE) == fingerprint.of_graph(graph)
+
+    node_id = next(id_ for id_, node in graph.nodes.items()
+                   if node.properties.get('name') == 'Keanu')
+    graph.nodes[node_id].properties['name'] = 'Neo'
+    assert fingerprint.of_yaml(MOVIE) != fingerprint.of_graph(graph, 'b')
+
+
+@pytest.mark.unit
+def test_scan_statements():
+    # type: () -> None
+    """Scans read all at once, unordered, so need not seek by id."""
+    assert (u'MATCH (n:`_GryamlLoad`) WHERE n.`_gryaml_load` = $load'
+            u' RETURN id(n), labels(n), properties(n)') \
+        == cypher.scan_nodes_statement(u'$load')
+    assert (u'MATCH (a)-[r]->(b)'
+            u' RETURN id(r), id(a), type(r), id(b), properties(r)') \
+        == cypher.scan_rels_statement()
+
+
+@pytest.mark.unit
+def test_of_graph_streams(monkeypatch):
+    # type: (Any) -> None
+    """A database is read by one streamed query for nodes, one for rels."""
+    graph = backends.BoltBackend(driver=object())
+    statements = []
+
+    def stream(statement, parameters=None):
+        statements.append(statement)
+        if u'labels(n)' in statement:
+            return iter([(1, [u'Person'], {u'name': u'Keanu'}),
+                         (2, [u'Movie'], {u'released': 1999})])
+        return iter([(3, 1, u'ACTED_IN', 2, {u'roles': [u'Neo']})])
+
+    monkeypatch.setattr(graph, 'stream', stream)
+    assert fingerprint.of_yaml(MOVIE.replace('Person, Actor', 'Person')) \
+        == fingerprint.of_graph(graph)
+    assert 2 == len(statements)
@@ -207,6 +207,64 @@ def test_node_can_be_loaded_simple():
     assert node_data == node_loaded
 
 
+@pytest.mark.unit
+def test_edges_can_be_loaded_simple():
+    # type: () -> None
+    """Test loading an edge table with "simple" representation.
+
+    Each row is constructed as a "simple" relationship would be.
+    """
+    gryaml.register_simple()
+
+    loaded = yaml.safe_load(dedent("""
+        - &a !gryaml.node [{properties: {name: a}}]
+        - &b !gryaml.node [{properties: {name: b}}]
+        - !gryaml.edges
+          type: KNOWS
+          keys: [since]
+          rows:
+          - [*a, *b, 2019]
+          - [*b, *a]
+        """))
+
+    assert [[loaded[0], 'KNOWS', loaded[1], {'since': 2019}],
+            [loaded[1], 'KNOWS', loaded[0]]] == loaded[2]
+
+
+@pytest.mark.unit
+def test_path_can_be_loaded_simple():
+    # type: () -> None
+    """Test loading a path with "simple" representation.
+
+    As for nodes & rels, it is the structure without the tag.
+    """
+    gryaml.register_simple()
+
+    sample_yaml = """
+        !gryaml.path
+          - !gryaml.node [{properties: {name: Mon}}]
+          - NEXT
+          - !gryaml.node [{properties: {name: Tue}}]
+          - [AFTER, {gap: 1}]
+          - !gryaml.node [{properties: {name: Wed}}]
+        """
+
+    path_loaded = yaml.safe_load(sample_yaml)
+    assert ['NEXT', ['AFTER', {'gap': 1}]] == path_loaded[1::2]
+    assert [{'properties': {'name': 'Tue'}}] == path_loaded[2]
+
+
+@pytest.mark.unit
+def test_repeat_cannot_be_loaded():
+    # type: () -> None
+    """Repeats are refused, as only the chunked loader expands them."""
+    gryaml.register_simple()
+
+    with pytest.raises(yaml.constructor.ConstructorError) as excinfo:
+        yaml.safe_load('!gryaml.repeat {count: 2, node: !gryaml.node []}')
+    assert 'expanded only by' in str(excinfo.value)
+
+
 @pytest.mark.unit
 def test_node_can_be_dumped(sample_simple_rel):
     # type: (Relationship) -> None
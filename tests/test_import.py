@@ -0,0 +1,77 @@
+"""Tests for the import time of :mod:`gryaml`."""
+from __future__ import print_function, absolute_import
+
+import subprocess
+import sys
+
+import pytest
+
+try:
+    from typing import Dict  # noqa: F401
+except ImportError:
+    """Module :mod:`typing` not required for Py27-compatible type comments."""
+
+#: Budget for the cumulative import time of `gryaml`, in microseconds. This
+#: is generous, to allow for slow CI hosts; importing py2neo alone exceeds it.
+IMPORT_BUDGET_US = 150000
+
+#: Modules which must not be imported until needed.
+LAZY_MODULES = {'py2neo', 'py2neo_compat', 'boltons'}
+
+pytestmark = pytest.mark.skipif(sys.version_info < (3, 7),
+                                reason='-X importtime requires Python 3.7')
+
+
+def import_times(statement):
+    # type: (str) -> Dict[str, int]
+    """Run `statement` & return the cumulative import time of each module."""
+    output = subprocess.check_output(
+        [sys.executable, '-X', 'importtime', '-c', statement],
+        stderr=subprocess.STDOUT, universal_newlines=True)
+
+    times = {}
+    for line in output.splitlines():
+        if not line.startswith('import time:') or 'cumulative' in line:
+            continue
+        _, cumulative, module = line[len('import time:'):].split('|')
+        times[module.strip()] = int(cumulative)
+    return times
+
+
+@pytest.mark.unit
+@pytest.mark.parametrize('statement', [
+    'import gryaml',
+    'import gryaml; gryaml.register_simple()',
+    'import gryaml.__main__',
+])
+def test_lazy_imports(statement):
+    # type: (str) -> None
+    """py2neo & friends are not imported unless the database is needed."""
+    imported = {module.split('.')[0] for module in import_times(statement)}
+    assert not LAZY_MODULES & imported
+
+
+@pytest.mark.unit
+def test_import_budget():
+    # type: () -> None
+    """Importing `gryaml` stays within budget."""
+    assert import_times('import gryaml')['gryaml'] < IMPORT_BUDGET_US
+
+
+@pytest.mark.unit
+def test_deferred_representers():
+    # type: () -> None
+    """Simple representers work once py2neo is imported, by anyone."""
+    output = subprocess.check_output([sys.executable, '-c', '\n'.join([
+        'import yaml, gryaml',
+        'gryaml.register_simple()',
+        'assert "py2neo" not in __import__("sys").modules',
+        'from py2neo_compat import Node',
+        'print(yaml.safe_dump(Node("Person", name="Keanu")))',
+        'try:',
+        '    yaml.safe_dump(object())',
+        'except yaml.representer.RepresenterError:',
+        '    print("unrepresentable")',
+    ])], universal_newlines=True)
+    assert 'name: Keanu' in output
+    assert 'unrepresentable' in output
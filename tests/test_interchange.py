@@ -0,0 +1,418 @@
+"""Tests for :mod:`gryaml.interchange`."""
+from __future__ import print_function, absolute_import
+
+import io
+import json
+from textwrap import dedent
+from collections import Counter
+
+import pytest
+
+import gryaml
+from gryaml import backends, interchange, loader
+
+try:
+    from typing import Any, Callable, List, Tuple  # noqa: F401
+    from py2neo_compat import Graph  # noqa: F401
+except ImportError:
+    """Module :mod:`typing` not required for Py27-compatible type comments."""
+
+
+def graph_shape(graph):
+    # type: (backends.MemoryBackend) -> Tuple[Counter, Counter]
+    """Nodes & rels of `graph`, independent of ids & order."""
+    def node(id_):
+        entity = graph.nodes[id_]
+        return (tuple(sorted(entity.labels)),
+                json.dumps(entity.properties, sort_keys=True))
+
+    return (Counter(node(id_) for id_ in graph.nodes),
+            Counter((node(r.head), r.type, node(r.tail),
+                     json.dumps(r.properties, sort_keys=True))
+                    for r in graph.rels.values()))
+
+
+def load_shape(stream, format='yaml'):
+    # type: (object, str) -> Tuple[Counter, Counter]
+    """Shape of the graph loaded from `stream`."""
+    graph = backends.MemoryBackend()
+    loader.load(stream, graph, chunk_size=4, format=format)
+    return graph_shape(graph)
+
+
+@pytest.mark.unit
+def test_yaml_to_records(sample_yaml):
+    # type: (Callable[[str], str]) -> None
+    """Anchors key their entities; other nodes get integers."""
+    out = io.StringIO()
+    assert 5 == interchange.yaml_to_records(sample_yaml('relationships'), out)
+
+    records = [json.loads(line) for line in out.getvalue().splitlines()]
+    assert {'node': 'node-person-lana', 'labels': ['Person'],
+            'properties': {'name': 'Lana Wachowski', 'born': '1965'}} \
+        == records[1]
+    assert {'rel': 'rel-lana-matrix', 'head': 'node-person-lana',
+            'type': 'DIRECTED', 'tail': 'node-movie-matrix'} == records[2]
+
+
+@pytest.mark.unit
+@pytest.mark.parametrize('format', ['jsonl', 'msgpack'])
+def test_array_records(format):
+    # type: (str) -> None
+    """Array properties are written as lists."""
+    if format == 'msgpack':
+        pytest.importorskip('msgpack')
+    out = io.BytesIO() if format == 'msgpack' else io.StringIO()
+    interchange.yaml_to_records(
+        u'- !gryaml.node [{properties: {embedding: !gryaml.array'
+        u' {dtype: i2, data: AQACAA==}}}]\n', out, format)
+    out.seek(0)
+
+    record, = interchange.read_records(out, format)
+    assert {'embedding': [1, 2]} == record['properties']
+
+
+@pytest.mark.unit
+@pytest.mark.parametrize('format', ['jsonl', 'msgpack'])
+def test_date_records(format):
+    # type: (str) -> None
+    """Dates & datetimes are written tagged and read back as such."""
+    if format == 'msgpack':
+        pytest.importorskip('msgpack')
+    text = dedent(u"""\
+        - &a !gryaml.node
+          - properties:
+              born: 1964-09-02
+              seen: [2001-12-14 21:59:43.10, 2001-12-14t21:59:43.10-05:00]
+        - !gryaml.rel [*a, KNOWS, *a, {properties: {since: 2000-01-01}}]
+    """)
+    out = io.BytesIO() if format == 'msgpack' else io.StringIO()
+    interchange.yaml_to_records(text, out, format)
+    out.seek(0)
+
+    records = list(interchange.read_records(out, format))
+    assert {'$date': '1964-09-02'} == records[0]['properties']['born']
+    assert {'$datetime': '2001-12-14T21:59:43.100000'} \
+        == records[0]['properties']['seen'][0]
+
+    expected = list(loader.iter_chunks(text, chunk_size=1))
+    specs = [spec for _, _, spec in interchange.iter_specs(records)]
+    assert [expected[0].nodes[0].properties,
+            expected[1].rels[0].properties] \
+        == [spec.properties for spec in specs]
+
+    out.seek(0)
+    round_tripped = io.StringIO()
+    interchange.records_to_yaml(out, round_tripped, format)
+    assert 'born: 1964-09-02\n' in round_tripped.getvalue()
+
+
+@pytest.mark.unit
+@pytest.mark.parametrize('sample', ['nodes-and-relationships',
+                                    'node-parameter-permutations'])
+def test_round_trip(sample_yaml, sample):
+    # type: (Callable[[str], str], str) -> None
+    """Converting to records & back loses nothing of the graph."""
+    text = sample_yaml(sample) + u'\n---\n' + sample_yaml('relationships')
+    records = io.StringIO()
+    interchange.yaml_to_records(text, records)
+    round_tripped = io.StringIO()
+    interchange.records_to_yaml(io.StringIO(records.getvalue()),
+                                round_tripped)
+
+    expected = load_shape(text)
+    assert expected == load_shape(io.StringIO(records.getvalue()), 'jsonl')
+    assert expected == load_shape(round_tripped.getvalue())
+
+
+@pytest.mark.unit
+def test_keys_round_trip():
+    # type: () -> None
+    """Keys of any form survive conversion to YAML & back."""
+    keys = [1, u'n1', u'plain', u'with space', u'{flow}', u'_6e31', u'n-2',
+            -2, u'_abc', u'\u00e9t\u00e9']
+    records = u''.join(json.dumps(record) + u'\n' for record in
+                       [{'node': key} for key in keys] +
+                       [{'rel': None, 'head': key, 'type': 'R', 'tail': 1}
+                        for key in keys])
+    text = io.StringIO()
+    interchange.records_to_yaml(io.StringIO(records), text)
+    assert '&n1 ' in text.getvalue()
+
+    out = io.StringIO()
+    interchange.yaml_to_records(text.getvalue(), out)
+    round_tripped = [json.loads(line) for line in out.getvalue().splitlines()]
+    assert [{'node': key} for key in keys] == round_tripped[:len(keys)]
+    assert [(key, 1) for key in keys] == [
+        (record['head'], record['tail'])
+        for record in round_tripped[len(keys):]]
+
+
+@pytest.mark.unit
+def test_yaml_keys():
+    # type: () -> None
+    """Other nodes' integers skip those of anchors."""
+    out = io.StringIO()
+    interchange.yaml_to_records(dedent(u"""\
+        - !gryaml.node []
+        - &n2 !gryaml.node []
+        - !gryaml.node []
+        - &n1 !gryaml.node []
+    """), out)
+    assert [1, 2, 3, u'n1'] == [json.loads(line)['node']
+                                for line in out.getvalue().splitlines()]
+
+
+@pytest.mark.unit
+def test_edges_round_trip(sample_yaml, monkeypatch):
+    # type: (Callable[[str], str], object) -> None
+    """Relationships written as tables load the same."""
+    monkeypatch.setattr(interchange, 'EDGES_ROWS', 2)
+    text = sample_yaml('nodes-and-relationships').replace('&rel-', '&r-')
+    records = io.StringIO()
+    interchange.yaml_to_records(text, records)
+    unkeyed = u''.join(
+        json.dumps(dict(record, rel=None) if 'rel' in record else record)
+        + u'\n' for record in interchange.read_jsonl(
+            io.StringIO(records.getvalue())))
+    tables = io.StringIO()
+    interchange.records_to_yaml(io.StringIO(unkeyed), tables, edges=True)
+
+    assert tables.getvalue().count('!gryaml.edges') > 1
+    assert '!gryaml.rel' not in tables.getvalue()
+    assert load_shape(text) == load_shape(tables.getvalue())
+
+
+@pytest.mark.unit
+def test_paths_round_trip():
+    # type: () -> None
+    """Chains written as paths load the same, nodes within them."""
+    records = [{'node': day, 'labels': ['Day']} for day in range(1, 5)]
+    records += [{'head': day, 'type': 'NEXT', 'tail': day + 1}
+                for day in range(1, 4)]
+    records += [{'node': 9},
+                {'head': 9, 'type': 'FIRST', 'tail': 1,
+                 'properties': {'weekly': True}},
+                {'head': 1, 'type': 'NEXT', 'tail': 4}]
+    text = u''.join(json.dumps(record) + u'\n' for record in records)
+    paths = io.StringIO()
+    interchange.records_to_yaml(io.StringIO(text), paths, paths=True)
+
+    assert 2 == paths.getvalue().count('!gryaml.path')
+    assert 1 == paths.getvalue().count('&n9')
+    assert '!gryaml.rel' not in paths.getvalue()
+    assert load_shape(io.StringIO(text), 'jsonl') \
+        == load_shape(paths.getvalue())
+
+
+@pytest.mark.unit
+def test_msgpack_round_trip(sample_yaml):
+    # type: (Callable[[str], str]) -> None
+    """MessagePack holds the same records as JSON Lines."""
+    pytest.importorskip('msgpack')
+    text = sample_yaml('nodes-and-relationships')
+    jsonl, packed = io.StringIO(), io.BytesIO()
+    interchange.yaml_to_records(text, jsonl)
+    interchange.yaml_to_records(text, packed, 'msgpack')
+
+    assert list(interchange.read_jsonl(io.StringIO(jsonl.getvalue()))) \
+        == list(interchange.read_msgpack(io.BytesIO(packed.getvalue())))
+    assert load_shape(text) \
+        == load_shape(io.BytesIO(packed.getvalue()), 'msgpack')
+
+
+@pytest.mark.unit
+def test_load_resume(tmpdir):
+    # type: (object) -> None
+    """Integer keys survive in checkpoints for resuming."""
+    records = u'\n'.join([
+        u'{"node": 1, "labels": ["Person"]}',
+        u'{"node": 2}',
+        u'{"head": 1, "type": "KNOWS", "tail": 2}',
+    ])
+    path = str(tmpdir.join('load.checkpoint'))
+    first = backends.MemoryBackend()
+    loader.load(io.StringIO(records), first, chunk_size=2,
+                checkpoint=loader.Checkpoint(path), format='jsonl')
+    checkpoint = loader.Checkpoint.read(path)
+    checkpoint.done = False
+    checkpoint.item = 2
+
+    second = backends.MemoryBackend()
+    second.nodes.update(first.nodes)
+    loader.load(io.StringIO(records), second, checkpoint=checkpoint,
+                format='jsonl')
+    assert [(0, 'KNOWS', 1)] == [r[1:4] for r in second.rels.values()]
+
+
+@pytest.mark.unit
+def test_invalid_record():
+    # type: () -> None
+    """Records must be nodes, rels or document starts."""
+    with pytest.raises(ValueError):
+        list(interchange.iter_specs([{'labels': ['Person']}]))
+    with pytest.raises(ValueError):
+        list(interchange.iter_specs([{'type': 'KNOWS', 'head': 1}]))
+
+
+@pytest.mark.unit
+def test_format_of():
+    # type: () -> None
+    """Formats are recognised by extension."""
+    assert ['jsonl', 'msgpack', 'yaml'] \
+        == [interchange.format_of(path)
+            for path in ('a.jsonl', 'b.MSGPACK', 'c.yaml')]
+
+
+@pytest.mark.unit
+def test_dump_stream():
+    # type: () -> None
+    """Entities are emitted as taken, nodes aliased once emitted."""
+    from py2neo_compat import Node, Relationship
+
+    def entities():
+        keanu = Node('Person', name='Keanu')
+        yield keanu
+        for title in ('The Matrix', 'John Wick'):
+            movie = Node('Movie', title=title)
+            yield Relationship(keanu, 'ACTED_IN', movie)
+
+    text = gryaml.dump_stream(entities())
+    assert 3 == text.count('!gryaml.node')
+    assert 2 == text.count('*n1')
+    tables = gryaml.dump_stream(entities(), edges=True)
+    assert 2 == tables.count('!gryaml.edges')
+    assert load_shape(io.StringIO(text)) == load_shape(tables)
+
+    def chain():
+        days = [Node('Day', name=name) for name in ('Mon', 'Tue', 'Wed')]
+        yield Relationship(days[0], 'NEXT', days[1])
+        yield Relationship(days[1], 'NEXT', days[2])
+
+    path = gryaml.dump_stream(chain(), paths=True)
+    assert 1 == path.count('!gryaml.path')
+    assert load_shape(io.StringIO(gryaml.dump_stream(chain()))) \
+        == load_shape(path)
+
+    out = io.StringIO()
+    assert gryaml.dump_stream(entities(), out) is None
+    shape = load_shape(io.StringIO(out.getvalue()))
+    assert shape == load_shape(io.StringIO(text))
+    assert 2 == sum(shape[1].values())
+
+
+class Pulling(object):
+    """Graph recording the entities pulled, by request."""
+
+    def __init__(self):
+        # type: () -> None
+        self.pulls = []  # type: List[Tuple]
+
+    def pull(self, *entities):
+        # type: (*Any) -> None
+        self.pulls.append(entities)
+
+
+class Bound(object):
+    """Node or relationship bound to `graph`."""
+
+    bound = True
+
+    def __init__(self, graph, start_node=None, end_node=None):
+        # type: (Any, Any, Any) -> None
+        self.graph = graph
+        if start_node is not None:
+            self.start_node, self.end_node = start_node, end_node
+
+
+@pytest.mark.unit
+def test_prefetch(monkeypatch):
+    # type: (Any) -> None
+    """Bound entities & endpoints are pulled in batches, once each."""
+    graph = Pulling()
+    a, b, c = Bound(graph), Bound(graph), Bound(graph)
+    ab, bc = Bound(graph, a, b), Bound(graph, b, c)
+    abstract = Bound(None)
+    abstract.bound = False
+
+    assert 5 == gryaml.prefetch([ab, bc, a, abstract], batch_size=2)
+    assert [(ab, a), (b, bc), (c,)] == graph.pulls
+    assert 0 == gryaml.prefetch([Bound(object())])
+
+    from py2neo_compat import Node, Relationship
+    windows = []  # type: List[int]
+    monkeypatch.setattr('gryaml._py2neo.prefetch',
+                        lambda window, size: windows.append(len(window)))
+    keanu = Node('Person', name='Keanu')
+    entities = [keanu] + [Relationship(keanu, 'ACTED_IN', Node('Movie'))
+                          for _ in range(4)]
+    assert 9 == len(list(interchange.entity_specs(entities, batch_size=2)))
+    assert [2, 2, 1] == windows
+
+
+@pytest.mark.unit
+def test_dump_prefetch(monkeypatch):
+    # type: (Any) -> None
+    """Lists dumped by ``yaml.dump`` are prefetched before rendering."""
+    import yaml
+    from py2neo_compat import Node
+    from gryaml.pyyaml import _unregister
+
+    prefetched = []  # type: List[Any]
+    monkeypatch.setattr('gryaml.pyyaml.prefetch', prefetched.append)
+    gryaml.register()
+    try:
+        nodes = [Node('Person', name='Keanu'), Node('Movie')]
+        assert '!gryaml.node' in yaml.dump({'results': nodes})
+    finally:
+        _unregister()
+    assert nodes is prefetched[0]  # Before any node is rendered
+    assert '[1, 2]' in yaml.dump([1, 2], default_flow_style=True)
+
+
+@pytest.mark.unit
+def test_dump_stream_bound(monkeypatch):
+    # type: (Any) -> None
+    """Bound nodes are recognised by id, whichever object they are."""
+    from py2neo_compat import Node, Relationship
+
+    class BoundNode(Node):
+        bound = True
+
+        def __init__(self, id_, *labels, **properties):
+            # type: (int, *str, **Any) -> None
+            Node.__init__(self, *labels, **properties)
+            self.database_id = id_
+
+        @property
+        def _id(self):
+            # type: () -> int
+            return self.database_id
+
+    monkeypatch.setattr('gryaml._py2neo.prefetch', lambda *args: 0)
+
+    def entities():
+        for title in ('The Matrix', 'John Wick'):
+            # Hydrated afresh for each result, as py2neo does
+            yield Relationship(BoundNode(1, 'Person', name='Keanu'),
+                               'ACTED_IN', Node('Movie', title=title))
+
+    text = gryaml.dump_stream(entities())
+    assert 3 == text.count('!gryaml.node')
+    assert 2 == text.count('*n1')
+
+
+@pytest.mark.integration
+def test_dump(graphdb, sample_yaml):
+    # type: (Graph, Callable[[str], str]) -> None
+    """Entities from the database are dumped as records."""
+    gryaml.register()
+    import yaml
+    yaml.load(sample_yaml('relationships'))
+
+    out = io.StringIO()
+    rels = [record[0] for record in
+            graphdb.cypher.execute('MATCH ()-[r]->() RETURN r')]
+    assert 5 == interchange.dump(rels, out)
+    assert load_shape(sample_yaml('relationships')) \
+        == load_shape(io.StringIO(out.getvalue()), 'jsonl')
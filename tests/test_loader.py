@@ -0,0 +1,718 @@
+"""Tests for :mod:`gryaml.loader`."""
+from __future__ import print_function, absolute_import
+
+import itertools
+import json
+from textwrap import dedent
+
+import pytest
+import yaml
+from yaml.composer import ComposerError
+from yaml.constructor import ConstructorError
+
+from gryaml import backends, loader
+from gryaml.model import NodeSpec, RelSpec
+
+try:
+    from typing import Any, Callable, List  # noqa: F401
+    from py2neo_compat import Graph  # noqa: F401
+except ImportError:
+    """Module :mod:`typing` not required for Py27-compatible type comments."""
+
+
+class FakeTransaction(object):
+    """Minimal stand-in for a py2neo 2.0 Cypher transaction."""
+
+    def __init__(self, graph):
+        self.graph = graph
+        self.pending = []
+        self.finished = False
+
+    def append(self, statement, parameters):
+        self.pending.append((statement, parameters['rows']))
+
+    def process(self):
+        if self.graph.failures:  # Before the commit, so safely retried
+            self.graph.failures -= 1
+            self.graph.pending = []
+            raise IOError('Connection reset')
+        results = [[(row['ref'], next(self.graph.ids)) for row in rows]
+                   for _, rows in self.pending]
+        self.graph.pending.extend(self.pending)
+        self.pending = []
+        return results
+
+    def commit(self):
+        results = self.process()
+        self.graph.statements.extend(self.graph.pending)
+        self.graph.pending = []
+        self.graph.commits += 1
+        self.finished = True
+        return results
+
+    def rollback(self):
+        self.graph.pending = []
+        self.finished = True
+
+
+class FakeGraph(object):
+    """Graph whose ``cypher.begin()`` returns a :class:`FakeTransaction`."""
+
+    def __init__(self, failures=0):
+        self.ids = itertools.count()
+        self.failures = failures
+        self.statements = []
+        self.pending = []
+        self.commits = 0
+        self.cypher = self
+
+    def begin(self):
+        return FakeTransaction(self)
+
+    def rows(self, keyword):
+        return [row for statement, rows in self.statements
+                if keyword in statement for row in rows]
+
+
+@pytest.fixture
+def no_sleep(monkeypatch):
+    """Do not actually back off between retries."""
+    monkeypatch.setattr(loader.time, 'sleep', lambda seconds: None)
+
+
+@pytest.mark.unit
+def test_item_composer_items():
+    # type: () -> None
+    """Top-level sequence items are composed one at a time, per document."""
+    composer = loader.ItemComposer(dedent("""
+        - &a !gryaml.node []
+        - *a
+        ---
+        !gryaml.node []
+    """))
+    items = [(document, item, yaml_node.tag)
+             for document, item, yaml_node in composer.iter_items()]
+    assert [(0, 0, '!gryaml.node'),
+            (0, 1, '!gryaml.node'),
+            (1, 0, '!gryaml.node')] == items
+
+
+@pytest.mark.unit
+def test_spec_builder(sample_yaml):
+    # type: (Callable[[str], str]) -> None
+    """Specs are yielded endpoints first, each anchored entity once."""
+    composer = loader.ItemComposer(sample_yaml('relationships'))
+    builder = loader.SpecBuilder()
+    specs = [spec for _, _, yaml_node in composer.iter_items()
+             for spec in builder.specs(yaml_node)]
+
+    assert 5 == len(specs)
+    nodes = [s for s in specs if isinstance(s, NodeSpec)]
+    assert ['node-movie-matrix', 'node-person-lana', 'node-person-keanu'] \
+        == [n.key for n in nodes]
+    assert ['Person'] == nodes[1].labels
+    assert {'name': 'Lana Wachowski', 'born': '1965'} == nodes[1].properties
+
+    rels = [s for s in specs if isinstance(s, RelSpec)]
+    assert [('node-person-lana', 'DIRECTED', 'node-movie-matrix'),
+            ('node-person-keanu', 'ACTED_IN', 'node-movie-matrix')] \
+        == [(r.head, r.type, r.tail) for r in rels]
+    assert ['Neo'] == rels[1].properties['roles']
+
+
+@pytest.mark.unit
+def test_spec_builder_rel_arity():
+    # type: () -> None
+    """A relationship must have 3 or 4 items."""
+    composer = loader.ItemComposer('- !gryaml.rel [!gryaml.node [], KNOWS]')
+    builder = loader.SpecBuilder()
+    with pytest.raises(loader.ConstructorError):
+        for _, _, yaml_node in composer.iter_items():
+            list(builder.specs(yaml_node))
+
+
+@pytest.mark.unit
+def test_count_aliases(sample_yaml):
+    # type: (Callable[[str], str]) -> None
+    """Aliases are counted per document."""
+    counts = loader.count_aliases(sample_yaml('relationships') + '\n---\n[]')
+    assert [{'node-person-lana': 1, 'node-person-keanu': 1,
+             'node-movie-matrix': 2}, {}] == counts
+
+
+@pytest.mark.unit
+def test_release_after_last_alias(sample_yaml):
+    # type: (Callable[[str], str]) -> None
+    """With alias counts, anchors are released after their last alias."""
+    stream = sample_yaml('relationships')
+    chunks = list(loader.iter_chunks(
+        stream, chunk_size=1, alias_counts=loader.count_aliases(stream)))
+
+    assert [[], [], ['node-person-lana', 'rel-lana-matrix'], [],
+            ['node-movie-matrix', 'node-person-keanu', 'rel-keanu-matrix']] \
+        == [sorted(chunk.released) for chunk in chunks]
+
+
+@pytest.mark.unit
+def test_release_anchor_window():
+    # type: () -> None
+    """Anchors are released once outside the window, so cannot be used."""
+    stream = dedent("""
+        - &a !gryaml.node []
+        - &b !gryaml.node []
+        - !gryaml.rel [*a, KNOWS, *b]
+        - !gryaml.rel [*a, KNOWS, *b]
+    """)
+    chunks = loader.iter_chunks(stream, chunk_size=1, anchor_window=2)
+    assert [[], [], ['a']] == [next(chunks).released for _ in range(3)]
+    with pytest.raises(ComposerError):
+        next(chunks)
+
+
+@pytest.mark.unit
+def test_checkpoint_round_trip(tmpdir):
+    """A saved checkpoint reads back the same."""
+    path = str(tmpdir.join('load.checkpoint'))
+    assert 0 == loader.Checkpoint.read(path).written
+
+    loader.Checkpoint(path, 1, 2, {'node-a': 3}, written=4).save()
+    checkpoint = loader.Checkpoint.read(path)
+    assert (1, 2, {'node-a': 3}, 4, False) == (
+        checkpoint.document, checkpoint.item, checkpoint.anchors,
+        checkpoint.written, checkpoint.done)
+
+
+@pytest.mark.unit
+def test_retry(no_sleep):
+    """Transient errors are retried, then re-raised."""
+    attempts = []
+
+    def flaky():
+        attempts.append(None)
+        if len(attempts) < 3:
+            raise IOError('Timed out')
+        return 'ok'
+
+    assert 'ok' == loader.retry(flaky, retries=2)
+    del attempts[:]
+    with pytest.raises(IOError):
+        loader.retry(flaky, retries=1)
+
+
+@pytest.mark.unit
+def test_load_chunked(sample_yaml, no_sleep):
+    # type: (Callable[[str], str], None) -> None
+    """Chunks are committed separately; failed chunks are retried."""
+    graph = FakeGraph(failures=1)
+    checkpoint = loader.load(sample_yaml('nodes-and-relationships'), graph,
+                             chunk_size=5)
+
+    assert checkpoint.done
+    assert 21 == checkpoint.written
+    assert 5 == graph.commits
+    assert 9 == len(graph.rows('CREATE (n'))
+    assert 12 == len(graph.rows('CREATE (head)'))
+
+
+@pytest.mark.unit
+def test_load_resume(sample_yaml, tmpdir):
+    # type: (Callable[[str], str], object) -> None
+    """Resuming skips written items and reuses their anchors' ids."""
+    path = str(tmpdir.join('load.checkpoint'))
+    graph = FakeGraph()
+    checkpoint = loader.Checkpoint(path, item=3,
+                                   anchors={'node-movie-matrix': 100,
+                                            'node-person-lana': 101})
+    loader.load(sample_yaml('relationships'), graph, chunk_size=2,
+                checkpoint=checkpoint)
+
+    assert ['Keanu Reeves'] == [row['properties']['name']
+                                for row in graph.rows('CREATE (n')]
+    assert [100] == [row['tail'] for row in graph.rows('CREATE (head)')]
+    assert loader.Checkpoint.read(path).done
+
+
+@pytest.mark.unit
+def test_load_dedupe():
+    # type: () -> None
+    """Duplicate rels are dropped, even across chunks."""
+    text = dedent("""\
+        - &keanu !gryaml.node [{labels: [Person]}]
+        - &matrix !gryaml.node [{labels: [Movie]}]
+        - !gryaml.rel [*keanu, ACTED_IN, *matrix, {roles: [Neo]}]
+        - !gryaml.rel [*keanu, ACTED_IN, *matrix, {roles: [Neo]}]
+        - !gryaml.rel [*keanu, ACTED_IN, *matrix, {roles: [Thomas]}]
+        - !gryaml.rel [*matrix, ACTED_IN, *keanu, {roles: [Neo]}]
+        - !gryaml.rel [*keanu, ACTED_IN, *matrix, {roles: [Neo]}]
+        - !gryaml.rel [*keanu, ACTED_IN, !gryaml.node [], {roles: [Neo]}]
+        - !gryaml.rel [*keanu, ACTED_IN, !gryaml.node [], {roles: [Neo]}]
+    """)
+    graph = backends.MemoryBackend()
+    checkpoint = loader.load(text, graph, chunk_size=3, dedupe=True)
+
+    assert 2 == checkpoint.dropped
+    assert 5 == len(graph.rels)
+    assert 9 == checkpoint.written
+
+
+@pytest.mark.unit
+def test_load_reset(sample_yaml):
+    # type: (Callable[[str], str]) -> None
+    """Resetting a load deletes just its entities."""
+    graph = backends.MemoryBackend()
+    keanu = graph.create_node(['Person'], {'name': 'Keanu Reeves'})
+    text = sample_yaml('relationships')
+    loader.load(text, graph, load_id='first')
+    loader.load(u'- !gryaml.rel [!gryaml.ref keanu, KNOWS, !gryaml.ref keanu]',
+                graph, load_id='first',
+                checkpoint=loader.Checkpoint(anchors={'keanu': keanu.id}))
+    loader.load(text, graph, load_id='second')
+    assert 7 == len(graph.nodes)
+    assert all(u'_GryamlLoad' in n.labels
+               for n in graph.nodes.values() if n is not keanu)
+
+    assert 3 == loader.reset(graph, 'first', batch_size=2)
+    assert 4 == len(graph.nodes)
+    assert 3 == len(graph.rels)
+    assert 1 == loader.reset(graph, 'first', rels=True)
+    assert 2 == len(graph.rels)
+
+
+@pytest.mark.unit
+def test_load_rolled_back(sample_yaml):
+    # type: (Callable[[str], str]) -> None
+    """Loads in a rolled back transaction leave nothing behind."""
+    graph = backends.MemoryBackend()
+    with loader.rolled_back(graph) as tx:
+        checkpoint = loader.load(sample_yaml('relationships'), graph,
+                                 chunk_size=2, transaction=tx)
+        assert 5 == checkpoint.written
+        assert 3 == len(graph.nodes)
+        with pytest.raises(ValueError):
+            tx.append(u'MATCH (n) RETURN count(n)', {})
+    assert not graph.nodes
+    assert not graph.rels
+
+
+@pytest.mark.unit
+def test_load_registry(tmpdir):
+    # type: (Any) -> None
+    """Refs resolve against nodes registered by earlier files & documents."""
+    customers = dedent("""\
+        - &alice !gryaml.node [{labels: [Customer]}, {properties: {n: 1}}]
+        ---
+        - &bob !gryaml.node [{labels: [Customer]}, {properties: {n: 2}}]
+        - !gryaml.rel [!gryaml.ref alice, KNOWS, *bob]
+    """)
+    orders = dedent("""\
+        - !gryaml.rel
+          - !gryaml.ref bob
+          - PLACED
+          - &order !gryaml.node [{labels: [Order]}]
+        ---
+        - !gryaml.rel [!gryaml.ref alice, PLACED, !gryaml.ref order]
+    """)
+    graph = backends.MemoryBackend()
+    path = str(tmpdir.join('registry.json'))
+    registry = loader.Registry(path)
+
+    loader.load(customers, graph, chunk_size=1, registry=registry)
+    loader.load(orders, graph, registry=loader.Registry.read(path))
+
+    assert 3 == len(graph.nodes)
+    names = {id_: n.labels[0] + str(n.properties.get('n', ''))
+             for id_, n in graph.nodes.items()}
+    assert {('Customer1', 'KNOWS', 'Customer2'),
+            ('Customer2', 'PLACED', 'Order'),
+            ('Customer1', 'PLACED', 'Order')} \
+        == {(names[r.head], r.type, names[r.tail])
+            for r in graph.rels.values()}
+    assert 3 == len(loader.Registry.read(path))
+
+    with pytest.raises(KeyError):
+        loader.load(u'- !gryaml.rel [!gryaml.ref carol, KNOWS,'
+                    u' !gryaml.ref bob]', graph, registry=registry)
+
+
+@pytest.mark.unit
+def test_registry_collision(tmpdir):
+    # type: (Any) -> None
+    """An anchor already registered by another file or document raises."""
+    customer = u'- &a !gryaml.node [{labels: [Customer]}]\n'
+    product = u'- &a !gryaml.node [{labels: [Product]}]\n'
+    graph = backends.MemoryBackend()
+    path = str(tmpdir.join('registry.json'))
+    registry = loader.Registry(path)
+
+    loader.load(customer, graph, registry=registry, source='customers.yaml')
+    with pytest.raises(ValueError):
+        loader.load(product, graph, registry=loader.Registry.read(path),
+                    source='products.yaml')
+    with pytest.raises(ValueError):
+        loader.load(customer + u'---\n' + product, graph, registry=registry,
+                    source='customers.yaml')
+    assert [['Customer'], ['Customer']] \
+        == [n.labels for n in graph.nodes.values()]
+
+    with open(path, 'w') as fp:
+        json.dump({'a': 5}, fp)
+    assert 5 == loader.Registry.read(path)['a']
+
+
+@pytest.mark.unit
+def test_registry_stale(tmpdir):
+    # type: (Any) -> None
+    """Registries keep no ids of rolled back nodes, and stale ids fail."""
+    graph = backends.MemoryBackend()
+    path = str(tmpdir.join('registry.json'))
+    with loader.rolled_back(graph) as tx:
+        loader.load(u'- &a !gryaml.node []\n', graph, transaction=tx,
+                    registry=loader.Registry(path))
+    assert not tmpdir.join('registry.json').exists()
+
+    loader.load(u'- &a !gryaml.node []\n', graph,
+                registry=loader.Registry(path))
+    graph.delete_all()
+    with pytest.raises(backends.MissingEndpointError):
+        loader.load(u'- !gryaml.rel [!gryaml.ref a, KNOWS, !gryaml.ref a]\n',
+                    graph, registry=loader.Registry.read(path))
+
+
+@pytest.mark.unit
+def test_load_select():
+    # type: () -> None
+    """Only selected entities are built, and rels between selected nodes."""
+    text = dedent("""\
+        - &keanu !gryaml.node [{labels: [Person]}, {properties: {n: 1}}]
+        - &matrix !gryaml.node
+          - properties: {title: !unknown The Matrix}
+          - labels: [Movie]
+        - !gryaml.rel [*keanu, ACTED_IN, *matrix]
+        - !gryaml.rel
+          - *keanu
+          - KNOWS
+          - !gryaml.node [{labels: [Person]}, {properties: {n: 2}}]
+          - {since: !unknown 1999}
+        - !gryaml.rel
+          - !gryaml.node [{labels: [Movie]}, {properties: {n: !unknown 3}}]
+          - FEATURES
+          - *keanu
+        - !gryaml.rel [*keanu, LIKES, !gryaml.node [{labels: [Person]}]]
+    """)
+
+    def loaded(stream, select, format='yaml'):
+        graph = backends.MemoryBackend()
+        loader.load(stream, graph, chunk_size=2, select=select,
+                    format=format)
+        return (sorted(n.labels[0] for n in graph.nodes.values()),
+                sorted(r.type for r in graph.rels.values()))
+
+    assert (['Person', 'Person', 'Person'], ['LIKES']) == loaded(
+        text, loader.Selection(labels=['Person'], exclude_rel_types=['KNOWS']))
+
+    clean = text.replace('!unknown ', '')
+    select = loader.Selection(exclude_labels=['Movie'],
+                              rel_types=['ACTED_IN', 'KNOWS', 'FEATURES'])
+    expected = (['Person', 'Person', 'Person'], ['KNOWS'])
+    assert expected == loaded(clean, select)
+    assert expected == loaded(list(loader.iter_chunks(clean)), select,
+                              'chunks')
+
+    # The first non-empty labels map counts, as when loading unselected
+    assert (['Person'], []) == loaded(
+        u'- !gryaml.node [{labels: []}, {labels: [Person]}]',
+        loader.Selection(labels=['Person']))
+
+
+REPEATED = dedent("""\
+    - !gryaml.repeat
+      count: 5
+      start: 1
+      anchor: user-{i}
+      node: !gryaml.node
+        - labels: [User]
+        - properties: {id: '{i}', name: 'user {i}', group: '{i%2}'}
+    - !gryaml.repeat
+      count: 4
+      start: 1
+      rel: [!gryaml.ref 'user-{i}', FOLLOWS, !gryaml.ref 'user-{i+1}',
+            {rank: '{i*10}'}]
+""")
+
+
+@pytest.mark.unit
+def test_load_repeat():
+    # type: () -> None
+    """Templates are expanded with their index, in chunks of expansions."""
+    chunks = list(loader.iter_chunks(REPEATED, chunk_size=2))
+    assert [2, 2, 1, 0, 0] == [len(chunk.nodes) for chunk in chunks]
+    assert [0, 0, 1, 2, 1] == [len(chunk.rels) for chunk in chunks]
+    assert [(0, 2), (0, 4), (1, 1), (1, 3), (2, 0)] == [
+        (chunk.item, chunk.offset) for chunk in chunks]
+    assert NodeSpec('user-3', ['User'], {'id': 3, 'name': 'user 3',
+                                         'group': 1}) == chunks[1].nodes[0]
+    assert ('user-4', 'FOLLOWS', 'user-5', {'rank': 40}) \
+        == chunks[-1].rels[-1][1:]
+
+    graph = backends.MemoryBackend()
+    assert 9 == loader.load(REPEATED, graph, chunk_size=3).written
+    names = {node_id: node.properties['name']
+             for node_id, node in graph.nodes.items()}
+    assert [('user 1', 'user 2'), ('user 2', 'user 3'),
+            ('user 3', 'user 4'), ('user 4', 'user 5')] == sorted(
+                (names[rel.head], names[rel.tail])
+                for rel in graph.rels.values())
+
+
+@pytest.mark.unit
+def test_load_repeat_resume(tmpdir):
+    # type: (Any) -> None
+    """Resuming within a repeat skips the expansions already written."""
+    path = str(tmpdir.join('load.checkpoint'))
+    graph = backends.MemoryBackend()
+    loader.load(REPEATED, graph, keep_anchors=True)
+    ids = {node.properties[loader.KEY]: node_id
+           for node_id, node in graph.nodes.items()}
+    graph.rels.clear()
+
+    loader.load(REPEATED, graph, chunk_size=3, checkpoint=loader.Checkpoint(
+        path, item=1, anchors=ids, offset=3))
+    assert [('user-4', 'user-5')] == [
+        (graph.nodes[rel.head].properties[loader.KEY],
+         graph.nodes[rel.tail].properties[loader.KEY])
+        for rel in graph.rels.values()]
+    assert 5 == len(graph.nodes)
+    assert 0 == loader.Checkpoint.read(path).offset
+
+
+@pytest.mark.unit
+def test_load_repeat_resume_endpoints(tmpdir):
+    # type: (Any) -> None
+    """Resuming a repeat counts its expansions, not anchored endpoints
+    written before them, which are not built again.
+    """
+    text = dedent("""\
+        - !gryaml.repeat
+          count: 5
+          rel: [&admin !gryaml.node [{labels: [Admin]}], MANAGES,
+                &team !gryaml.node [{labels: [Team]}], {rank: '{i}'}]
+    """)
+    path = str(tmpdir.join('load.checkpoint'))
+    graph = backends.MemoryBackend()
+    write_chunk = graph.write_chunk
+    calls = []
+
+    def failing_write_chunk(*args):
+        calls.append(args)
+        if len(calls) == 2:
+            raise ValueError('Lost connection')
+        return write_chunk(*args)
+
+    graph.write_chunk = failing_write_chunk
+    with pytest.raises(ValueError):
+        loader.load(text, graph, chunk_size=3,
+                    checkpoint=loader.Checkpoint(path))
+    assert 1 == loader.Checkpoint.read(path).offset
+
+    loader.load(text, graph, chunk_size=3,
+                checkpoint=loader.Checkpoint.read(path))
+    assert 2 == len(graph.nodes)
+    assert [0, 1, 2, 3, 4] == sorted(rel.properties['rank']
+                                     for rel in graph.rels.values())
+
+
+@pytest.mark.unit
+def test_load_repeat_select():
+    # type: () -> None
+    """Unselected templates drop their expansions and rels to them."""
+    graph = backends.MemoryBackend()
+    loader.load(REPEATED + dedent("""\
+        - &admin !gryaml.node [{labels: [Admin]}]
+        - !gryaml.repeat
+          count: 2
+          rel: [*admin, MANAGES, !gryaml.ref 'user-{i+1}']
+    """), graph, select=loader.Selection(labels=['Admin']))
+    assert [['Admin']] == [node.labels for node in graph.nodes.values()]
+    assert not graph.rels
+
+
+@pytest.mark.unit
+@pytest.mark.parametrize('text', [
+    '!gryaml.repeat {node: !gryaml.node []}',
+    '!gryaml.repeat {count: -1, node: !gryaml.node []}',
+    '!gryaml.repeat {count: 1, times: 2, node: !gryaml.node []}',
+    '!gryaml.repeat {count: 1}',
+    '!gryaml.repeat {count: 1, node: [], rel: []}',
+    '!gryaml.repeat {count: 1, anchor: a, rel: [!gryaml.ref a, R,'
+    ' !gryaml.ref b]}',
+    '!gryaml.repeat {count: 1, rel: [!gryaml.node [], R, !gryaml.ref b]}',
+    '!gryaml.repeat {count: 2, anchor: user, node: !gryaml.node []}',
+    '!gryaml.repeat [1]',
+])
+def test_load_repeat_invalid(text):
+    # type: (str) -> None
+    """Malformed repeats are refused."""
+    with pytest.raises(ConstructorError):
+        list(loader.iter_chunks('- ' + text))
+
+
+EDGES = dedent("""\
+    - &a !gryaml.node [{labels: [User]}, {properties: {name: a}}]
+    - &b !gryaml.node [{labels: [User]}, {properties: {name: b}}]
+    - !gryaml.edges
+      type: FOLLOWS
+      keys: [since, muted]
+      rows:
+      - [*a, *b, 2019]
+      - [*b, *a, null, true]
+      - [*a, &c !gryaml.node [{labels: [Bot]}, {properties: {name: c}}]]
+      - [*b, !gryaml.ref d]
+""")
+
+
+@pytest.mark.unit
+def test_load_edges():
+    # type: () -> None
+    """Rows of a table are relationships, split between chunks."""
+    chunks = list(loader.iter_chunks(EDGES, chunk_size=3))
+    assert [(2, 1), (2, 3), (3, 0)] == [(chunk.item, chunk.offset)
+                                        for chunk in chunks]
+    rels = [rel[1:] for chunk in chunks for rel in chunk.rels]
+    assert [('a', 'FOLLOWS', 'b', {'since': 2019}),
+            ('b', 'FOLLOWS', 'a', {'muted': True}),
+            ('a', 'FOLLOWS', 'c', {}),
+            ('b', 'FOLLOWS', 'd', {})] == rels
+
+    graph = backends.MemoryBackend()
+    loader.load(EDGES.replace('  - [*b, !gryaml.ref d]\n', ''), graph,
+                chunk_size=2, select=loader.Selection(exclude_labels=['Bot']))
+    assert 2 == len(graph.nodes)
+    assert [{'since': 2019}, {'muted': True}] \
+        == [rel.properties for rel in graph.rels.values()]
+
+
+@pytest.mark.unit
+def test_load_edges_resume(tmpdir):
+    # type: (Any) -> None
+    """Resuming a table counts its rows, not inline anchored endpoints
+    written before them, which are not built again.
+    """
+    text = dedent("""\
+        - !gryaml.edges
+          type: FOLLOWS
+          keys: [rank]
+          rows:
+          - [&a !gryaml.node [{labels: [User]}],
+             &b !gryaml.node [{labels: [User]}], 0]
+          - [*a, &c !gryaml.node [{labels: [User]}], 1]
+          - [*b, *c, 2]
+          - [*c, *a, 3]
+          - [*c, *b, 4]
+    """)
+    path = str(tmpdir.join('load.checkpoint'))
+    graph = backends.MemoryBackend()
+    write_chunk = graph.write_chunk
+    calls = []
+
+    def failing_write_chunk(*args):
+        calls.append(args)
+        if len(calls) == 2:
+            raise ValueError('Lost connection')
+        return write_chunk(*args)
+
+    graph.write_chunk = failing_write_chunk
+    with pytest.raises(ValueError):
+        loader.load(text, graph, chunk_size=3,
+                    checkpoint=loader.Checkpoint(path))
+    assert 1 == loader.Checkpoint.read(path).offset
+
+    loader.load(text, graph, chunk_size=3,
+                checkpoint=loader.Checkpoint.read(path))
+    assert 3 == len(graph.nodes)
+    assert [0, 1, 2, 3, 4] == sorted(rel.properties['rank']
+                                     for rel in graph.rels.values())
+
+
+@pytest.mark.unit
+@pytest.mark.parametrize('text', [
+    '!gryaml.edges {rows: []}',
+    '!gryaml.edges {type: R, rows: [], weight: 1}',
+    '!gryaml.edges {type: R, rows: {}}',
+    '!gryaml.edges {type: R, rows: [[!gryaml.ref a]]}',
+    '!gryaml.edges {type: R, keys: [w], rows: [[!gryaml.ref a, R, 1, 2]]}',
+    '!gryaml.edges {type: R, rows: [[!gryaml.node [], !gryaml.ref a]]}',
+    '!gryaml.edges [R]',
+])
+def test_load_edges_invalid(text):
+    # type: (str) -> None
+    """Malformed tables are refused."""
+    with pytest.raises(ConstructorError):
+        list(loader.iter_chunks('- ' + text))
+
+
+PATH = dedent("""\
+    - &mon !gryaml.node [{labels: [Day]}, {properties: {name: Mon}}]
+    - !gryaml.path
+      - *mon
+      - NEXT
+      - !gryaml.node [{labels: [Day]}, {properties: {name: Tue}}]
+      - [NEXT, {gap: 1}]
+      - &wed !gryaml.node [{labels: [Day]}, {properties: {name: Wed}}]
+      - AFTER
+      - *mon
+      - NEXT
+      - !gryaml.ref sun
+""")
+
+
+@pytest.mark.unit
+def test_load_path():
+    # type: () -> None
+    """A path is its nodes & the hops between them, in one chunk."""
+    chunks = list(loader.iter_chunks(PATH, chunk_size=1))
+    assert [(1, 0, 0), (2, 4, 0)] == [
+        (len(chunk.nodes), len(chunk.rels), chunk.offset) for chunk in chunks]
+    assert [('mon', 'NEXT', {}), ('wed', 'AFTER', {}),
+            ('mon', 'NEXT', {})] \
+        == [(rel.head, rel.type, rel.properties)
+            for rel in chunks[1].rels if not isinstance(rel.head, yaml.Node)]
+    assert {'gap': 1} == chunks[1].rels[1].properties
+    assert 'sun' == chunks[1].rels[3].tail
+
+    graph = backends.MemoryBackend()
+    loader.load(PATH.replace('!gryaml.ref sun', '*wed'), graph,
+                select=loader.Selection(rel_types=['NEXT']))
+    names = {id_: node.properties['name']
+             for id_, node in graph.nodes.items()}
+    assert [('Mon', 'Tue'), ('Tue', 'Wed'), ('Mon', 'Wed')] \
+        == [(names[rel.head], names[rel.tail])
+            for rel in graph.rels.values()]
+
+
+@pytest.mark.unit
+@pytest.mark.parametrize('text', [
+    '!gryaml.path [!gryaml.node [], R]',
+    '!gryaml.path [!gryaml.node [], R, !gryaml.node [], R]',
+    '!gryaml.path [!gryaml.node [], [R], !gryaml.node []]',
+    '!gryaml.path [!gryaml.node [], {R: 1}, !gryaml.node []]',
+    '!gryaml.path [!gryaml.node [], R, Keanu]',
+    '!gryaml.path {R: 1}',
+])
+def test_load_path_invalid(text):
+    # type: (str) -> None
+    """Malformed paths are refused."""
+    with pytest.raises(ConstructorError):
+        list(loader.iter_chunks('- ' + text))
+
+
+@pytest.mark.integration
+def test_load(graphdb, sample_yaml):
+    # type: (Graph, Callable[[str], str]) -> None
+    """Load a sample into the database in chunks."""
+    checkpoint = loader.load(sample_yaml('nodes-and-relationships'), graphdb,
+                             chunk_size=4)
+    assert 21 == checkpoint.written
+    assert 9 == len(graphdb.cypher.execute('MATCH (n) RETURN n'))
+    assert 4 == len(graphdb.cypher.execute('MATCH (p)-[r]->(m)'
+                                           ' WHERE p.name = "Lana Wachowski"'
+                                           ' RETURN r'))
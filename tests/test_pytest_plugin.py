@@ -0,0 +1,154 @@
+"""Tests for :mod:`gryaml.pytest_plugin`."""
+from __future__ import print_function, absolute_import
+
+from textwrap import dedent
+
+import pytest
+
+from gryaml import _py2neo, backends, pytest_plugin
+
+try:
+    from typing import Any, List  # noqa: F401
+except ImportError:
+    """Module :mod:`typing` not required for Py27-compatible type comments."""
+
+pytest_plugins = 'pytester'
+
+MOVIES = dedent("""\
+    - &keanu !gryaml.node
+      - labels: [Person]
+      - properties: {name: Keanu Reeves}
+    - &matrix !gryaml.node
+      - labels: [Movie]
+      - properties: {title: The Matrix}
+    - !gryaml.rel [*keanu, ACTED_IN, *matrix]
+""")
+
+TESTS = dedent("""\
+    from gryaml import backends
+
+    def test_load(gryaml_graph, gryaml_load):
+        assert isinstance(gryaml_graph, backends.MemoryBackend)
+        load_id = gryaml_load('movies')
+        assert load_id.startswith('{worker}:')
+        assert 2 == len(gryaml_graph.nodes)
+        assert 1 == len(gryaml_graph.rels)
+
+    def test_reset(gryaml_graph, gryaml_load):
+        assert not gryaml_graph.nodes
+        gryaml_load('movies')
+        gryaml_load('movies')
+        assert 4 == len(gryaml_graph.nodes)
+""")
+
+
+def plugin_args(config):
+    # type: (Any) -> List[str]
+    """Arguments enabling the plugin, unless installed and so enabled."""
+    if config.pluginmanager.has_plugin('gryaml'):
+        return []
+    return ['-p', 'gryaml.pytest_plugin']
+
+
+@pytest.mark.unit
+def test_worker_uri():
+    # type: () -> None
+    """Workers' databases are named by id or index."""
+    assert 'bolt://localhost:7617' == pytest_plugin.worker_uri(
+        'bolt://localhost:76{index}7', 'gw1')
+    assert 'http://db/gw0' == pytest_plugin.worker_uri('http://db/{worker}',
+                                                       'gw0')
+    assert 'bolt://db' == pytest_plugin.worker_uri('bolt://db', 'gw0')
+
+
+@pytest.mark.unit
+def test_shared_database(monkeypatch):
+    # type: (Any) -> None
+    """Workers cannot share a database, unless in memory."""
+    monkeypatch.setattr(_py2neo, 'graphdb', _py2neo.graphdb)
+    monkeypatch.setenv('PYTEST_XDIST_WORKER', 'gw1')
+    with pytest.raises(pytest.UsageError):
+        pytest_plugin.connect_worker('bolt://db', backends.BoltBackend.name)
+    assert isinstance(pytest_plugin.connect_worker(
+        'bolt://db', backends.MemoryBackend.name), backends.MemoryBackend)
+
+
+@pytest.mark.unit
+def test_fixtures(testdir, pytestconfig):
+    # type: (Any, Any) -> None
+    """Fixtures are loaded, reset after each test and timed."""
+    testdir.mkdir('fixtures').join('movies.yaml').write(MOVIES)
+    testdir.makeini('[pytest]\ngryaml_fixtures = fixtures\n')
+    testdir.makepyfile(TESTS.replace('{worker}', 'master'))
+
+    result = testdir.runpytest(*plugin_args(pytestconfig) + [
+        '--gryaml-backend', 'memory'])
+
+    result.assert_outcomes(passed=2)
+    result.stdout.fnmatch_lines([
+        'gryaml: memory backend, database per worker',
+        '*gryaml fixtures*',
+        'total: 3 loads in *s, 3 resets in *s, 1 parsed in *s',
+        'movies: 3 loads in *s, 3 resets in *s, 1 parsed in *s',
+    ])
+
+    result = testdir.runpytest(*plugin_args(pytestconfig) + [
+        '--gryaml-backend', 'memory'])
+    result.stdout.fnmatch_lines(['gryaml fixtures, last run: 3 loads in *s,'
+                                 ' 3 resets in *s, 1 parsed in *s'])
+
+
+@pytest.mark.unit
+def test_worker_namespace(testdir, pytestconfig, monkeypatch):
+    # type: (Any, Any, Any) -> None
+    """Load ids start with the worker's id."""
+    monkeypatch.setenv('PYTEST_XDIST_WORKER', 'gw3')
+    testdir.mkdir('tests').mkdir('samples').join('movies.yaml').write(MOVIES)
+    testdir.makeini('[pytest]\n')
+    testdir.makepyfile(TESTS.replace('{worker}', 'gw3'))
+
+    result = testdir.runpytest(*plugin_args(pytestconfig) + [
+        '--gryaml-backend', 'memory'])
+
+    result.assert_outcomes(passed=2)
+
+
+@pytest.mark.unit
+def test_session_index(testdir, pytestconfig, monkeypatch):
+    # type: (Any, Any, Any) -> None
+    """The index on load ids is created once per session, not per load."""
+    indexed = []  # type: List[Any]
+    monkeypatch.setattr(backends.MemoryBackend, 'create_load_index',
+                        lambda self: indexed.append(self))
+    testdir.mkdir('tests').mkdir('samples').join('movies.yaml').write(MOVIES)
+    testdir.makeini('[pytest]\n')
+    testdir.makepyfile(TESTS.replace('{worker}', 'master'))
+
+    result = testdir.runpytest(*plugin_args(pytestconfig) + [
+        '--gryaml-backend', 'memory'])
+
+    result.assert_outcomes(passed=2)
+    assert 1 == len(indexed)
+
+
+@pytest.mark.unit
+def test_unreachable(testdir, pytestconfig, monkeypatch):
+    # type: (Any, Any, Any) -> None
+    """Tests fail if the database cannot be reached, or are skipped if
+    asked.
+    """
+    def check(self):
+        raise IOError('Connection refused')
+
+    monkeypatch.setattr(backends.MemoryBackend, 'check', check)
+    testdir.makeini('[pytest]\n')
+    testdir.makepyfile(TESTS.replace('{worker}', 'master'))
+
+    result = testdir.runpytest(*plugin_args(pytestconfig) + [
+        '--gryaml-backend', 'memory'])
+    result.assert_outcomes(errors=2)
+
+    result = testdir.runpytest(*plugin_args(pytestconfig) + [
+        '--gryaml-backend', 'memory', '--gryaml-skip-unreachable', '-rs'])
+    result.assert_outcomes(skipped=2)
+    result.stdout.fnmatch_lines(['*Cannot reach Neo4j at *Connection refused'])
@@ -0,0 +1,162 @@
+"""Tests for :mod:`gryaml.ruamel_yaml`."""
+from __future__ import print_function, absolute_import
+
+import io
+from textwrap import dedent
+
+import pytest
+
+import gryaml
+from gryaml import backends, loader
+
+try:
+    from typing import Callable  # noqa: F401
+except ImportError:
+    """Module :mod:`typing` not required for Py27-compatible type comments."""
+
+pytest.importorskip('ruamel.yaml')
+
+from gryaml import ruamel_yaml  # noqa: E402
+
+
+@pytest.mark.unit
+def test_engine_load(sample_yaml, monkeypatch):
+    # type: (Callable[[str], str], object) -> None
+    """Nodes & rels are constructed by the engine's loader."""
+    graph = backends.MemoryBackend()
+    monkeypatch.setattr(gryaml._py2neo, 'graphdb', graph)
+
+    result = ruamel_yaml.engine().load(sample_yaml('relationships'))
+
+    assert 5 == len(result)
+    assert 3 == len(graph.nodes)
+    assert [('DIRECTED', 'Lana Wachowski'), ('ACTED_IN', 'Keanu Reeves')] \
+        == [(r.type, graph.nodes[r.head].properties['name'])
+            for r in graph.rels.values()]
+
+
+@pytest.mark.unit
+def test_engine_edges(monkeypatch):
+    # type: (object) -> None
+    """Edge tables are constructed as relationships, together."""
+    graph = backends.MemoryBackend()
+    monkeypatch.setattr(gryaml._py2neo, 'graphdb', graph)
+    text = dedent("""\
+        - &a !gryaml.node [{properties: {name: a}}]
+        - &b !gryaml.node [{properties: {name: b}}]
+        - !gryaml.edges
+          type: KNOWS
+          keys: [since, weight]
+          rows:
+          - [*a, *b, 2019]
+          - [*b, *a, null, 0.5]
+    """)
+
+    result = ruamel_yaml.engine().load(text)
+    assert 2 == len(result[2])
+    assert [{'since': 2019}, {'weight': 0.5}] \
+        == [rel.properties for rel in result[2]]
+
+    result = ruamel_yaml.engine(simple=True).load(text)
+    assert [[result[0], 'KNOWS', result[1], {'since': 2019}],
+            [result[1], 'KNOWS', result[0], {'weight': 0.5}]] == result[2]
+
+    with pytest.raises(Exception, match='up to 2 values'):
+        ruamel_yaml.engine(simple=True).load(
+            text.replace('0.5]', '0.5, 1]'))
+
+
+@pytest.mark.unit
+def test_engine_path(monkeypatch):
+    # type: (object) -> None
+    """Paths are constructed as their relationships, in order."""
+    graph = backends.MemoryBackend()
+    monkeypatch.setattr(gryaml._py2neo, 'graphdb', graph)
+    text = dedent("""\
+        - !gryaml.path
+          - &mon !gryaml.node [{properties: {name: Mon}}]
+          - NEXT
+          - !gryaml.node [{properties: {name: Tue}}]
+          - [AFTER, {gap: 1}]
+          - *mon
+    """)
+
+    result = ruamel_yaml.engine().load(text)
+    assert [('NEXT', 'Mon', 'Tue', {}), ('AFTER', 'Tue', 'Mon', {'gap': 1})] \
+        == [(rel.type, graph.nodes[rel.head].properties['name'],
+             graph.nodes[rel.tail].properties['name'], rel.properties)
+            for rel in result[0]]
+
+    result = ruamel_yaml.engine(simple=True).load(text)
+    assert ['NEXT', ['AFTER', {'gap': 1}]] == result[0][1::2]
+
+
+@pytest.mark.unit
+@pytest.mark.parametrize('simple', [False, True])
+def test_engine_repeat(simple):
+    # type: (bool) -> None
+    """Repeats are refused, as only the chunked loader expands them."""
+    with pytest.raises(Exception, match='expanded only by'):
+        ruamel_yaml.engine(simple=simple).load(
+            '- !gryaml.repeat {count: 2, node: !gryaml.node []}\n')
+
+
+@pytest.mark.unit
+def test_engine_simple(sample_yaml):
+    # type: (Callable[[str], str]) -> None
+    """Simple engines construct nodes & rels as native lists."""
+    result = ruamel_yaml.engine(simple=True).load(sample_yaml('relationships'))
+    assert [{'labels': ['Movie']},
+            {'properties': {'title': 'The Matrix', 'released': '1999'}}] \
+        == result[0]
+
+
+@pytest.mark.unit
+def test_engine_round_trip():
+    # type: () -> None
+    """Round-trip engines keep tags & comments through an edit."""
+    text = dedent("""\
+        # Cast
+        - &keanu !gryaml.node
+          - labels: [Person]  # The One
+          - properties: {name: Keanu Reeves}
+        - !gryaml.rel [*keanu, KNOWS, *keanu]
+    """)
+    engine = ruamel_yaml.engine('rt', simple=True)
+    data = engine.load(text)
+    data[0][1]['properties']['born'] = 1964
+    out = io.StringIO()
+    engine.dump(data, out)
+
+    assert text.replace('Reeves}', 'Reeves, born: 1964}') == out.getvalue()
+
+
+@pytest.mark.unit
+@pytest.mark.parametrize('pure', [False, True])
+def test_event_parser(sample_yaml, pure):
+    # type: (Callable[[str], str], bool) -> None
+    """The chunked loader gets the same chunks whichever engine parses."""
+    stream = sample_yaml('nodes-and-relationships')
+
+    def parser_class(stream):
+        return ruamel_yaml.EventParser(stream, pure=pure)
+
+    def chunks(parser_class):
+        return [(chunk.document, chunk.item,
+                 [(n.key, n.labels, n.properties) for n in chunk.nodes],
+                 [r[1:] for r in chunk.rels])
+                for chunk in loader.iter_chunks(stream, chunk_size=4,
+                                                parser_class=parser_class)]
+
+    assert chunks(loader.EventParser) == chunks(parser_class)
+    assert loader.count_aliases(stream) \
+        == loader.count_aliases(stream, parser_class)
+
+
+@pytest.mark.unit
+def test_event_parser_lookup():
+    # type: () -> None
+    """Parsers are looked up by engine name."""
+    assert ruamel_yaml.EventParser is loader.event_parser('ruamel')
+    with pytest.raises(ValueError):
+        loader.event_parser('yaml-cpp')
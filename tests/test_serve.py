@@ -0,0 +1,184 @@
+"""Tests for :mod:`gryaml.serve`."""
+from __future__ import print_function, absolute_import
+
+import json
+import socket
+import threading
+from textwrap import dedent
+
+import pytest
+
+from gryaml import backends, serve
+
+try:
+    from http.client import HTTPConnection
+except ImportError:  # Python 2
+    from httplib import HTTPConnection  # type: ignore
+
+try:
+    from typing import Any, Iterator, Tuple  # noqa: F401
+except ImportError:
+    """Module :mod:`typing` not required for Py27-compatible type comments."""
+
+FIXTURE = dedent("""\
+    - &alice !gryaml.node [{labels: [Person]}, {properties: {name: Alice}}]
+    - &bob !gryaml.node [{labels: [Person]}, {properties: {name: Bob}}]
+    - !gryaml.rel [*alice, KNOWS, *bob]
+""").encode('utf-8')
+
+
+class UnixHTTPConnection(HTTPConnection):
+    """HTTP connection over a Unix socket."""
+
+    def __init__(self, path):
+        # type: (str) -> None
+        HTTPConnection.__init__(self, 'localhost')
+        self.path = path
+
+    def connect(self):
+        # type: () -> None
+        self.sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        self.sock.connect(self.path)
+
+
+def request(connection, method, path, body=None):
+    # type: (HTTPConnection, str, str, Any) -> Tuple[int, Any]
+    """Make a request, returning the status & JSON body."""
+    connection.request(method, path, body)
+    response = connection.getresponse()
+    status, data = response.status, json.loads(response.read().decode())
+    connection.close()
+    return status, data
+
+
+@pytest.fixture
+def graph():
+    # type: () -> backends.MemoryBackend
+    """A memory graph shared by all connections."""
+    return backends.MemoryBackend()
+
+
+@pytest.fixture
+def server(graph):
+    # type: (backends.MemoryBackend) -> Iterator[Any]
+    """A service on an ephemeral port, over `graph`."""
+    service = serve.Service(serve.ConnectionPool(lambda: graph, 2), 2)
+    server = serve.make_server(service, ('127.0.0.1', 0))
+    thread = threading.Thread(target=server.serve_forever)
+    thread.start()
+    yield server
+    server.shutdown()
+    server.server_close()
+    service.close()
+    thread.join()
+
+
+def connect(server):
+    # type: (Any) -> HTTPConnection
+    """A connection to `server`."""
+    return HTTPConnection(*server.server_address)
+
+
+@pytest.mark.unit
+def test_load_and_reset(server, graph):
+    # type: (Any, backends.MemoryBackend) -> None
+    """Posted YAML is loaded, and can be reset by load id."""
+    assert (200, {'written': 3, 'dropped': 0}) == request(
+        connect(server), 'POST', '/load?load_id=t1&chunk_size=2', FIXTURE)
+    assert 2 == len(graph.nodes)
+    assert 1 == len(graph.rels)
+
+    assert (200, {'deleted': 2}) == request(connect(server), 'POST',
+                                            '/reset?load_id=t1')
+    assert not graph.nodes
+
+    status, metrics = request(connect(server), 'GET', '/metrics')
+    assert 200 == status
+    assert {'loads': 1, 'written': 3, 'failed': 0, 'rejected': 0,
+            'active': 0, 'queued': 0, 'workers': 2} == {
+                key: metrics[key] for key in ('loads', 'written', 'failed',
+                                              'rejected', 'active', 'queued',
+                                              'workers')}
+
+
+@pytest.mark.unit
+def test_bad_requests(server, graph):
+    # type: (Any, backends.MemoryBackend) -> None
+    """Invalid YAML & parameters are refused without loading."""
+    status, body = request(connect(server), 'POST', '/load',
+                           b'- !gryaml.node [{labels: Person}]\n')
+    assert 422 == status
+    assert 1 == len(body['problems'])
+
+    assert 400 == request(connect(server), 'POST', '/load?chunk_size=x',
+                          FIXTURE)[0]
+    assert 400 == request(connect(server), 'POST', '/load?colour=red',
+                          FIXTURE)[0]
+    assert 400 == request(connect(server), 'POST', '/reset')[0]
+    assert 404 == request(connect(server), 'GET', '/nowhere')[0]
+    assert not graph.nodes
+
+
+@pytest.mark.unit
+def test_unix_socket(tmpdir, graph):
+    # type: (Any, backends.MemoryBackend) -> None
+    """The service can listen on a Unix socket, which it removes."""
+    path = str(tmpdir.join('gryaml.sock'))
+    service = serve.Service(serve.ConnectionPool(lambda: graph, 1), 1)
+    server = serve.make_server(service, path)
+    thread = threading.Thread(target=server.handle_request)
+    thread.start()
+
+    assert 200 == request(UnixHTTPConnection(path), 'POST', '/load',
+                          FIXTURE)[0]
+    thread.join()
+    server.server_close()
+    service.close()
+    assert 2 == len(graph.nodes)
+    assert not tmpdir.join('gryaml.sock').exists()
+
+
+@pytest.mark.unit
+def test_queue_full(graph):
+    # type: (backends.MemoryBackend) -> None
+    """Loads beyond the workers & queue are refused."""
+    service = serve.Service(serve.ConnectionPool(lambda: graph, 1), 1,
+                            queue_size=1)
+    release = threading.Event()
+    running = service.submit(lambda graph: release.wait())
+    while service.metrics.active < 1:
+        release.wait(0.01)
+    queued = service.submit(lambda graph: len(graph.nodes))
+
+    with pytest.raises(serve.Full):
+        service.submit(lambda graph: None)
+    assert 1 == service.metrics_dict()['rejected']
+
+    release.set()
+    running.wait()
+    assert 0 == queued.wait()
+    service.close()
+
+
+@pytest.mark.unit
+def test_pool_reopens():
+    # type: () -> None
+    """Connections failing with transient errors are replaced."""
+    opened = []
+
+    def connect():
+        graph = backends.MemoryBackend()
+        opened.append(graph)
+        return graph
+
+    pool = serve.ConnectionPool(connect, 1)
+    with pytest.raises(IOError):
+        with pool.connection():
+            raise IOError('connection reset')
+    with pytest.raises(ValueError):
+        with pool.connection() as graph:
+            assert opened[1] is graph
+            raise ValueError('bad data')
+    with pool.connection() as graph:
+        assert opened[1] is graph
+    assert 2 == len(opened)
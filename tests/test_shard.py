@@ -0,0 +1,141 @@
+"""Tests for :mod:`gryaml.shard`."""
+from __future__ import print_function, absolute_import
+
+import io
+import json
+from textwrap import dedent
+
+import pytest
+
+from gryaml import backends, loader, shard
+
+try:
+    from typing import Any, List, Tuple  # noqa: F401
+except ImportError:
+    """Module :mod:`typing` not required for Py27-compatible type comments."""
+
+PARTITIONS = [shard.Partition(0, 'label', 'Movie'),
+              shard.Partition(1, 'label', 'Person'),
+              shard.Partition(2, 'label', None)]
+
+NODES = [(0, ['Person'], {'name': 'Keanu Reeves'}),
+         (1, ['Person', 'Star'], {'name': 'Carrie-Anne Moss'}),
+         (2, ['Movie'], {'title': 'The Matrix'}),
+         (3, [], {})]
+
+RELS = [(0, 'KNOWS', 1, ['Person', 'Star'], {}),
+        (0, 'ACTED_IN', 2, ['Movie'], {'roles': ['Neo']}),
+        (2, 'IS_A', 3, [], {})]
+
+
+def write_shards(directory):
+    # type: (Any) -> None
+    """Write the shards of the sample rows & their manifest."""
+    partitioner = shard.Partitioner(PARTITIONS)
+    entries = []
+    for partition in PARTITIONS:
+        def mine(node_id, labels):
+            # type: (int, List[str]) -> bool
+            return partitioner.owner(node_id, labels) == partition.index
+
+        labels = {n[0]: n[1] for n in NODES}
+        entries.append(shard.write_shard(
+            str(directory), partition, partitioner,
+            [n for n in NODES if mine(*n[:2])],
+            [r for r in RELS if mine(r[0], labels[r[0]])]))
+    directory.join(shard.MANIFEST_NAME).write(
+        json.dumps({'by': 'label', 'shards': entries}))
+
+
+@pytest.mark.unit
+def test_owner():
+    # type: () -> None
+    """Nodes belong to the partition of their least label, or of their id."""
+    by_label = shard.Partitioner(PARTITIONS)
+    assert [1, 0, 0, 2] == [by_label.owner(0, ['Person']),
+                            by_label.owner(0, ['Person', 'Movie']),
+                            by_label.owner(0, ['Movie']),
+                            by_label.owner(0, [])]
+
+    by_id = shard.Partitioner([shard.Partition(0, 'id', [3, 6]),
+                               shard.Partition(1, 'id', [6, 9])])
+    assert [0, 0, 1, 1] == [by_id.owner(node_id, [])
+                            for node_id in (3, 5, 6, 8)]
+
+
+@pytest.mark.unit
+def test_node_condition():
+    # type: () -> None
+    """Conditions select a partition, with the backend's parameters."""
+    memory = backends.MemoryBackend()
+    assert (u'n:`Person` AND all(l IN labels(n) WHERE l >= $label)',
+            {'label': 'Person'}) \
+        == shard.node_condition(PARTITIONS[1], memory)
+    assert u'size(labels(n)) = 0' \
+        == shard.node_condition(PARTITIONS[2], memory)[0]
+    assert (u'id(n) >= {low} AND id(n) < {high}', {'low': 0, 'high': 4}) \
+        == shard.node_condition(shard.Partition(0, 'id', [0, 4]),
+                                backends.Py2neoBackend(None))
+
+
+@pytest.mark.unit
+def test_write_shard(tmpdir):
+    # type: (Any) -> None
+    """Rels to other shards are written apart, referencing their nodes."""
+    write_shards(tmpdir)
+    manifest = json.loads(tmpdir.join(shard.MANIFEST_NAME).read())
+    person = manifest['shards'][1]
+
+    assert (2, 1, 1) == (person['nodes'], person['rels'],
+                         person['cross_rels'])
+    assert {'0': ['n2'], '1': ['n0']} == person['references']
+    assert 'n2' in tmpdir.join(person['cross']).read()
+    assert '!gryaml.ref' in tmpdir.join(person['cross']).read()
+
+
+@pytest.mark.unit
+def test_load_manifest(tmpdir):
+    # type: (Any) -> None
+    """Shards load with their cross-shard rels joining them up."""
+    write_shards(tmpdir)
+    graph = backends.MemoryBackend()
+
+    assert 7 == shard.load_manifest(
+        str(tmpdir.join(shard.MANIFEST_NAME)), graph=graph)
+
+    names = {id_: node.properties.get('name', node.properties.get('title'))
+             for id_, node in graph.nodes.items()}
+    assert {('Keanu Reeves', 'KNOWS', 'Carrie-Anne Moss'),
+            ('Keanu Reeves', 'ACTED_IN', 'The Matrix'),
+            ('The Matrix', 'IS_A', None)} \
+        == {(names[r.head], r.type, names[r.tail])
+            for r in graph.rels.values()}
+
+
+@pytest.mark.unit
+def test_reference_endpoint():
+    # type: () -> None
+    """References are keyed by their anchor, for ids given to the load."""
+    text = dedent("""\
+        - !gryaml.rel [!gryaml.ref keanu, KNOWS, !gryaml.ref carrie]
+    """)
+    graph = backends.MemoryBackend()
+    keanu = graph.create_node(['Person'], {})
+    carrie = graph.create_node(['Person'], {})
+
+    loader.load(io.StringIO(text), graph, checkpoint=loader.Checkpoint(
+        anchors={'keanu': keanu.id, 'carrie': carrie.id}))
+
+    assert [(keanu.id, 'KNOWS', carrie.id)] \
+        == [r[1:4] for r in graph.rels.values()]
+
+
+@pytest.mark.unit
+def test_plan_by_id(monkeypatch):
+    # type: (Any) -> None
+    """Partitions by id cover the id range in about equal parts."""
+    graph = backends.MemoryBackend()
+    monkeypatch.setattr(graph, 'run', lambda statement, parameters=None:
+                        [(3, 12)])
+    assert [[3, 6], [6, 9], [9, 12], [12, 13]] \
+        == [p.value for p in shard.plan(graph, 'id', 4)]
@@ -0,0 +1,139 @@
+"""Tests for :mod:`gryaml.stats`."""
+from __future__ import print_function, absolute_import
+
+import json
+from textwrap import dedent
+
+import pytest
+
+from gryaml import stats
+
+try:
+    from typing import Any, Callable  # noqa: F401
+except ImportError:
+    """Module :mod:`typing` not required for Py27-compatible type comments."""
+
+MOVIES = dedent("""\
+    - &keanu !gryaml.node
+      - labels: [Person, Actor]
+      - properties: {name: Keanu Reeves, born: 1964}
+    - &matrix !gryaml.node
+      - labels: [Movie]
+      - properties: {title: The Matrix}
+    - !gryaml.rel [*keanu, ACTED_IN, *matrix, {roles: [Neo]}]
+    - !gryaml.rel
+      - !gryaml.node [{labels: [Person]}, {properties: {name: Lana}}]
+      - DIRECTED
+      - *matrix
+      - properties: {year: 1999}
+    ---
+    - &keanu !gryaml.node [{labels: [Person]}]
+    - !gryaml.rel [*keanu, KNOWS, *keanu]
+""")
+
+
+@pytest.mark.unit
+def test_collect():
+    # type: () -> None
+    """Entities, labels, types, keys & anchors are counted."""
+    collected = stats.collect(MOVIES)
+
+    assert {'documents': 2, 'items': 6, 'nodes': 4, 'rels': 3,
+            'anchors': 3, 'aliases': 5, 'max_anchor_span': 2} \
+        == {key: value for key, value in collected.as_dict().items()
+            if not isinstance(value, list)}
+    assert {'Person': 3, 'Actor': 1, 'Movie': 1} == collected.labels
+    assert {'ACTED_IN': 1, 'DIRECTED': 1, 'KNOWS': 1} == collected.rel_types
+    assert {'name': 2, 'born': 1, 'roles': 1, 'title': 1, 'year': 1} \
+        == collected.property_keys
+
+
+@pytest.mark.unit
+def test_collect_edges():
+    # type: () -> None
+    """Each row of a table is a relationship of its type."""
+    collected = stats.collect(MOVIES + dedent("""\
+        - !gryaml.edges
+          type: FOLLOWS
+          keys: [since, muted]
+          rows:
+          - [*keanu, *keanu, 2019]
+          - [*keanu, !gryaml.ref lana, null, [true]]
+          - [*keanu, *keanu, ~, 'null']
+    """))
+    assert 6 == collected.rels
+    assert 3 == collected.rel_types['FOLLOWS']
+    assert (1, 2) == (collected.property_keys['since'],
+                      collected.property_keys['muted'])
+
+
+@pytest.mark.unit
+def test_collect_paths():
+    # type: () -> None
+    """Each hop of a path is a relationship."""
+    collected = stats.collect(dedent("""\
+        - !gryaml.path
+          - &mon !gryaml.node [{labels: [Day]}]
+          - NEXT
+          - !gryaml.node [{labels: [Day]}]
+          - [NEXT, {gap: 1}]
+          - !gryaml.ref wed
+          - AFTER
+          - *mon
+    """))
+    assert (2, 3) == (collected.nodes, collected.rels)
+    assert {'NEXT': 2, 'AFTER': 1} == collected.rel_types
+    assert {'gap': 1} == collected.property_keys
+
+
+@pytest.mark.unit
+def test_collect_repeats():
+    # type: () -> None
+    """Templates are counted as many times as they are repeated."""
+    collected = stats.collect(dedent("""\
+        - !gryaml.repeat
+          node: !gryaml.node
+            - labels: [User]
+            - properties: {name: 'user {i}'}
+          anchor: user-{i}
+          count: 1000
+        - !gryaml.repeat
+          count: 999
+          rel: [!gryaml.ref 'user-{i}', FOLLOWS, !gryaml.ref 'user-{i+1}',
+                {since: 2019}]
+        - !gryaml.repeat
+          count: 2
+          rel: !gryaml.rel [!gryaml.ref 'user-{i}', BLOCKS, !gryaml.ref x]
+        - !gryaml.node [{labels: [User]}, {properties: {name: admin}}]
+    """))
+    assert (1001, 1001, 1000) == (collected.nodes, collected.rels,
+                                  collected.anchors)
+    assert {'User': 1001} == collected.labels
+    assert {'FOLLOWS': 999, 'BLOCKS': 2} == collected.rel_types
+    assert {'name': 1001, 'since': 999} == collected.property_keys
+
+
+@pytest.mark.unit
+def test_samples(sample_yaml):
+    # type: (Callable[[str], str]) -> None
+    """Counts agree with the chunked loader's."""
+    collected = stats.collect(sample_yaml('nodes-and-relationships'))
+    assert (9, 12) == (collected.nodes, collected.rels)
+
+
+@pytest.mark.unit
+def test_main(tmpdir, capsys):
+    # type: (Any, Any) -> None
+    """Stats are reported per file, as text or JSON."""
+    path = tmpdir.join('movies.yaml')
+    path.write(MOVIES)
+
+    stats.main(['--top', '1', str(path)])
+    out = capsys.readouterr()[0]
+    assert 'nodes: 4, relationships: 3\n' in out
+    assert 'labels (3 distinct):\n  Person: 3\nrelationship' in out
+
+    stats.main(['--json', str(path)])
+    record = json.loads(capsys.readouterr()[0])
+    assert (str(path), 4, 3) == (record['path'], record['nodes'],
+                                 record['rels'])
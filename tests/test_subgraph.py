@@ -0,0 +1,117 @@
+"""Tests for :mod:`gryaml.subgraph`."""
+from __future__ import print_function, absolute_import
+
+import io
+
+import pytest
+
+import gryaml
+from gryaml import backends, cypher, loader, subgraph
+
+try:
+    from typing import List, Optional, Set, Tuple  # noqa: F401
+except ImportError:
+    """Module :mod:`typing` not required for Py27-compatible type comments."""
+
+
+class CountingBackend(backends.MemoryBackend):
+    """Memory backend counting its queries."""
+
+    def __init__(self):
+        # type: () -> None
+        super(CountingBackend, self).__init__()
+        self.queries = []  # type: List[Tuple[str, int]]
+
+    def read_nodes(self, node_ids):
+        # type: (List[int]) -> List[Tuple]
+        self.queries.append(('read_nodes', len(node_ids)))
+        return super(CountingBackend, self).read_nodes(node_ids)
+
+    def expand(self, node_ids, rel_types=None):
+        # type: (List[int], Optional[List[str]]) -> List[Tuple]
+        self.queries.append(('expand', len(node_ids)))
+        return super(CountingBackend, self).expand(node_ids, rel_types)
+
+
+def chain(graph):
+    # type: (backends.MemoryBackend) -> List[backends.MemoryNode]
+    """Nodes a-b-c-d in a chain, with a & c both liked by e."""
+    nodes = [graph.create_node(['Letter'], {'name': name})
+             for name in 'abcde']
+    a, b, c, d, e = nodes
+    for head, tail in (a, b), (b, c), (c, d):
+        graph.create_rel(head, 'NEXT', tail, {})
+    graph.create_rel(e, 'LIKES', a, {'much': True})
+    graph.create_rel(e, 'LIKES', c, {})
+    return nodes
+
+
+def shape(text):
+    # type: (str) -> Tuple[Set[str], Set[Tuple[str, str, str]]]
+    """Names of the nodes & rels loaded from `text`."""
+    graph = backends.MemoryBackend()
+    loader.load(text, graph)
+    names = {id_: n.properties['name'] for id_, n in graph.nodes.items()}
+    return (set(names.values()),
+            {(names[r.head], r.type, names[r.tail])
+             for r in graph.rels.values()})
+
+
+@pytest.mark.unit
+def test_id_set():
+    # type: () -> None
+    """Ids are added once each."""
+    ids = subgraph.IdSet([3, 17])
+    assert [True, False, True] == [ids.add(0), ids.add(17), ids.add(1000)]
+    assert 4 == len(ids)
+    assert [True, True, False, False] == [
+        id_ in ids for id_ in (0, 1000, 1, 5000)]
+
+
+@pytest.mark.unit
+def test_dump_subgraph():
+    # type: () -> None
+    """Nodes within the depth, & all rels between them, are dumped."""
+    graph = CountingBackend()
+    a, b, c, d, e = chain(graph)
+
+    text = gryaml.dump_subgraph(graph, [a.id], 1)
+
+    assert ({'a', 'b', 'e'}, {('a', 'NEXT', 'b'), ('e', 'LIKES', 'a')}) \
+        == shape(text)
+    assert [('read_nodes', 1), ('expand', 1), ('read_nodes', 2),
+            ('expand', 2)] == graph.queries
+
+    stream = io.StringIO()
+    assert subgraph.dump_subgraph(graph, [b.id], 2, stream=stream) is None
+    assert ({'a', 'b', 'c', 'd', 'e'},
+            {('a', 'NEXT', 'b'), ('b', 'NEXT', 'c'), ('c', 'NEXT', 'd'),
+             ('e', 'LIKES', 'a'), ('e', 'LIKES', 'c')}) \
+        == shape(stream.getvalue())
+
+
+@pytest.mark.unit
+def test_dump_subgraph_rel_types():
+    # type: () -> None
+    """Hops follow only the relationship types given, in batches."""
+    graph = CountingBackend()
+    a, b, c, d, e = chain(graph)
+
+    text = subgraph.dump_subgraph(graph, [a.id, c.id], 1, ['NEXT'],
+                                  batch_size=1)
+
+    assert ({'a', 'b', 'c', 'd'},
+            {('a', 'NEXT', 'b'), ('b', 'NEXT', 'c'), ('c', 'NEXT', 'd')}) \
+        == shape(text)
+    assert [('read_nodes', 1)] * 2 + [('expand', 1)] * 2 \
+        == graph.queries[:4]
+
+
+@pytest.mark.unit
+def test_expand_statement():
+    # type: () -> None
+    """Expansion unwinds the frontier, optionally matching types."""
+    assert (u'UNWIND $rows AS id MATCH (n)-[r:`A`|`B`]-() WHERE id(n) = id'
+            u' RETURN id(r), id(startNode(r)), type(r), id(endNode(r)),'
+            u' properties(r)') \
+        == cypher.expand_statement(['A', 'B'], cypher.PARAM)
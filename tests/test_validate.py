@@ -0,0 +1,157 @@
+"""Tests for :mod:`gryaml.validate`."""
+from __future__ import print_function, absolute_import
+
+from textwrap import dedent
+
+import pytest
+
+from gryaml import loader, validate
+
+try:
+    from typing import Callable, List  # noqa: F401
+except ImportError:
+    """Module :mod:`typing` not required for Py27-compatible type comments."""
+
+
+def problems(text):
+    # type: (str) -> List[str]
+    """Problems found in `text`, with their lines."""
+    return ['%d: %s' % (error.problem_mark.line + 1, error.problem)
+            for error in validate.validate(dedent(text))]
+
+
+@pytest.mark.unit
+@pytest.mark.parametrize('sample', ['nodes-and-relationships',
+                                    'node-parameter-permutations',
+                                    'relationships'])
+def test_samples(sample_yaml, sample):
+    # type: (Callable[[str], str], str) -> None
+    """The samples are valid."""
+    assert [] == validate.validate(sample_yaml(sample))
+
+
+@pytest.mark.unit
+def test_node_args():
+    # type: () -> None
+    """Node args are arg maps of labels or properties."""
+    assert ["2: expected a map of just labels or properties, found keys"
+            " 'labels', 'properties'",
+            "3: expected a labels or properties map",
+            "4: expected a sequence of labels",
+            "5: expected a scalar or sequence of scalars for a property"
+            " value",
+            "6: expected a sequence for !gryaml.node"] == problems("""\
+        - !gryaml.node
+          - {labels: [Person], properties: {name: Keanu}}
+          - Person
+        - !gryaml.node [{labels: Person}, {labels: ~}]
+        - !gryaml.node [{properties: {name: {first: Keanu}}}]
+        - !gryaml.node {labels: [Person]}
+    """)
+
+
+@pytest.mark.unit
+def test_rels():
+    # type: () -> None
+    """Rels have 3 or 4 items & endpoints which are nodes."""
+    assert ["1: expected a sequence of 3 or 4 items for !gryaml.rel",
+            "3: expected an endpoint tagged !gryaml.node or !gryaml.ref",
+            "4: expected a relationship type",
+            "5: !gryaml.ref is only for relationship endpoints"] \
+        == problems("""\
+        - !gryaml.rel [!gryaml.node [], KNOWS]
+        - &name Keanu
+        - !gryaml.rel [*name, KNOWS, !gryaml.ref n1]
+        - !gryaml.rel [!gryaml.node [], [KNOWS], !gryaml.node [], {a: 1}]
+        - !gryaml.ref n1
+    """)
+
+
+@pytest.mark.unit
+def test_anchors():
+    # type: () -> None
+    """Aliases must follow their anchors in the same document."""
+    assert ["1: found undefined alias 'keanu'",
+            "1: found undefined alias 'keanu'",
+            "4: found undefined alias 'keanu'",
+            "5: found unknown tag !gryaml.nod"] == problems("""\
+        - !gryaml.rel [*keanu, KNOWS, *keanu]
+        - &keanu !gryaml.node []
+        ---
+        - !gryaml.rel [*keanu, KNOWS, !gryaml.node []]
+        - !gryaml.nod []
+    """)
+
+
+@pytest.mark.unit
+def test_repeat():
+    # type: () -> None
+    """Repeats are maps of a count & one template."""
+    assert ["2: expected a map of count, start, anchor & a node or rel,"
+            " found keys 'start', 'node'",
+            "4: expected a template tagged !gryaml.rel",
+            "5: expected a map for !gryaml.repeat",
+            "7: expected an index field in the anchor of more than one"
+            " node"] == problems("""\
+        - !gryaml.repeat {count: 2, node: !gryaml.node [{labels: [A]}]}
+        - !gryaml.repeat {start: 2, node: !gryaml.node []}
+        - !gryaml.repeat {count: 2, rel: [!gryaml.ref a, R, !gryaml.ref b]}
+        - !gryaml.repeat {count: 2, rel: !gryaml.node []}
+        - !gryaml.repeat [2]
+        - !gryaml.repeat {count: 1, anchor: one, node: !gryaml.node []}
+        - !gryaml.repeat {count: 2, anchor: one, node: !gryaml.node []}
+    """)
+
+
+@pytest.mark.unit
+def test_edges():
+    # type: () -> None
+    """Tables are maps of a type & rows of anchored endpoints & values."""
+    assert ["3: expected a map of type, keys & rows, found keys 'rows'",
+            "4: expected a row of a head, a tail & up to 1 values",
+            "5: expected an anchored endpoint or !gryaml.ref",
+            "6: expected a sequence for rows"] == problems("""\
+        - &a !gryaml.node []
+        - !gryaml.edges {type: R, keys: [w], rows: [[*a, !gryaml.ref b, 1]]}
+        - !gryaml.edges {rows: [[*a, *a]]}
+        - !gryaml.edges {type: R, keys: [w], rows: [[*a, *a, 1, 2]]}
+        - !gryaml.edges {type: R, rows: [[*a, !gryaml.node []]]}
+        - !gryaml.edges {type: R, rows: {}}
+    """)
+
+
+@pytest.mark.unit
+def test_path():
+    # type: () -> None
+    """Paths alternate endpoints & types or [type, properties] pairs."""
+    assert ["3: expected a sequence of nodes alternating with relationship"
+            " types for !gryaml.path",
+            "4: expected a relationship type or a [type, properties] pair",
+            "5: expected an endpoint tagged !gryaml.node or !gryaml.ref"] \
+        == problems("""\
+        - !gryaml.path [!gryaml.node [], [R, {a: 1}], !gryaml.ref b, S, &c
+                        !gryaml.node []]
+        - !gryaml.path [!gryaml.node [], R]
+        - !gryaml.path [!gryaml.node [], {R: 1}, !gryaml.node []]
+        - !gryaml.path [!gryaml.node [], R, Keanu]
+    """)
+
+
+@pytest.mark.unit
+def test_max_problems():
+    # type: () -> None
+    """Validation stops after enough problems, or a parse error."""
+    text = u'- !gryaml.node Keanu\n' * 5
+    assert 2 == len(validate.validate(text, max_problems=2))
+    assert 1 == len(validate.validate(u'- [unclosed\n- !gryaml.node x\n'))
+
+
+@pytest.mark.unit
+def test_ruamel_events(sample_yaml):
+    # type: (Callable[[str], str]) -> None
+    """Events from ruamel.yaml are checked alike."""
+    pytest.importorskip('ruamel.yaml')
+    assert ["1: expected a sequence for !gryaml.node"] == [
+        '%d: %s' % (error.problem_mark.line + 1, error.problem)
+        for error in validate.validate(u'- !gryaml.node Keanu\n',
+                                       loader.event_parser('ruamel'))]